@@ -0,0 +1,67 @@
+"""
+Short-lived in-process cache for dashboard endpoints
+"""
+import asyncio
+import contextlib
+import functools
+
+from cachetools import TTLCache
+from fastapi import Response
+
+CACHE_TTL_SECONDS = 5
+
+_cache = TTLCache(maxsize=64, ttl=CACHE_TTL_SECONDS)
+# Caches for endpoints that asked for a different TTL, one per TTL
+_ttl_caches = {CACHE_TTL_SECONDS: _cache}
+# Per-key locks with the number of callers holding or waiting on each; a key's
+# entry goes as soon as that count is back to zero, so keys built from query
+# parameters don't accumulate locks
+_locks = {}
+
+# Per-request arguments that must not become part of the cache key
+_UNKEYED_ARGS = {"db", "current_user", "response"}
+
+@contextlib.asynccontextmanager
+async def _key_lock(key):
+    """Hold the lock for one cache key, dropping it once nobody needs it"""
+    entry = _locks.get(key)
+    if entry is None:
+        entry = _locks[key] = [asyncio.Lock(), 0]
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _locks[key]
+
+def ttl_cached(endpoint=None, *, ttl: float = CACHE_TTL_SECONDS):
+    """Cache an endpoint's result per role and query parameters for `ttl` seconds
+    
+    Use bare (`@ttl_cached`) for CACHE_TTL_SECONDS, or as `@ttl_cached(ttl=1)`.
+    """
+    if endpoint is None:
+        return functools.partial(ttl_cached, ttl=ttl)
+    cache = _ttl_caches.setdefault(ttl, TTLCache(maxsize=64, ttl=ttl))
+    
+    @functools.wraps(endpoint)
+    async def wrapper(**kwargs):
+        user = kwargs.get("current_user")
+        key = (
+            endpoint.__qualname__,
+            getattr(user, "role", None),
+            tuple(sorted((k, v) for k, v in kwargs.items() if k not in _UNKEYED_ARGS))
+        )
+        # One computation per key while concurrent pollers wait on the lock
+        async with _key_lock(key):
+            if key in cache:
+                return cache[key]
+            result = await endpoint(**kwargs)
+            cache[key] = result
+            return result
+    return wrapper
+
+def cache_control(response: Response):
+    """Dependency letting browsers reuse dashboard responses for the same TTL"""
+    response.headers["Cache-Control"] = f"private, max-age={CACHE_TTL_SECONDS}"
@@ -2,53 +2,64 @@
 Configuration management for HexWard backend
 """
 import os
-from functools import lru_cache
-from pydantic_settings import BaseSettings
+from dataclasses import dataclass
 from typing import Optional
+from dotenv import load_dotenv
+
+# Populate os.environ from .env once; real environment variables take precedence
+load_dotenv(".env")
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """Application settings (read once from the environment at import)"""
 
-class Settings(BaseSettings):
-    """Application settings"""
-    
     # Database
-    DATABASE_URL: str = "sqlite:///./hexward.db"
-    
+    DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./hexward.db")
+
     # Security
-    SECRET_KEY: str = "hexward-secret-key-change-in-production"
-    JWT_SECRET_KEY: str = "jwt-secret-key-change-in-production"
-    JWT_ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
-    
+    SECRET_KEY: str = os.getenv("SECRET_KEY", "hexward-secret-key-change-in-production")
+    JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", "jwt-secret-key-change-in-production")
+    JWT_ALGORITHM: str = os.getenv("JWT_ALGORITHM", "HS256")
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
     # OpenAI
-    OPENAI_API_KEY: Optional[str] = None
-    
+    OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
+    GPT_SUMMARY_MODEL: str = os.getenv("GPT_SUMMARY_MODEL", "gpt-4o-mini")  # Patient and shift summaries
+    GPT_ANALYSIS_MODEL: str = os.getenv("GPT_ANALYSIS_MODEL", "gpt-4o-mini")  # Detection triage and care suggestions
+    OPENAI_RPM: int = int(os.getenv("OPENAI_RPM", "500"))  # Request budget per minute for fanned-out GPT calls
+
     # Camera Configuration
-    DEFAULT_CAMERA_INDEX: int = 0
-    CAMERA_RESOLUTION_WIDTH: int = 640
-    CAMERA_RESOLUTION_HEIGHT: int = 480
-    DETECTION_CONFIDENCE_THRESHOLD: float = 0.5
-    
+    DEFAULT_CAMERA_INDEX: int = int(os.getenv("DEFAULT_CAMERA_INDEX", "0"))
+    CAMERA_RESOLUTION_WIDTH: int = int(os.getenv("CAMERA_RESOLUTION_WIDTH", "640"))
+    CAMERA_RESOLUTION_HEIGHT: int = int(os.getenv("CAMERA_RESOLUTION_HEIGHT", "480"))
+    DETECTION_CONFIDENCE_THRESHOLD: float = float(os.getenv("DETECTION_CONFIDENCE_THRESHOLD", "0.5"))
+    FRAME_CHANGE_THRESHOLD: float = float(os.getenv("FRAME_CHANGE_THRESHOLD", "2.0"))  # Mean grey-level change that triggers detection
+
     # WebSocket
-    WEBSOCKET_HOST: str = "localhost"
-    WEBSOCKET_PORT: int = 8000
-    
+    WEBSOCKET_HOST: str = os.getenv("WEBSOCKET_HOST", "localhost")
+    WEBSOCKET_PORT: int = int(os.getenv("WEBSOCKET_PORT", "8000"))
+    WS_BATCH_MS: int = int(os.getenv("WS_BATCH_MS", "50"))  # Coalescing window for monitor broadcasts
+
     # Monitoring
-    ALERT_CHECK_INTERVAL: int = 5
-    PATIENT_UPDATE_INTERVAL: int = 10
-    CAMERA_FRAME_RATE: int = 30
-    
+    ALERT_CHECK_INTERVAL: int = int(os.getenv("ALERT_CHECK_INTERVAL", "5"))
+    PATIENT_UPDATE_INTERVAL: int = int(os.getenv("PATIENT_UPDATE_INTERVAL", "10"))
+    CAMERA_FRAME_RATE: int = int(os.getenv("CAMERA_FRAME_RATE", "30"))
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    DETECTION_BATCH_MS: int = int(os.getenv("DETECTION_BATCH_MS", "500"))  # Window for grouping detections per GPT call
+
     # Hospital
-    HOSPITAL_NAME: str = "HexWard Medical Center"
-    HOSPITAL_TIMEZONE: str = "UTC"
-    
+    HOSPITAL_NAME: str = os.getenv("HOSPITAL_NAME", "HexWard Medical Center")
+    HOSPITAL_TIMEZONE: str = os.getenv("HOSPITAL_TIMEZONE", "UTC")
+
     # AI Models
-    YOLO_MODEL_PATH: str = "yolov8n.pt"  # Will download automatically
-    WHISPER_MODEL: str = "base"
-    
-    class Config:
-        env_file = ".env"
-        case_sensitive = True
-
-@lru_cache()
-def get_settings():
-    """Get cached settings instance"""
-    return Settings()
\ No newline at end of file
+    YOLO_MODEL_PATH: str = os.getenv("YOLO_MODEL_PATH", "yolov8n.pt")  # Will download automatically
+    YOLO_ENGINE_PATH: str = os.getenv("YOLO_ENGINE_PATH", "")  # TensorRT engine; defaults to the weights path with .engine
+    YOLO_BATCH: int = int(os.getenv("YOLO_BATCH", "8"))  # Most frames per inference call (the engine's max batch)
+    WHISPER_MODEL: str = os.getenv("WHISPER_MODEL", "base")
+
+SETTINGS = Settings()
+
+def get_settings() -> Settings:
+    """Get the process-wide settings instance"""
+    return SETTINGS
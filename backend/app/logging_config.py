@@ -0,0 +1,21 @@
+"""
+Logging setup: records are queued and written by a background thread
+"""
+import logging
+import logging.handlers
+import queue
+
+def setup_logging(level: str) -> logging.handlers.QueueListener:
+    """Route root logging through a queue so callers never block on stream writes"""
+    log_queue = queue.SimpleQueue()
+    
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    
+    listener.start()
+    return listener
\ No newline at end of file
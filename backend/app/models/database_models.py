@@ -1,12 +1,42 @@
 """
 SQLAlchemy database models for HexWard
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, JSON, Index, cast, literal_column, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
+from sqlalchemy.sql.functions import FunctionElement
 from app.database import Base
 import uuid
 
+# Binary, GIN-indexable JSONB on PostgreSQL; plain JSON elsewhere
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
+# SQLite stores server-default timestamps as 'YYYY-MM-DD HH:MM:SS' but datetimes
+# written from Python (and bound parameters) with microseconds, so comparing them
+# raw is a string comparison in which a second sorts below itself. Keyset cursors
+# compare and order on this common millisecond form instead. The format is a
+# literal so query expressions match the index expressions built from it
+_SORTABLE_TIME_FORMAT = literal_column("'%Y-%m-%d %H:%M:%f'")
+
+class sortable_timestamp(FunctionElement):
+    """A timestamp column or datetime in a form that compares in time order
+    
+    Only SQLite needs converting (to text in one format); other backends store
+    real timestamps, so there it is the value itself.
+    """
+    name = "sortable_timestamp"
+    inherit_cache = True
+
+@compiles(sortable_timestamp)
+def _compile_sortable_timestamp(element, compiler, **kw):
+    return compiler.process(*element.clauses, **kw)
+
+@compiles(sortable_timestamp, "sqlite")
+def _compile_sortable_timestamp_sqlite(element, compiler, **kw):
+    return compiler.process(func.strftime(_SORTABLE_TIME_FORMAT, *element.clauses), **kw)
+
 class User(Base):
     __tablename__ = "users"
     
@@ -28,23 +58,49 @@ class Patient(Base):
     room = Column(String, nullable=False, index=True)
     status = Column(String, default="stable")  # stable, critical, monitoring
     admission_date = Column(DateTime(timezone=True), server_default=func.now())
-    conditions = Column(JSON)  # List of medical conditions
-    vitals = Column(JSON)  # Current vital signs
+    conditions = Column(JSONType)  # List of medical conditions
+    vitals = Column(JSONType)  # Current vital signs
+    # Copies of the vitals the patient list filters on, kept in sync by _sync_vitals
+    heart_rate = Column(Integer, index=True)
+    oxygen_saturation = Column(Integer, index=True)
     ai_summary = Column(Text)  # GPT-generated summary
     last_updated = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     # Relationships
     events = relationship("PatientEvent", back_populates="patient", cascade="all, delete-orphan")
     alerts = relationship("Alert", back_populates="patient")
+    
+    @validates("vitals")
+    def _sync_vitals(self, key, vitals):
+        """Mirror the queryable vitals into their own columns"""
+        for column, value in vitals_columns(vitals).items():
+            setattr(self, column, value)
+        return vitals
+
+def vitals_columns(vitals) -> dict:
+    """Values for Patient's vitals copy columns; for writes that bypass @validates"""
+    vitals = vitals or {}
+    return {
+        "heart_rate": vitals.get("heart_rate"),
+        "oxygen_saturation": vitals.get("oxygen_saturation"),
+    }
+
+# Containment queries on conditions (conditions @> '["diabetes"]')
+Index("ix_patients_conditions", Patient.conditions, postgresql_using="gin").ddl_if(dialect="postgresql")
 
 class PatientEvent(Base):
     __tablename__ = "patient_events"
+    __table_args__ = (
+        Index("ix_patient_events_patient_ts", "patient_id", "timestamp"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     patient_id = Column(String, ForeignKey("patients.id"), nullable=False)
     event_type = Column(String, nullable=False)  # medication, vitals, movement, etc.
     description = Column(Text)
-    metadata = Column(JSON)  # Additional event data
+    # Declarative reserves the `metadata` attribute for the table registry, so models
+    # map their `metadata` column to a `meta` attribute instead
+    meta = Column('metadata', JSONType)  # Additional event data
     source = Column(String)  # camera, manual, sensor, etc.
     confidence = Column(Float)  # AI confidence score
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
@@ -52,6 +108,11 @@ class PatientEvent(Base):
     # Relationships
     patient = relationship("Patient", back_populates="events")
 
+# Keyset order of a patient's events (see sortable_timestamp)
+PATIENT_EVENT_TIME_SORT = sortable_timestamp(PatientEvent.timestamp)
+
+Index("ix_patient_events_patient_sort", PatientEvent.patient_id, PATIENT_EVENT_TIME_SORT, PatientEvent.id).ddl_if(dialect="sqlite")
+
 class Camera(Base):
     __tablename__ = "cameras"
     
@@ -61,7 +122,7 @@ class Camera(Base):
     camera_index = Column(Integer)  # For local cameras
     rtsp_url = Column(String)  # For IP cameras
     camera_type = Column(String, default="usb")  # usb, ip, raspberry_pi
-    status = Column(String, default="active")  # active, offline, maintenance
+    status = Column(String, default="active", index=True)  # active, offline, maintenance
     last_frame_time = Column(DateTime(timezone=True))
     detection_enabled = Column(Boolean, default=True)
     recording_enabled = Column(Boolean, default=False)
@@ -72,21 +133,48 @@ class Camera(Base):
 
 class Detection(Base):
     __tablename__ = "detections"
+    __table_args__ = (
+        Index("ix_detections_camera_ts", "camera_id", "timestamp"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     camera_id = Column(String, ForeignKey("cameras.id"), nullable=False)
     detection_type = Column(String, nullable=False)  # person, fall, medical_event, etc.
     confidence = Column(Float, nullable=False)
-    bounding_box = Column(JSON)  # x, y, width, height
+    bounding_box = Column(JSONType)  # x, y, width, height
     frame_path = Column(String)  # Path to saved frame
-    metadata = Column(JSON)  # Additional detection data
+    meta = Column('metadata', JSONType)  # Additional detection data
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     camera = relationship("Camera", back_populates="detections")
 
+# SQLite hour buckets for analytics detection-trends: whole hours since the epoch.
+# The divisor is a literal rather than a bound parameter so the query expression
+# matches the index expression below
+DETECTION_HOUR_BUCKET = cast(func.strftime('%s', Detection.timestamp), Integer) // literal_column("3600", Integer)
+
+Index("ix_detections_hour_type", DETECTION_HOUR_BUCKET, Detection.detection_type).ddl_if(dialect="sqlite")
+
+# Keyset order of a camera's detections (see sortable_timestamp)
+DETECTION_TIME_SORT = sortable_timestamp(Detection.timestamp)
+
+Index("ix_detections_camera_sort", Detection.camera_id, DETECTION_TIME_SORT, Detection.id).ddl_if(dialect="sqlite")
+
 class Alert(Base):
     __tablename__ = "alerts"
+    __table_args__ = (
+        Index("ix_alerts_resolved_type", "resolved", "alert_type"),
+        Index("ix_alerts_room_created", "room", "created_at"),
+        Index("ix_alerts_ack", "acknowledged"),
+        Index("ix_alerts_created_at", "created_at"),
+        # Active alerts are the hot subset for dashboards and stats
+        Index(
+            "ix_alerts_active_type_created", "alert_type", "created_at",
+            sqlite_where=text("resolved = 0"),
+            postgresql_where=text("NOT resolved")
+        ),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     alert_type = Column(String, nullable=False)  # critical, warning, info
@@ -101,12 +189,21 @@ class Alert(Base):
     resolved = Column(Boolean, default=False)
     resolved_by = Column(String, ForeignKey("users.id"), nullable=True)
     resolved_at = Column(DateTime(timezone=True))
-    metadata = Column(JSON)
+    meta = Column('metadata', JSONType)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     patient = relationship("Patient", back_populates="alerts")
 
+# Keyset order of the alert list (newest first, id breaking ties)
+ALERT_CREATED_SORT = sortable_timestamp(Alert.created_at)
+
+Index("ix_alerts_created_sort", ALERT_CREATED_SORT, Alert.id).ddl_if(dialect="sqlite")
+
+# Daily timeline buckets, matching the GROUP BY in analytics alerts-timeline.
+# PostgreSQL rejects date() over timestamptz in an index (not immutable)
+Index("ix_alerts_date_type", func.date(Alert.created_at), Alert.alert_type).ddl_if(dialect="sqlite")
+
 class SystemLog(Base):
     __tablename__ = "system_logs"
     
@@ -114,5 +211,15 @@ class SystemLog(Base):
     level = Column(String, nullable=False)  # INFO, WARNING, ERROR, CRITICAL
     service = Column(String, nullable=False)  # ai_monitor, camera_service, etc.
     message = Column(Text, nullable=False)
-    metadata = Column(JSON)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    meta = Column('metadata', JSONType)
+    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class SummaryBatch(Base):
+    __tablename__ = "summary_batches"
+    
+    id = Column(String, primary_key=True)  # OpenAI batch id
+    status = Column(String, default="in_progress", index=True)  # in_progress, completed, failed
+    patient_ids = Column(JSONType, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True))
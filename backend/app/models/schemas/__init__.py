@@ -0,0 +1,35 @@
+"""
+Pydantic schemas for API request/response models
+
+Schemas live in per-domain modules; import from those directly. Names are
+still importable from this package, but each domain module is only loaded
+(and its pydantic core schemas built) on first access.
+"""
+import importlib
+
+_DOMAINS = {
+    "auth": ("UserRole", "UserBase", "UserCreate", "User", "Token", "TokenData"),
+    "patient": (
+        "PatientStatus", "VitalSigns", "PatientBase", "PatientCreate", "PatientUpdate", "PatientSummary", "Patient",
+        "EventType", "PatientEventBase", "PatientEventCreate", "PatientEvent",
+    ),
+    "camera": (
+        "CameraStatus", "CameraBase", "CameraCreate", "CameraUpdate", "Camera",
+        "BoundingBox", "DetectionBase", "DetectionCreate", "Detection",
+    ),
+    "alert": ("AlertType", "AlertBase", "AlertCreate", "AlertUpdate", "Alert", "DetectionAlert"),
+    "analytics": ("SystemStats", "CameraStats", "PatientStats", "LiveFeedData", "LiveSystemStatus"),
+    "common": ("METADATA_ALIASES",),
+}
+
+_MODULE_BY_NAME = {name: domain for domain, names in _DOMAINS.items() for name in names}
+
+__all__ = list(_MODULE_BY_NAME)
+
+def __getattr__(name):
+    domain = _MODULE_BY_NAME.get(name)
+    if domain is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{domain}", __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,55 @@
+"""
+Alert schemas
+"""
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional, Dict, Any, List, Literal
+from datetime import datetime
+from enum import Enum
+
+from .common import METADATA_ALIASES
+
+# Alert Schemas
+class AlertType(str, Enum):
+    CRITICAL = "critical"
+    WARNING = "warning"
+    INFO = "info"
+
+class AlertBase(BaseModel):
+    alert_type: AlertType
+    title: str
+    message: str
+    room: str
+    patient_id: Optional[str] = None
+    priority: int = Field(default=2, ge=1, le=3)
+    metadata: Optional[Dict[str, Any]] = {}
+
+class AlertCreate(AlertBase):
+    pass
+
+class AlertUpdate(BaseModel):
+    acknowledged: Optional[bool] = None
+    resolved: Optional[bool] = None
+
+class Alert(AlertBase):
+    id: str
+    metadata: Optional[Dict[str, Any]] = Field(default={}, validation_alias=METADATA_ALIASES)
+    acknowledged: bool
+    acknowledged_by: Optional[str] = None
+    acknowledged_at: Optional[datetime] = None
+    resolved: bool
+    resolved_by: Optional[str] = None
+    resolved_at: Optional[datetime] = None
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class DetectionAlert(BaseModel):
+    """GPT verdict on a group of camera detections (structured-output schema)"""
+    model_config = ConfigDict(extra="forbid")
+    
+    alert_needed: bool
+    alert_type: Literal["critical", "warning", "info"]
+    reason: str
+    recommendations: List[str]
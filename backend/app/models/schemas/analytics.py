@@ -0,0 +1,45 @@
+"""
+Analytics and live dashboard schemas
+"""
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+
+from .alert import Alert
+from .camera import Camera, Detection
+from .patient import Patient
+
+# Analytics Schemas
+class SystemStats(BaseModel):
+    total_patients: int
+    critical_alerts: int
+    active_cameras: int
+    avg_response_time: float
+
+class CameraStats(BaseModel):
+    camera_id: str
+    room: str
+    detections_count: int
+    last_detection: Optional[datetime] = None
+
+class PatientStats(BaseModel):
+    patient_id: str
+    name: str
+    events_count: int
+    alerts_count: int
+    last_activity: Optional[datetime] = None
+
+# Live Data Schemas
+class LiveFeedData(BaseModel):
+    camera_id: str
+    room: str
+    image_data: Optional[str] = None  # Base64 encoded image
+    detections: List[Detection] = []
+    timestamp: datetime
+
+class LiveSystemStatus(BaseModel):
+    timestamp: datetime
+    patients: List[Patient]
+    cameras: List[Camera]
+    recent_alerts: List[Alert]
+    system_stats: SystemStats
\ No newline at end of file
@@ -0,0 +1,36 @@
+"""
+Authentication and user schemas
+"""
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+from enum import Enum
+
+# Authentication Schemas
+class UserRole(str, Enum):
+    DOCTOR = "doctor"
+    NURSE = "nurse"
+    ADMIN = "admin"
+
+class UserBase(BaseModel):
+    username: str
+    email: str
+    role: UserRole
+
+class UserCreate(UserBase):
+    password: str
+
+class User(UserBase):
+    id: str
+    is_active: bool
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class Token(BaseModel):
+    access_token: str
+    token_type: str
+
+class TokenData(BaseModel):
+    username: Optional[str] = None
\ No newline at end of file
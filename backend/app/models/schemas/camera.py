@@ -0,0 +1,80 @@
+"""
+Camera and detection schemas
+"""
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any
+from datetime import datetime
+from functools import cached_property
+from enum import Enum
+
+from .common import METADATA_ALIASES
+
+# Camera Schemas
+class CameraStatus(str, Enum):
+    ACTIVE = "active"
+    OFFLINE = "offline"
+    MAINTENANCE = "maintenance"
+
+class CameraBase(BaseModel):
+    name: str
+    room: str
+    camera_index: Optional[int] = None
+    rtsp_url: Optional[str] = None
+
+class CameraCreate(CameraBase):
+    pass
+
+class CameraUpdate(BaseModel):
+    name: Optional[str] = None
+    room: Optional[str] = None
+    status: Optional[CameraStatus] = None
+    detection_enabled: Optional[bool] = None
+    recording_enabled: Optional[bool] = None
+
+class Camera(CameraBase):
+    id: str
+    status: CameraStatus
+    last_frame_time: Optional[datetime] = None
+    detection_enabled: bool
+    recording_enabled: bool
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+# Detection Schemas
+class BoundingBox(BaseModel):
+    x: float
+    y: float
+    width: float
+    height: float
+
+class DetectionBase(BaseModel):
+    detection_type: str
+    confidence: float
+    bounding_box: BoundingBox
+    metadata: Optional[Dict[str, Any]] = {}
+
+class DetectionCreate(DetectionBase):
+    camera_id: str
+    frame_path: Optional[str] = None
+
+class Detection(DetectionBase):
+    id: str
+    metadata: Optional[Dict[str, Any]] = Field(default={}, validation_alias=METADATA_ALIASES)
+    camera_id: str
+    frame_path: Optional[str] = None
+    timestamp: datetime
+    
+    @cached_property
+    def serialized(self) -> str:
+        """JSON form for WebSocket payloads, built once however many frames carry it"""
+        return self.model_dump_json()
+    
+    @cached_property
+    def short(self) -> str:
+        """Compact one-line form for GPT prompts, built once per detection"""
+        return f"{self.timestamp:%H:%M:%S} {self.detection_type} {self.confidence:.2f}"
+    
+    class Config:
+        from_attributes = True
\ No newline at end of file
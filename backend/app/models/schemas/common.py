@@ -0,0 +1,7 @@
+"""
+Shared pieces for the API schemas
+"""
+from pydantic import AliasChoices
+
+# ORM rows expose the "metadata" column as `meta`; the API key stays "metadata"
+METADATA_ALIASES = AliasChoices("meta", "metadata")
\ No newline at end of file
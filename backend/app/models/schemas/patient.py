@@ -0,0 +1,81 @@
+"""
+Patient and patient event schemas
+"""
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any
+from datetime import datetime
+from enum import Enum
+
+from .common import METADATA_ALIASES
+
+# Patient Schemas
+class PatientStatus(str, Enum):
+    STABLE = "stable"
+    CRITICAL = "critical"
+    MONITORING = "monitoring"
+
+class VitalSigns(BaseModel):
+    heart_rate: Optional[int] = None
+    blood_pressure: Optional[str] = None
+    temperature: Optional[float] = None
+    oxygen_saturation: Optional[int] = None
+    respiratory_rate: Optional[int] = None
+
+class PatientBase(BaseModel):
+    name: str
+    age: Optional[int] = None
+    room: str
+    conditions: Optional[List[str]] = []
+    vitals: Optional[VitalSigns] = None
+
+class PatientCreate(PatientBase):
+    pass
+
+class PatientUpdate(BaseModel):
+    name: Optional[str] = None
+    age: Optional[int] = None
+    room: Optional[str] = None
+    status: Optional[PatientStatus] = None
+    conditions: Optional[List[str]] = None
+    vitals: Optional[VitalSigns] = None
+
+class PatientSummary(PatientBase):
+    """Patient as listed; leaves out the (potentially long) AI summary"""
+    id: str
+    status: PatientStatus
+    admission_date: datetime
+    last_updated: datetime
+    
+    class Config:
+        from_attributes = True
+
+class Patient(PatientSummary):
+    ai_summary: Optional[str] = None
+
+# Event Schemas
+class EventType(str, Enum):
+    MEDICATION = "medication"
+    VITALS = "vitals"
+    MOVEMENT = "movement"
+    FALL = "fall"
+    VISITOR = "visitor"
+    SYSTEM = "system"
+
+class PatientEventBase(BaseModel):
+    event_type: EventType
+    description: str
+    metadata: Optional[Dict[str, Any]] = {}
+    source: Optional[str] = "manual"
+    confidence: Optional[float] = None
+
+class PatientEventCreate(PatientEventBase):
+    patient_id: str
+
+class PatientEvent(PatientEventBase):
+    id: str
+    metadata: Optional[Dict[str, Any]] = Field(default={}, validation_alias=METADATA_ALIASES)
+    patient_id: str
+    timestamp: datetime
+    
+    class Config:
+        from_attributes = True
\ No newline at end of file
@@ -3,20 +3,52 @@ Alerts router for alert management endpoints
 """
 from typing import List, Optional
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from pydantic import TypeAdapter
+from sqlalchemy import and_, case, func, lambda_stmt, or_, select, update
 from sqlalchemy.orm import Session
 
+from app.cache import cache_control, ttl_cached
 from app.database import get_db
 from app.models import database_models as db_models
-from app.models.schemas import Alert, AlertCreate, AlertUpdate, AlertType
-from app.routers.auth import get_current_user
+from app.models.schemas.alert import Alert, AlertCreate, AlertUpdate, AlertType
+from app.routers.auth import get_current_user, require_role
 
 router = APIRouter()
 
+# Built once; list endpoints serialize through it and skip FastAPI's per-route response handling
+_ALERT_LIST_ADAPTER = TypeAdapter(List[Alert])
+
+def _alert_out(row: db_models.Alert) -> Alert:
+    """Build an Alert response from a trusted ORM row without re-validating it"""
+    return Alert.model_construct(
+        id=row.id,
+        alert_type=AlertType(row.alert_type),
+        title=row.title,
+        message=row.message,
+        room=row.room,
+        patient_id=row.patient_id,
+        priority=row.priority,
+        metadata=row.meta,
+        acknowledged=row.acknowledged,
+        acknowledged_by=row.acknowledged_by,
+        acknowledged_at=row.acknowledged_at,
+        resolved=row.resolved,
+        resolved_by=row.resolved_by,
+        resolved_at=row.resolved_at,
+        created_at=row.created_at
+    )
+
+def _alert_list_response(rows: List[db_models.Alert]) -> Response:
+    """Serialize ORM rows as a JSON alert list in one pass"""
+    body = _ALERT_LIST_ADAPTER.dump_json([_alert_out(row) for row in rows], by_alias=True)
+    return Response(content=body, media_type="application/json")
+
 @router.get("/", response_model=List[Alert])
 async def get_alerts(
-    skip: int = 0,
     limit: int = 100,
+    before: Optional[datetime] = None,
+    before_id: Optional[str] = None,
     alert_type: Optional[AlertType] = None,
     acknowledged: Optional[bool] = None,
     resolved: Optional[bool] = None,
@@ -24,20 +56,47 @@ async def get_alerts(
     db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_user)
 ):
-    """Get alerts with optional filtering"""
-    query = db.query(db_models.Alert)
+    """Get alerts with optional filtering, newest first.
+    
+    Pages with a (created_at, id) keyset cursor: pass the X-Next-Before and
+    X-Next-Before-Id headers of the previous page as before/before_id.
+    """
+    # Each lambda is cached by its code location, so every combination of
+    # filters compiles once and later calls only bind new parameter values
+    stmt = lambda_stmt(lambda: select(db_models.Alert))
     
     if alert_type:
-        query = query.filter(db_models.Alert.alert_type == alert_type.value)
+        alert_type_value = alert_type.value
+        stmt += lambda s: s.where(db_models.Alert.alert_type == alert_type_value)
     if acknowledged is not None:
-        query = query.filter(db_models.Alert.acknowledged == acknowledged)
+        stmt += lambda s: s.where(db_models.Alert.acknowledged == acknowledged)
     if resolved is not None:
-        query = query.filter(db_models.Alert.resolved == resolved)
+        stmt += lambda s: s.where(db_models.Alert.resolved == resolved)
     if room:
-        query = query.filter(db_models.Alert.room == room)
+        stmt += lambda s: s.where(db_models.Alert.room == room)
+    # The cursor is compared (and rows ordered) on the normalized timestamp; the
+    # raw column is text in two formats on SQLite (see sortable_timestamp)
+    if before is not None:
+        if before_id is not None:
+            stmt += lambda s: s.where(or_(
+                db_models.ALERT_CREATED_SORT < db_models.sortable_timestamp(before),
+                and_(
+                    db_models.ALERT_CREATED_SORT == db_models.sortable_timestamp(before),
+                    db_models.Alert.id < before_id
+                )
+            ))
+        else:
+            stmt += lambda s: s.where(db_models.ALERT_CREATED_SORT < db_models.sortable_timestamp(before))
+    
+    stmt += lambda s: s.order_by(db_models.ALERT_CREATED_SORT.desc(), db_models.Alert.id.desc()).limit(limit)
+    alerts = db.execute(stmt).scalars().all()
+    
+    response = _alert_list_response(alerts)
+    if alerts and len(alerts) == limit:
+        response.headers["X-Next-Before"] = alerts[-1].created_at.isoformat()
+        response.headers["X-Next-Before-Id"] = alerts[-1].id
     
-    alerts = query.order_by(db_models.Alert.created_at.desc()).offset(skip).limit(limit).all()
-    return alerts
+    return response
 
 @router.post("/", response_model=Alert)
 async def create_alert(
@@ -53,7 +112,7 @@ async def create_alert(
         room=alert.room,
         patient_id=alert.patient_id,
         priority=alert.priority,
-        metadata=alert.metadata
+        meta=alert.metadata
     )
     
     db.add(db_alert)
@@ -71,11 +130,21 @@ async def get_alert(
     current_user: db_models.User = Depends(get_current_user)
 ):
     """Get a specific alert"""
-    alert = db.query(db_models.Alert).filter(db_models.Alert.id == alert_id).first()
+    alert = db.get(db_models.Alert, alert_id)
     if alert is None:
         raise HTTPException(status_code=404, detail="Alert not found")
     return alert
 
+def _flag_values(flag: str, value: bool, user_id: str) -> dict:
+    """SET clause for an acknowledged/resolved flag; who/when change only when the flag flips"""
+    column = getattr(db_models.Alert, flag)
+    flipped = column != value
+    return {
+        flag: value,
+        f"{flag}_by": case((flipped, user_id if value else None), else_=getattr(db_models.Alert, f"{flag}_by")),
+        f"{flag}_at": case((flipped, func.now() if value else None), else_=getattr(db_models.Alert, f"{flag}_at"))
+    }
+
 @router.put("/{alert_id}", response_model=Alert)
 async def update_alert(
     alert_id: str,
@@ -84,47 +153,41 @@ async def update_alert(
     current_user: db_models.User = Depends(get_current_user)
 ):
     """Update an alert (acknowledge or resolve)"""
-    alert = db.query(db_models.Alert).filter(db_models.Alert.id == alert_id).first()
+    values = {}
+    if alert_update.acknowledged is not None:
+        values.update(_flag_values("acknowledged", alert_update.acknowledged, current_user.id))
+    if alert_update.resolved is not None:
+        values.update(_flag_values("resolved", alert_update.resolved, current_user.id))
+    
+    if not values:
+        alert = db.get(db_models.Alert, alert_id)
+        if alert is None:
+            raise HTTPException(status_code=404, detail="Alert not found")
+        return _alert_out(alert)
+    
+    stmt = (
+        update(db_models.Alert)
+        .where(db_models.Alert.id == alert_id)
+        .values(**values)
+        .returning(db_models.Alert)
+    )
+    alert = db.execute(stmt).scalar_one_or_none()
     if alert is None:
         raise HTTPException(status_code=404, detail="Alert not found")
     
-    # Update acknowledgment
-    if alert_update.acknowledged is not None and alert_update.acknowledged != alert.acknowledged:
-        alert.acknowledged = alert_update.acknowledged
-        if alert_update.acknowledged:
-            alert.acknowledged_by = current_user.id
-            alert.acknowledged_at = datetime.utcnow()
-        else:
-            alert.acknowledged_by = None
-            alert.acknowledged_at = None
-    
-    # Update resolution
-    if alert_update.resolved is not None and alert_update.resolved != alert.resolved:
-        alert.resolved = alert_update.resolved
-        if alert_update.resolved:
-            alert.resolved_by = current_user.id
-            alert.resolved_at = datetime.utcnow()
-        else:
-            alert.resolved_by = None
-            alert.resolved_at = None
-    
+    result = _alert_out(alert)
     db.commit()
-    db.refresh(alert)
     
-    return alert
+    return result
 
 @router.delete("/{alert_id}")
 async def delete_alert(
     alert_id: str,
     db: Session = Depends(get_db),
-    current_user: db_models.User = Depends(get_current_user)
+    current_user: db_models.User = Depends(require_role("admin"))
 ):
     """Delete an alert"""
-    # Only admin can delete alerts
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Only administrators can delete alerts")
-    
-    alert = db.query(db_models.Alert).filter(db_models.Alert.id == alert_id).first()
+    alert = db.get(db_models.Alert, alert_id)
     if alert is None:
         raise HTTPException(status_code=404, detail="Alert not found")
     
@@ -133,6 +196,30 @@ async def delete_alert(
     
     return {"message": "Alert deleted successfully"}
 
+@router.post("/acknowledge")
+async def acknowledge_alerts(
+    alert_ids: List[str],
+    db: Session = Depends(get_db),
+    current_user: db_models.User = Depends(get_current_user)
+):
+    """Acknowledge several alerts in one statement"""
+    stmt = (
+        update(db_models.Alert)
+        .where(db_models.Alert.id.in_(alert_ids), db_models.Alert.acknowledged == False)
+        .values(acknowledged=True, acknowledged_by=current_user.id, acknowledged_at=func.now())
+        .returning(db_models.Alert.id)
+    )
+    acknowledged = db.execute(stmt).scalars().all()
+    db.commit()
+    
+    return {"message": f"{len(acknowledged)} alerts acknowledged", "acknowledged": acknowledged}
+
+def _missing_or_conflict(db: Session, alert_id: str, detail: str) -> HTTPException:
+    """Tell a missing alert apart from one whose guarded UPDATE matched nothing"""
+    if db.get(db_models.Alert, alert_id) is None:
+        return HTTPException(status_code=404, detail="Alert not found")
+    return HTTPException(status_code=400, detail=detail)
+
 @router.post("/{alert_id}/acknowledge")
 async def acknowledge_alert(
     alert_id: str,
@@ -140,21 +227,22 @@ async def acknowledge_alert(
     current_user: db_models.User = Depends(get_current_user)
 ):
     """Acknowledge an alert"""
-    alert = db.query(db_models.Alert).filter(db_models.Alert.id == alert_id).first()
+    stmt = (
+        update(db_models.Alert)
+        .where(db_models.Alert.id == alert_id, db_models.Alert.acknowledged == False)
+        .values(acknowledged=True, acknowledged_by=current_user.id, acknowledged_at=func.now())
+        .returning(db_models.Alert)
+    )
+    alert = db.execute(stmt).scalar_one_or_none()
     if alert is None:
-        raise HTTPException(status_code=404, detail="Alert not found")
-    
-    if alert.acknowledged:
-        raise HTTPException(status_code=400, detail="Alert already acknowledged")
-    
-    alert.acknowledged = True
-    alert.acknowledged_by = current_user.id
-    alert.acknowledged_at = datetime.utcnow()
+        raise _missing_or_conflict(db, alert_id, "Alert already acknowledged")
     
+    # RETURNING already carries the database-assigned timestamp; snapshot it
+    # before commit expires the instance
+    result = _alert_out(alert)
     db.commit()
-    db.refresh(alert)
     
-    return {"message": "Alert acknowledged", "alert": alert}
+    return {"message": "Alert acknowledged", "alert": result}
 
 @router.post("/{alert_id}/resolve")
 async def resolve_alert(
@@ -163,27 +251,29 @@ async def resolve_alert(
     current_user: db_models.User = Depends(get_current_user)
 ):
     """Resolve an alert"""
-    alert = db.query(db_models.Alert).filter(db_models.Alert.id == alert_id).first()
-    if alert is None:
-        raise HTTPException(status_code=404, detail="Alert not found")
-    
-    if alert.resolved:
-        raise HTTPException(status_code=400, detail="Alert already resolved")
-    
     # Auto-acknowledge if not already acknowledged
-    if not alert.acknowledged:
-        alert.acknowledged = True
-        alert.acknowledged_by = current_user.id
-        alert.acknowledged_at = datetime.utcnow()
-    
-    alert.resolved = True
-    alert.resolved_by = current_user.id
-    alert.resolved_at = datetime.utcnow()
+    unacknowledged = db_models.Alert.acknowledged == False
+    stmt = (
+        update(db_models.Alert)
+        .where(db_models.Alert.id == alert_id, db_models.Alert.resolved == False)
+        .values(
+            acknowledged=True,
+            acknowledged_by=case((unacknowledged, current_user.id), else_=db_models.Alert.acknowledged_by),
+            acknowledged_at=case((unacknowledged, func.now()), else_=db_models.Alert.acknowledged_at),
+            resolved=True,
+            resolved_by=current_user.id,
+            resolved_at=func.now()
+        )
+        .returning(db_models.Alert)
+    )
+    alert = db.execute(stmt).scalar_one_or_none()
+    if alert is None:
+        raise _missing_or_conflict(db, alert_id, "Alert already resolved")
     
+    result = _alert_out(alert)
     db.commit()
-    db.refresh(alert)
     
-    return {"message": "Alert resolved", "alert": alert}
+    return {"message": "Alert resolved", "alert": result}
 
 @router.get("/room/{room_name}", response_model=List[Alert])
 async def get_room_alerts(
@@ -199,32 +289,29 @@ async def get_room_alerts(
         query = query.filter(db_models.Alert.resolved == False)
     
     alerts = query.order_by(db_models.Alert.created_at.desc()).all()
-    return alerts
+    return _alert_list_response(alerts)
 
-@router.get("/stats/summary")
+@router.get("/stats/summary", dependencies=[Depends(cache_control)])
+@ttl_cached
 async def get_alert_stats(
     db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_user)
 ):
     """Get alert statistics summary"""
-    total_alerts = db.query(db_models.Alert).count()
-    active_alerts = db.query(db_models.Alert).filter(db_models.Alert.resolved == False).count()
-    critical_alerts = db.query(db_models.Alert).filter(
-        db_models.Alert.alert_type == "critical",
-        db_models.Alert.resolved == False
-    ).count()
-    warning_alerts = db.query(db_models.Alert).filter(
-        db_models.Alert.alert_type == "warning",
-        db_models.Alert.resolved == False
-    ).count()
-    unacknowledged_alerts = db.query(db_models.Alert).filter(
-        db_models.Alert.acknowledged == False
-    ).count()
+    active = db_models.Alert.resolved == False
+    stats = db.query(
+        func.count(db_models.Alert.id).label('total'),
+        func.sum(case((active, 1), else_=0)).label('active'),
+        func.sum(case((and_(db_models.Alert.alert_type == "critical", active), 1), else_=0)).label('critical'),
+        func.sum(case((and_(db_models.Alert.alert_type == "warning", active), 1), else_=0)).label('warning'),
+        func.sum(case((db_models.Alert.acknowledged == False, 1), else_=0)).label('unacknowledged')
+    ).one()
     
+    # SUM over an empty table yields NULL
     return {
-        "total_alerts": total_alerts,
-        "active_alerts": active_alerts,
-        "critical_alerts": critical_alerts,
-        "warning_alerts": warning_alerts,
-        "unacknowledged_alerts": unacknowledged_alerts
+        "total_alerts": stats.total,
+        "active_alerts": stats.active or 0,
+        "critical_alerts": stats.critical or 0,
+        "warning_alerts": stats.warning or 0,
+        "unacknowledged_alerts": stats.unacknowledged or 0
     }
\ No newline at end of file
@@ -2,19 +2,23 @@
 Analytics router for system analytics and reporting
 """
 from typing import List, Dict, Any
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import case, func, select, union
 
+from app.cache import cache_control, ttl_cached
 from app.database import get_db
 from app.models import database_models as db_models
-from app.models.schemas import SystemStats, CameraStats, PatientStats
+from app.models.schemas.analytics import SystemStats, CameraStats, PatientStats
 from app.routers.auth import get_current_user
+from app.services.gpt_service import GPTService, get_gpt_service
 
 router = APIRouter()
 
-@router.get("/system-stats", response_model=SystemStats)
+@router.get("/system-stats", response_model=SystemStats, dependencies=[Depends(cache_control)])
+@ttl_cached
 async def get_system_stats(
     db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_user)
@@ -39,66 +43,69 @@ async def get_system_stats(
         avg_response_time=avg_response_time
     )
 
-@router.get("/camera-stats", response_model=List[CameraStats])
+@router.get("/camera-stats", response_model=List[CameraStats], dependencies=[Depends(cache_control)])
+@ttl_cached
 async def get_camera_stats(
     db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_user)
 ):
     """Get statistics for all cameras"""
-    cameras = db.query(db_models.Camera).all()
-    stats = []
-    
-    for camera in cameras:
-        detection_count = db.query(db_models.Detection).filter(
-            db_models.Detection.camera_id == camera.id
-        ).count()
-        
-        last_detection = db.query(db_models.Detection).filter(
-            db_models.Detection.camera_id == camera.id
-        ).order_by(db_models.Detection.timestamp.desc()).first()
-        
-        stats.append(CameraStats(
-            camera_id=camera.id,
-            room=camera.room,
-            detections_count=detection_count,
-            last_detection=last_detection.timestamp if last_detection else None
-        ))
+    rows = db.query(
+        db_models.Camera.id,
+        db_models.Camera.room,
+        func.count(db_models.Detection.id).label('detections_count'),
+        func.max(db_models.Detection.timestamp).label('last_detection')
+    ).outerjoin(
+        db_models.Detection, db_models.Detection.camera_id == db_models.Camera.id
+    ).group_by(db_models.Camera.id, db_models.Camera.room).all()
     
-    return stats
+    return [
+        CameraStats(
+            camera_id=row.id,
+            room=row.room,
+            detections_count=row.detections_count,
+            last_detection=row.last_detection
+        )
+        for row in rows
+    ]
 
-@router.get("/patient-stats", response_model=List[PatientStats])
+@router.get("/patient-stats", response_model=List[PatientStats], dependencies=[Depends(cache_control)])
+@ttl_cached
 async def get_patient_stats(
     db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_user)
 ):
     """Get statistics for all patients"""
-    patients = db.query(db_models.Patient).all()
-    stats = []
+    event_rows = db.query(
+        db_models.Patient.id,
+        db_models.Patient.name,
+        func.count(db_models.PatientEvent.id).label('events_count'),
+        func.max(db_models.PatientEvent.timestamp).label('last_activity')
+    ).outerjoin(
+        db_models.PatientEvent, db_models.PatientEvent.patient_id == db_models.Patient.id
+    ).group_by(db_models.Patient.id, db_models.Patient.name).all()
     
-    for patient in patients:
-        events_count = db.query(db_models.PatientEvent).filter(
-            db_models.PatientEvent.patient_id == patient.id
-        ).count()
-        
-        alerts_count = db.query(db_models.Alert).filter(
-            db_models.Alert.patient_id == patient.id
-        ).count()
-        
-        last_activity = db.query(db_models.PatientEvent).filter(
-            db_models.PatientEvent.patient_id == patient.id
-        ).order_by(db_models.PatientEvent.timestamp.desc()).first()
-        
-        stats.append(PatientStats(
-            patient_id=patient.id,
-            name=patient.name,
-            events_count=events_count,
-            alerts_count=alerts_count,
-            last_activity=last_activity.timestamp if last_activity else None
-        ))
+    # Alert counts keyed by patient (only patients with alerts appear here)
+    alert_counts = dict(db.query(
+        db_models.Alert.patient_id,
+        func.count(db_models.Alert.id)
+    ).filter(
+        db_models.Alert.patient_id.isnot(None)
+    ).group_by(db_models.Alert.patient_id).all())
     
-    return stats
+    return [
+        PatientStats(
+            patient_id=row.id,
+            name=row.name,
+            events_count=row.events_count,
+            alerts_count=alert_counts.get(row.id, 0),
+            last_activity=row.last_activity
+        )
+        for row in event_rows
+    ]
 
-@router.get("/alerts-timeline")
+@router.get("/alerts-timeline", dependencies=[Depends(cache_control)])
+@ttl_cached
 async def get_alerts_timeline(
     days: int = Query(7, description="Number of days to analyze"),
     db: Session = Depends(get_db),
@@ -121,7 +128,8 @@ async def get_alerts_timeline(
     # Format data for charts
     timeline_data = {}
     for alert in alerts:
-        date_str = alert.date.strftime('%Y-%m-%d')
+        # date() comes back as a string on SQLite and a date elsewhere
+        date_str = str(alert.date)
         if date_str not in timeline_data:
             timeline_data[date_str] = {'critical': 0, 'warning': 0, 'info': 0}
         timeline_data[date_str][alert.alert_type] = alert.count
@@ -132,7 +140,8 @@ async def get_alerts_timeline(
         "total_alerts": sum(sum(day.values()) for day in timeline_data.values())
     }
 
-@router.get("/detection-trends")
+@router.get("/detection-trends", dependencies=[Depends(cache_control)])
+@ttl_cached
 async def get_detection_trends(
     camera_id: str = Query(None, description="Filter by specific camera"),
     hours: int = Query(24, description="Number of hours to analyze"),
@@ -142,8 +151,15 @@ async def get_detection_trends(
     """Get detection trends for analysis"""
     start_time = datetime.utcnow() - timedelta(hours=hours)
     
+    if db.get_bind().dialect.name == "sqlite":
+        hour_bucket = db_models.DETECTION_HOUR_BUCKET
+        bucket_start = lambda bucket: datetime.fromtimestamp(bucket * 3600, timezone.utc)
+    else:
+        hour_bucket = func.date_trunc('hour', db_models.Detection.timestamp)
+        bucket_start = lambda bucket: bucket
+    
     query = db.query(
-        func.strftime('%Y-%m-%d %H', db_models.Detection.timestamp).label('hour'),
+        hour_bucket.label('hour'),
         db_models.Detection.detection_type,
         func.count(db_models.Detection.id).label('count')
     ).filter(
@@ -153,15 +169,15 @@ async def get_detection_trends(
     if camera_id:
         query = query.filter(db_models.Detection.camera_id == camera_id)
     
-    detections = query.group_by(
-        func.strftime('%Y-%m-%d %H', db_models.Detection.timestamp),
-        db_models.Detection.detection_type
-    ).all()
+    detections = query.group_by(hour_bucket, db_models.Detection.detection_type).all()
     
-    # Format data
+    # Format data; only the distinct buckets are turned into strings
     trends_data = {}
+    labels = {}
     for detection in detections:
-        hour = detection.hour
+        if detection.hour not in labels:
+            labels[detection.hour] = bucket_start(detection.hour).strftime('%Y-%m-%d %H')
+        hour = labels[detection.hour]
         if hour not in trends_data:
             trends_data[hour] = {}
         trends_data[hour][detection.detection_type] = detection.count
@@ -172,60 +188,59 @@ async def get_detection_trends(
         "trends": trends_data
     }
 
-@router.get("/room-activity")
+@router.get("/room-activity", dependencies=[Depends(cache_control)])
+@ttl_cached
 async def get_room_activity(
     db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_user)
 ):
     """Get activity summary by room"""
-    # Get patient count by room
-    patient_counts = db.query(
-        db_models.Patient.room,
+    patient_sq = db.query(
+        db_models.Patient.room.label('room'),
         func.count(db_models.Patient.id).label('patient_count')
-    ).group_by(db_models.Patient.room).all()
+    ).group_by(db_models.Patient.room).subquery()
     
-    # Get alert counts by room
-    alert_counts = db.query(
-        db_models.Alert.room,
+    alert_sq = db.query(
+        db_models.Alert.room.label('room'),
         func.count(db_models.Alert.id).label('alert_count')
     ).filter(
         db_models.Alert.resolved == False
-    ).group_by(db_models.Alert.room).all()
+    ).group_by(db_models.Alert.room).subquery()
     
-    # Get camera counts by room
-    camera_counts = db.query(
-        db_models.Camera.room,
+    camera_sq = db.query(
+        db_models.Camera.room.label('room'),
         func.count(db_models.Camera.id).label('camera_count')
     ).filter(
         db_models.Camera.status == "active"
-    ).group_by(db_models.Camera.room).all()
+    ).group_by(db_models.Camera.room).subquery()
     
-    # Combine data
-    room_activity = {}
+    # SQLite has no FULL OUTER JOIN, so drive the joins from the union of room keys
+    rooms_sq = union(
+        select(patient_sq.c.room),
+        select(alert_sq.c.room),
+        select(camera_sq.c.room)
+    ).subquery()
     
-    for room_data in patient_counts:
-        room = room_data.room
-        room_activity[room] = {
-            'patients': room_data.patient_count,
-            'alerts': 0,
-            'cameras': 0
-        }
-    
-    for room_data in alert_counts:
-        room = room_data.room
-        if room not in room_activity:
-            room_activity[room] = {'patients': 0, 'alerts': 0, 'cameras': 0}
-        room_activity[room]['alerts'] = room_data.alert_count
-    
-    for room_data in camera_counts:
-        room = room_data.room
-        if room not in room_activity:
-            room_activity[room] = {'patients': 0, 'alerts': 0, 'cameras': 0}
-        room_activity[room]['cameras'] = room_data.camera_count
+    rows = db.query(
+        rooms_sq.c.room,
+        func.coalesce(patient_sq.c.patient_count, 0).label('patients'),
+        func.coalesce(alert_sq.c.alert_count, 0).label('alerts'),
+        func.coalesce(camera_sq.c.camera_count, 0).label('cameras')
+    ).select_from(rooms_sq).outerjoin(
+        patient_sq, patient_sq.c.room == rooms_sq.c.room
+    ).outerjoin(
+        alert_sq, alert_sq.c.room == rooms_sq.c.room
+    ).outerjoin(
+        camera_sq, camera_sq.c.room == rooms_sq.c.room
+    ).all()
     
-    return room_activity
+    return {
+        row.room: {'patients': row.patients, 'alerts': row.alerts, 'cameras': row.cameras}
+        for row in rows
+    }
 
-@router.get("/performance-metrics")
+@router.get("/performance-metrics", dependencies=[Depends(cache_control)])
+@ttl_cached
 async def get_performance_metrics(
     db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_user)
@@ -248,38 +263,81 @@ async def get_performance_metrics(
         }
     }
 
+def _shift_report_inputs(db: Session, start_time: datetime):
+    """Rows the shift handover prompt is built from: critical patients and alerts since start_time"""
+    # The handover prompt only describes critical patients and alert headlines,
+    # so fetch just those columns instead of hydrating full ORM rows
+    critical_patients = db.query(
+        db_models.Patient.name,
+        db_models.Patient.room,
+        db_models.Patient.status,
+        db_models.Patient.ai_summary
+    ).filter(db_models.Patient.status == "critical").all()
+    
+    alerts = db.query(
+        db_models.Alert.created_at,
+        db_models.Alert.title,
+        db_models.Alert.alert_type
+    ).filter(db_models.Alert.created_at >= start_time).order_by(db_models.Alert.created_at.desc()).all()
+    
+    return critical_patients, alerts
+
 @router.get("/shift-report")
 async def generate_shift_report(
     hours: int = Query(8, description="Shift duration in hours"),
     db: Session = Depends(get_db),
+    gpt_service: GPTService = Depends(get_gpt_service),
     current_user: db_models.User = Depends(get_current_user)
 ):
     """Generate shift handover report"""
-    from app.services.gpt_service import GPTService
-    
     start_time = datetime.utcnow() - timedelta(hours=hours)
     
-    # Get patients
-    patients = db.query(db_models.Patient).all()
+    patient_stats = db.query(
+        func.count(db_models.Patient.id).label('total'),
+        func.sum(case((db_models.Patient.status == "critical", 1), else_=0)).label('critical')
+    ).one()
+    
+    in_shift = db_models.Alert.created_at >= start_time
+    alert_stats = db.query(
+        func.count(db_models.Alert.id).label('total'),
+        func.sum(case((db_models.Alert.alert_type == "critical", 1), else_=0)).label('critical'),
+        func.sum(case((db_models.Alert.resolved == False, 1), else_=0)).label('unresolved')
+    ).filter(in_shift).one()
     
-    # Get alerts from this shift
-    alerts = db.query(db_models.Alert).filter(
-        db_models.Alert.created_at >= start_time
-    ).order_by(db_models.Alert.created_at.desc()).all()
+    critical_patients, alerts = _shift_report_inputs(db, start_time)
     
     # Generate AI summary
-    gpt_service = GPTService()
-    summary = await gpt_service.generate_shift_summary(patients, alerts, hours)
+    summary = await gpt_service.generate_shift_summary(critical_patients, alerts, hours)
     
+    # SUM over no rows yields NULL
     return {
         "shift_duration_hours": hours,
         "report_generated_at": datetime.utcnow().isoformat(),
         "summary": summary,
         "statistics": {
-            "total_patients": len(patients),
-            "critical_patients": len([p for p in patients if p.status == "critical"]),
-            "total_alerts": len(alerts),
-            "critical_alerts": len([a for a in alerts if a.alert_type == "critical"]),
-            "unresolved_alerts": len([a for a in alerts if not a.resolved])
+            "total_patients": patient_stats.total,
+            "critical_patients": patient_stats.critical or 0,
+            "total_alerts": alert_stats.total,
+            "critical_alerts": alert_stats.critical or 0,
+            "unresolved_alerts": alert_stats.unresolved or 0
         }
-    }
\ No newline at end of file
+    }
+
+@router.get("/shift-report/stream", response_class=StreamingResponse)
+async def stream_shift_report(
+    hours: int = Query(8, description="Shift duration in hours"),
+    db: Session = Depends(get_db),
+    gpt_service: GPTService = Depends(get_gpt_service),
+    current_user: db_models.User = Depends(get_current_user)
+):
+    """Shift handover summary streamed as plain text while it is generated"""
+    critical_patients, alerts = _shift_report_inputs(db, datetime.utcnow() - timedelta(hours=hours))
+    # Generation takes seconds; don't hold a pooled connection for it
+    db.close()
+    
+    # Gzip would hold text back in its buffer until the summary is done
+    return StreamingResponse(
+        gpt_service.stream_shift_summary(critical_patients, alerts, hours),
+        media_type="text/plain; charset=utf-8",
+        headers={"Content-Encoding": "identity"}
+    )
@@ -1,82 +1,155 @@
 """
 Authentication router for user login and token management
 """
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Tuple
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
-from jose import JWTError, jwt
+import bcrypt
+from cachetools import TTLCache
+from jose import JWTError, jwk, jwt
 
 from app.database import get_db
 from app.config import get_settings
 from app.models import database_models as db_models
-from app.models.schemas import Token, User, UserCreate, UserRole
+from app.models.schemas.auth import Token, User, UserCreate, UserRole
 
 settings = get_settings()
 router = APIRouter()
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+# Settings are frozen, so read the token parameters once. The key is built into
+# a jose Key up front; given a plain secret, jose reconstructs it on every call
+_JWT_ALG = settings.JWT_ALGORITHM
+_JWT_KEY = jwk.construct(settings.JWT_SECRET_KEY, _JWT_ALG)
+_DEFAULT_EXP = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+
+# bcrypt is deliberately slow and releases the GIL, so run it on threads
+# instead of stalling the event loop for every login
+bcrypt_pool = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="bcrypt")
+
+# Decoded subject, role and expiry per raw token, so repeat requests skip the
+# HMAC check and JSON parse. Only touched from the event loop, so no lock is needed
+_token_cache = TTLCache(maxsize=10_000, ttl=60)
+
+# bcrypt hash of the demo password, computed on first use and shared by every demo role
+_demo_password_hash: Optional[str] = None
+
+def _check_password(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
+    except ValueError:
+        # Stored value is not a bcrypt hash (e.g. seeded placeholder data)
+        return False
+
+def _hash_password(password: str) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)).decode()
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(bcrypt_pool, _check_password, plain_password, hashed_password)
 
-def get_password_hash(password: str) -> str:
+async def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(bcrypt_pool, _hash_password, password)
+
+async def _get_demo_password_hash() -> str:
+    global _demo_password_hash
+    if _demo_password_hash is None:
+        _demo_password_hash = await get_password_hash("demo123")
+    return _demo_password_hash
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+def create_access_token(sub: str, role: str, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
-    return encoded_jwt
+    expire = datetime.utcnow() + (expires_delta or _DEFAULT_EXP)
+    return jwt.encode({"sub": sub, "role": role, "exp": expire}, _JWT_KEY, algorithm=_JWT_ALG)
 
 def get_user(db: Session, username: str) -> Optional[db_models.User]:
-    """Get user by username"""
-    return db.query(db_models.User).filter(db_models.User.username == username).first()
+    """Get user by username, memoized on the request's session"""
+    # Sessions are per request (get_db), so Session.info scopes this cache to the request
+    users = db.info.setdefault("users_by_name", {})
+    user = users.get(username)
+    if user is None:
+        user = db.query(db_models.User).filter(db_models.User.username == username).first()
+        if user is not None:
+            users[username] = user
+    return user
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[db_models.User]:
+async def authenticate_user(db: Session, username: str, password: str) -> Optional[db_models.User]:
     """Authenticate user credentials"""
     user = get_user(db, username)
-    if not user or not verify_password(password, user.hashed_password):
+    if not user or not await verify_password(password, user.hashed_password):
         return None
     return user
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> db_models.User:
-    """Get current authenticated user"""
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _decode_token(token: str) -> Tuple[str, Optional[str]]:
+    """Username and role claims of a valid token"""
+    cached = _token_cache.get(token)
+    if cached is not None and cached[2] > time.time():
+        return cached[0], cached[1]
     
     try:
-        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
+        payload = jwt.decode(token, _JWT_KEY, algorithms=[_JWT_ALG])
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+    username: str = payload.get("sub")
+    if username is None:
+        raise _credentials_exception()
     
+    _token_cache[token] = (username, payload.get("role"), payload.get("exp", 0))
+    return username, payload.get("role")
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> db_models.User:
+    """Get current authenticated user"""
+    username, _ = _decode_token(token)
     user = get_user(db, username=username)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
 
+@lru_cache(maxsize=None)
+def require_role(role: str):
+    """Dependency that only admits users with the given role
+    
+    The role claim is checked before the user is loaded, so rejected requests
+    cost no query. The stored role is checked too, in case it changed after
+    the token was issued. Cached so each role maps to one overridable callable.
+    """
+    async def role_checker(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> db_models.User:
+        forbidden = HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Requires {role} role")
+        username, token_role = _decode_token(token)
+        if token_role != role:
+            raise forbidden
+        user = get_user(db, username=username)
+        if user is None:
+            raise _credentials_exception()
+        if user.role != role:
+            raise forbidden
+        return user
+    
+    return role_checker
+
 @router.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """Login endpoint to get access token"""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -84,38 +157,40 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username, "role": user.role}, 
-        expires_delta=access_token_expires
-    )
+    access_token = create_access_token(user.username, user.role)
     
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/register", response_model=User)
 async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
     """Register a new user"""
-    # Check if user already exists
-    if get_user(db, user_data.username):
+    # Check if user already exists; EXISTS avoids loading the row
+    taken = db.query(
+        db.query(db_models.User).filter(db_models.User.username == user_data.username).exists()
+    ).scalar()
+    if taken:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
-    db_user = db_models.User(
-        username=user_data.username,
-        email=user_data.email,
-        hashed_password=hashed_password,
-        role=user_data.role.value
-    )
+    hashed_password = await get_password_hash(user_data.password)
+    # INSERT ... RETURNING gets server defaults back without a refresh SELECT
+    db_user = db.execute(
+        insert(db_models.User).values(
+            username=user_data.username,
+            email=user_data.email,
+            hashed_password=hashed_password,
+            role=user_data.role.value
+        ).returning(db_models.User)
+    ).scalar_one()
     
-    db.add(db_user)
+    # Serialize before commit expires the instance
+    result = User.model_validate(db_user)
     db.commit()
-    db.refresh(db_user)
     
-    return db_user
+    return result
 
 @router.get("/me", response_model=User)
 async def read_users_me(current_user: db_models.User = Depends(get_current_user)):
@@ -130,7 +205,7 @@ async def demo_login(role: str = "doctor", db: Session = Depends(get_db)):
     user = get_user(db, demo_username)
     
     if not user:
-        hashed_password = get_password_hash("demo123")
+        hashed_password = await _get_demo_password_hash()
         user = db_models.User(
             username=demo_username,
             email=f"{demo_username}@hexward.demo",
@@ -142,11 +217,7 @@ async def demo_login(role: str = "doctor", db: Session = Depends(get_db)):
         db.refresh(user)
     
     # Generate token
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username, "role": user.role}, 
-        expires_delta=access_token_expires
-    )
+    access_token = create_access_token(user.username, user.role)
     
     return {
         "access_token": access_token, 
@@ -2,16 +2,25 @@
 Cameras router for camera management and live feeds
 """
 from typing import List, Optional
+from datetime import datetime
+import orjson
 from fastapi import APIRouter, Depends, HTTPException, status, Response
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import and_, case, func, insert, or_, update
+from sqlalchemy.orm import Session, load_only
 
 from app.database import get_db
 from app.models import database_models as db_models
-from app.models.schemas import Camera, CameraCreate, CameraUpdate, Detection, LiveFeedData
-from app.routers.auth import get_current_user
+from app.models.schemas.analytics import LiveFeedData
+from app.models.schemas.camera import Camera, CameraCreate, CameraUpdate, Detection
+from app.routers.auth import get_current_user, require_role
 
 router = APIRouter()
 
+# Built once; the detections list serializes through it in one pass
+_DETECTION_LIST_ADAPTER = TypeAdapter(List[Detection])
+
 # Global camera service reference (will be injected)
 camera_service = None
 
@@ -25,40 +34,63 @@ def get_camera_service():
 
 @router.get("/", response_model=List[Camera])
 async def get_cameras(
-    skip: int = 0,
+    response: Response,
+    after: Optional[str] = None,
     limit: int = 100,
     db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_user)
 ):
-    """Get all cameras"""
-    cameras = db.query(db_models.Camera).offset(skip).limit(limit).all()
+    """Get all cameras, ordered by id.
+    
+    Pages with an id keyset cursor: pass the X-Next-After header of the
+    previous page as after.
+    """
+    query = db.query(db_models.Camera)
+    if after is not None:
+        query = query.filter(db_models.Camera.id > after)
+    
+    # Only the columns the Camera schema exposes
+    cameras = query.options(load_only(
+        db_models.Camera.id,
+        db_models.Camera.name,
+        db_models.Camera.room,
+        db_models.Camera.camera_index,
+        db_models.Camera.rtsp_url,
+        db_models.Camera.status,
+        db_models.Camera.last_frame_time,
+        db_models.Camera.detection_enabled,
+        db_models.Camera.recording_enabled,
+        db_models.Camera.created_at
+    )).order_by(db_models.Camera.id).limit(limit).all()
+    
+    if cameras and len(cameras) == limit:
+        response.headers["X-Next-After"] = cameras[-1].id
     return cameras
 
 @router.post("/", response_model=Camera)
 async def create_camera(
     camera: CameraCreate,
     db: Session = Depends(get_db),
-    current_user: db_models.User = Depends(get_current_user)
+    current_user: db_models.User = Depends(require_role("admin"))
 ):
     """Create a new camera"""
-    # Only admin can create cameras
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Only administrators can create cameras")
-    
-    db_camera = db_models.Camera(
-        name=camera.name,
-        room=camera.room,
-        camera_index=camera.camera_index,
-        rtsp_url=camera.rtsp_url
-    )
+    # INSERT ... RETURNING gets server defaults back without a refresh SELECT
+    db_camera = db.execute(
+        insert(db_models.Camera).values(
+            name=camera.name,
+            room=camera.room,
+            camera_index=camera.camera_index,
+            rtsp_url=camera.rtsp_url
+        ).returning(db_models.Camera)
+    ).scalar_one()
     
-    db.add(db_camera)
+    # Serialize before commit expires the instance
+    result = Camera.model_validate(db_camera)
     db.commit()
-    db.refresh(db_camera)
     
     # Add to camera service
     camera_svc = get_camera_service()
-    success = await camera_svc.add_camera(db_camera)
+    success = await camera_svc.add_camera(result)
     
     if not success:
         # Rollback database if camera service failed
@@ -66,7 +98,7 @@ async def create_camera(
         db.commit()
         raise HTTPException(status_code=400, detail="Failed to initialize camera")
     
-    return db_camera
+    return result
 
 @router.get("/{camera_id}", response_model=Camera)
 async def get_camera(
@@ -75,7 +107,7 @@ async def get_camera(
     current_user: db_models.User = Depends(get_current_user)
 ):
     """Get a specific camera"""
-    camera = db.query(db_models.Camera).filter(db_models.Camera.id == camera_id).first()
+    camera = db.get(db_models.Camera, camera_id)
     if camera is None:
         raise HTTPException(status_code=404, detail="Camera not found")
     return camera
@@ -85,43 +117,41 @@ async def update_camera(
     camera_id: str,
     camera_update: CameraUpdate,
     db: Session = Depends(get_db),
-    current_user: db_models.User = Depends(get_current_user)
+    current_user: db_models.User = Depends(require_role("admin"))
 ):
     """Update a camera"""
-    # Only admin can update cameras
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Only administrators can update cameras")
-    
-    camera = db.query(db_models.Camera).filter(db_models.Camera.id == camera_id).first()
+    # Update fields; UPDATE ... RETURNING replaces the load, flush and refresh
+    update_data = camera_update.dict(exclude_unset=True)
+    if update_data:
+        camera = db.execute(
+            update(db_models.Camera)
+            .where(db_models.Camera.id == camera_id)
+            .values(**update_data)
+            .returning(db_models.Camera)
+        ).scalar_one_or_none()
+    else:
+        camera = db.get(db_models.Camera, camera_id)
     if camera is None:
         raise HTTPException(status_code=404, detail="Camera not found")
     
-    # Update fields
-    update_data = camera_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(camera, field, value)
-    
+    # Serialize before commit expires the instance
+    result = Camera.model_validate(camera)
     db.commit()
-    db.refresh(camera)
     
     # Update camera service if needed
     camera_svc = get_camera_service()
-    await camera_svc.update_camera_status(camera_id, camera.status)
+    await camera_svc.update_camera_status(camera_id, result.status)
     
-    return camera
+    return result
 
 @router.delete("/{camera_id}")
 async def delete_camera(
     camera_id: str,
     db: Session = Depends(get_db),
-    current_user: db_models.User = Depends(get_current_user)
+    current_user: db_models.User = Depends(require_role("admin"))
 ):
     """Delete a camera"""
-    # Only admin can delete cameras
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Only administrators can delete cameras")
-    
-    camera = db.query(db_models.Camera).filter(db_models.Camera.id == camera_id).first()
+    camera = db.get(db_models.Camera, camera_id)
     if camera is None:
         raise HTTPException(status_code=404, detail="Camera not found")
     
@@ -135,70 +165,117 @@ async def delete_camera(
     
     return {"message": "Camera deleted successfully"}
 
-@router.get("/{camera_id}/frame")
+@router.get(
+    "/{camera_id}/frame",
+    response_class=Response,
+    responses={200: {"content": {"image/jpeg": {}}}}
+)
 async def get_camera_frame(
     camera_id: str,
     annotated: bool = False,
     db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_user)
 ):
-    """Get current frame from camera"""
+    """Get current frame from camera as a JPEG image"""
     # Verify camera exists
-    camera = db.query(db_models.Camera).filter(db_models.Camera.id == camera_id).first()
+    camera = db.get(db_models.Camera, camera_id)
     if camera is None:
         raise HTTPException(status_code=404, detail="Camera not found")
     
     camera_svc = get_camera_service()
+    jpeg, detections = await camera_svc.get_camera_jpeg(camera_id, annotated=annotated)
+    if jpeg is None:
+        raise HTTPException(status_code=503, detail="Camera not available")
     
+    # Raw bytes instead of base64 in JSON; the small metadata rides in headers.
+    # JPEG doesn't compress, so skip gzip
+    headers = {"Content-Encoding": "identity"}
+    if camera.last_frame_time is not None:
+        headers["X-Timestamp"] = camera.last_frame_time.isoformat()
     if annotated:
-        frame_data, detections = await camera_svc.get_camera_frame_with_detections(camera_id)
-        if frame_data is None:
-            raise HTTPException(status_code=503, detail="Camera not available")
-        
-        return {
-            "camera_id": camera_id,
-            "frame_data": frame_data,
-            "detections": [d.dict() for d in detections],
-            "timestamp": camera.last_frame_time
-        }
-    else:
-        frame_data = await camera_svc.get_camera_frame(camera_id)
-        if frame_data is None:
-            raise HTTPException(status_code=503, detail="Camera not available")
-        
-        return {
-            "camera_id": camera_id,
-            "frame_data": frame_data,
-            "timestamp": camera.last_frame_time
-        }
+        headers["X-Detections"] = orjson.dumps(
+            [d.model_dump(mode="json") for d in detections]
+        ).decode()
+    
+    return Response(content=jpeg, media_type="image/jpeg", headers=headers)
+
+@router.get(
+    "/{camera_id}/stream",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"multipart/x-mixed-replace": {}}}}
+)
+async def stream_camera(
+    camera_id: str,
+    annotated: bool = False,
+    db: Session = Depends(get_db),
+    current_user: db_models.User = Depends(get_current_user)
+):
+    """Live MJPEG stream from a camera; viewers share one encode per frame"""
+    if db.get(db_models.Camera, camera_id) is None:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    # The stream can run for hours; don't hold a pooled connection for it
+    db.close()
+    
+    camera_svc = get_camera_service()
+    if camera_id not in camera_svc.active_cameras:
+        raise HTTPException(status_code=503, detail="Camera not available")
+    
+    # Gzip would hold frames back in its buffer
+    return StreamingResponse(
+        camera_svc.stream_mjpeg(camera_id, annotated=annotated),
+        media_type="multipart/x-mixed-replace; boundary=frame",
+        headers={"Content-Encoding": "identity"}
+    )
 
 @router.get("/{camera_id}/detections", response_model=List[Detection])
 async def get_camera_detections(
     camera_id: str,
-    skip: int = 0,
+    before: Optional[datetime] = None,
+    before_id: Optional[str] = None,
     limit: int = 50,
     db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_user)
 ):
-    """Get recent detections from a camera"""
-    detections = db.query(db_models.Detection).filter(
+    """Get recent detections from a camera, newest first.
+    
+    Pages with a (timestamp, id) keyset cursor: pass the X-Next-Before and
+    X-Next-Before-Id headers of the previous page as before/before_id.
+    """
+    query = db.query(db_models.Detection).filter(
         db_models.Detection.camera_id == camera_id
-    ).order_by(db_models.Detection.timestamp.desc()).offset(skip).limit(limit).all()
+    )
+    # Compared and ordered on the normalized timestamp (see sortable_timestamp)
+    if before is not None:
+        before_sort = db_models.sortable_timestamp(before)
+        if before_id is not None:
+            query = query.filter(or_(
+                db_models.DETECTION_TIME_SORT < before_sort,
+                and_(db_models.DETECTION_TIME_SORT == before_sort, db_models.Detection.id < before_id)
+            ))
+        else:
+            query = query.filter(db_models.DETECTION_TIME_SORT < before_sort)
+    
+    detections = query.order_by(
+        db_models.DETECTION_TIME_SORT.desc(), db_models.Detection.id.desc()
+    ).limit(limit).all()
     
-    return detections
+    body = _DETECTION_LIST_ADAPTER.dump_json(
+        _DETECTION_LIST_ADAPTER.validate_python(detections, from_attributes=True)
+    )
+    response = Response(content=body, media_type="application/json")
+    if detections and len(detections) == limit:
+        response.headers["X-Next-Before"] = detections[-1].timestamp.isoformat()
+        response.headers["X-Next-Before-Id"] = detections[-1].id
+    return response
 
 @router.post("/{camera_id}/start")
 async def start_camera(
     camera_id: str,
     db: Session = Depends(get_db),
-    current_user: db_models.User = Depends(get_current_user)
+    current_user: db_models.User = Depends(require_role("admin"))
 ):
     """Start camera processing"""
-    # Only admin can control cameras
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Only administrators can control cameras")
-    
-    camera = db.query(db_models.Camera).filter(db_models.Camera.id == camera_id).first()
+    camera = db.get(db_models.Camera, camera_id)
     if camera is None:
         raise HTTPException(status_code=404, detail="Camera not found")
     
@@ -206,7 +283,9 @@ async def start_camera(
     success = await camera_svc.add_camera(camera)
     
     if success:
-        camera.status = "active"
+        db.execute(
+            update(db_models.Camera).where(db_models.Camera.id == camera_id).values(status="active")
+        )
         db.commit()
         return {"message": "Camera started successfully"}
     else:
@@ -216,26 +295,28 @@ async def start_camera(
 async def stop_camera(
     camera_id: str,
     db: Session = Depends(get_db),
-    current_user: db_models.User = Depends(get_current_user)
+    current_user: db_models.User = Depends(require_role("admin"))
 ):
     """Stop camera processing"""
-    # Only admin can control cameras
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Only administrators can control cameras")
-    
-    camera = db.query(db_models.Camera).filter(db_models.Camera.id == camera_id).first()
-    if camera is None:
-        raise HTTPException(status_code=404, detail="Camera not found")
-    
+    # Stopping an id the service doesn't know is a no-op, so existence is
+    # checked by the UPDATE below instead of a separate SELECT
     camera_svc = get_camera_service()
     success = await camera_svc.remove_camera(camera_id)
     
-    if success:
-        camera.status = "offline"
-        db.commit()
-        return {"message": "Camera stopped successfully"}
-    else:
+    if not success:
         raise HTTPException(status_code=400, detail="Failed to stop camera")
+    
+    stopped = db.execute(
+        update(db_models.Camera)
+        .where(db_models.Camera.id == camera_id)
+        .values(status="offline")
+        .returning(db_models.Camera.id)
+    ).scalar_one_or_none()
+    if stopped is None:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    
+    db.commit()
+    return {"message": "Camera stopped successfully"}
 
 @router.get("/room/{room_name}")
 async def get_room_cameras(
@@ -253,16 +334,19 @@ async def get_camera_stats(
     current_user: db_models.User = Depends(get_current_user)
 ):
     """Get camera statistics summary"""
-    total_cameras = db.query(db_models.Camera).count()
-    active_cameras = db.query(db_models.Camera).filter(db_models.Camera.status == "active").count()
-    offline_cameras = db.query(db_models.Camera).filter(db_models.Camera.status == "offline").count()
+    stats = db.query(
+        func.count(db_models.Camera.id).label('total'),
+        func.sum(case((db_models.Camera.status == "active", 1), else_=0)).label('active'),
+        func.sum(case((db_models.Camera.status == "offline", 1), else_=0)).label('offline')
+    ).one()
     
     camera_svc = get_camera_service()
     processing_cameras = await camera_svc.get_active_camera_count()
     
+    # SUM over an empty table yields NULL
     return {
-        "total_cameras": total_cameras,
-        "active_cameras": active_cameras,
-        "offline_cameras": offline_cameras,
+        "total_cameras": stats.total,
+        "active_cameras": stats.active or 0,
+        "offline_cameras": stats.offline or 0,
         "processing_cameras": processing_cameras
     }
\ No newline at end of file
@@ -3,12 +3,13 @@ IP Camera detection and management router
 """
 from typing import List, Dict, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
 from app.database import get_db
 from app.models import database_models as db_models
-from app.routers.auth import get_current_user
+from app.routers.auth import get_current_user, require_role
 from app.services.ip_camera_service import IPCameraDetector
 
 router = APIRouter()
@@ -18,6 +19,7 @@ detector = IPCameraDetector()
 
 class NetworkScanRequest(BaseModel):
     network: str = "192.168.1.0/24"
+    refresh: bool = False  # Re-probe hosts scanned in the last few minutes
 
 class CameraTestRequest(BaseModel):
     rtsp_url: str
@@ -35,15 +37,11 @@ class CameraAddRequest(BaseModel):
 @router.post("/scan")
 async def scan_network_for_cameras(
     request: NetworkScanRequest,
-    current_user: db_models.User = Depends(get_current_user)
+    current_user: db_models.User = Depends(require_role("admin"))
 ):
     """Scan network for IP cameras"""
-    # Only admin can scan for cameras
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Only administrators can scan for cameras")
-    
     try:
-        cameras = await detector.scan_network_for_cameras(request.network)
+        cameras = await detector.scan_network_for_cameras(request.network, refresh=request.refresh)
         return {
             "success": True,
             "cameras_found": len(cameras),
@@ -77,13 +75,9 @@ async def get_camera_info(
 @router.post("/test")
 async def test_camera_stream(
     request: CameraTestRequest,
-    current_user: db_models.User = Depends(get_current_user)
+    current_user: db_models.User = Depends(require_role("admin"))
 ):
     """Test camera stream connection"""
-    # Only admin can test cameras
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Only administrators can test cameras")
-    
     try:
         success, message = await detector.test_camera_stream(
             request.rtsp_url, 
@@ -104,39 +98,38 @@ async def test_camera_stream(
 async def add_ip_camera(
     request: CameraAddRequest,
     db: Session = Depends(get_db),
-    current_user: db_models.User = Depends(get_current_user)
+    current_user: db_models.User = Depends(require_role("admin"))
 ):
     """Add an IP camera to the system"""
-    # Only admin can add cameras
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Only administrators can add cameras")
-    
-    # Test connection first
-    success, message = await detector.test_camera_stream(
-        request.rtsp_url, 
-        request.username, 
-        request.password
-    )
+    # Test connection first, reusing a recent successful scan or test probe
+    cached = detector.probe_cache.get((request.rtsp_url, request.username or "", request.password or ""))
+    if cached:
+        success, message = cached
+    else:
+        success, message = await detector.test_camera_stream(
+            request.rtsp_url, 
+            request.username, 
+            request.password
+        )
     
     if not success:
         raise HTTPException(status_code=400, detail=f"Camera connection failed: {message}")
     
     # Create camera in database
-    db_camera = db_models.Camera(
-        name=request.name,
-        room=request.room,
-        rtsp_url=request.rtsp_url,
-        camera_type="ip",
-        status="active"
-    )
-    
-    db.add(db_camera)
+    camera_id = db.execute(
+        insert(db_models.Camera).values(
+            name=request.name,
+            room=request.room,
+            rtsp_url=request.rtsp_url,
+            camera_type="ip",
+            status="active"
+        ).returning(db_models.Camera.id)
+    ).scalar_one()
     db.commit()
-    db.refresh(db_camera)
     
     return {
         "success": True,
-        "camera_id": str(db_camera.id),
+        "camera_id": str(camera_id),
         "message": "Camera added successfully"
     }
 
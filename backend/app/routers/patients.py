@@ -1,26 +1,83 @@
 """
 Patients router for patient management endpoints
 """
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from pydantic import TypeAdapter
+from sqlalchemy import and_, func, insert, or_, select, true
+from sqlalchemy.orm import Session, aliased, load_only
 
 from app.database import get_db
 from app.models import database_models as db_models
-from app.models.schemas import Patient, PatientCreate, PatientUpdate, PatientEvent, PatientEventCreate
-from app.routers.auth import get_current_user
+from app.models.schemas.patient import (
+    Patient, PatientCreate, PatientUpdate, PatientSummary, PatientEvent, PatientEventCreate
+)
+from app.routers.auth import get_current_user, require_role
+from app.services.gpt_service import GPTService, get_gpt_service
 
 router = APIRouter()
 
-@router.get("/", response_model=List[Patient])
+# Built once; the events list serializes through it in one pass
+_EVENT_LIST_ADAPTER = TypeAdapter(List[PatientEvent])
+
+def _patient_with_recent_events(db: Session, patient_id: str, limit: int):
+    """Load a patient and its latest events in a single round trip"""
+    recent = aliased(db_models.PatientEvent, select(db_models.PatientEvent).filter(
+        db_models.PatientEvent.patient_id == patient_id
+    ).order_by(db_models.PatientEvent.timestamp.desc()).limit(limit).subquery())
+    
+    rows = db.query(db_models.Patient, recent).outerjoin(recent, true()).filter(
+        db_models.Patient.id == patient_id
+    ).order_by(recent.timestamp.desc()).all()
+    
+    if not rows:
+        return None, []
+    # The patient repeats on every row; a patient without events gives one row of (patient, None)
+    return rows[0][0], [event for _, event in rows if event is not None]
+
+@router.get("/", response_model=List[PatientSummary])
 async def get_patients(
-    skip: int = 0, 
+    response: Response,
+    after: Optional[str] = None,
+    min_heart_rate: Optional[int] = None,
+    max_heart_rate: Optional[int] = None,
+    max_oxygen_saturation: Optional[int] = None,
     limit: int = 100, 
     db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_user)
 ):
-    """Get all patients"""
-    patients = db.query(db_models.Patient).offset(skip).limit(limit).all()
+    """Get all patients, ordered by id.
+    
+    Pages with an id keyset cursor: pass the X-Next-After header of the
+    previous page as after. The vitals filters (say, max_oxygen_saturation=92)
+    read the indexed heart_rate/oxygen_saturation columns, not the vitals JSON.
+    """
+    query = db.query(db_models.Patient)
+    if after is not None:
+        query = query.filter(db_models.Patient.id > after)
+    if min_heart_rate is not None:
+        query = query.filter(db_models.Patient.heart_rate >= min_heart_rate)
+    if max_heart_rate is not None:
+        query = query.filter(db_models.Patient.heart_rate <= max_heart_rate)
+    if max_oxygen_saturation is not None:
+        query = query.filter(db_models.Patient.oxygen_saturation <= max_oxygen_saturation)
+    
+    # Only the columns PatientSummary exposes; ai_summary stays on the detail view
+    patients = query.options(load_only(
+        db_models.Patient.id,
+        db_models.Patient.name,
+        db_models.Patient.age,
+        db_models.Patient.room,
+        db_models.Patient.status,
+        db_models.Patient.conditions,
+        db_models.Patient.vitals,
+        db_models.Patient.admission_date,
+        db_models.Patient.last_updated
+    )).order_by(db_models.Patient.id).limit(limit).all()
+    
+    if patients and len(patients) == limit:
+        response.headers["X-Next-After"] = patients[-1].id
     return patients
 
 @router.post("/", response_model=Patient)
@@ -30,19 +87,59 @@ async def create_patient(
     current_user: db_models.User = Depends(get_current_user)
 ):
     """Create a new patient"""
-    db_patient = db_models.Patient(
-        name=patient.name,
-        age=patient.age,
-        room=patient.room,
-        conditions=patient.conditions,
-        vitals=patient.vitals.dict() if patient.vitals else None
-    )
+    vitals = patient.vitals.dict() if patient.vitals else None
+    # INSERT ... RETURNING gets server defaults back without a refresh SELECT
+    db_patient = db.execute(
+        insert(db_models.Patient).values(
+            name=patient.name,
+            age=patient.age,
+            room=patient.room,
+            conditions=patient.conditions,
+            vitals=vitals,
+            **db_models.vitals_columns(vitals)
+        ).returning(db_models.Patient)
+    ).scalar_one()
+    
+    # Serialize before commit expires the instance
+    result = Patient.model_validate(db_patient)
+    db.commit()
+    
+    return result
+
+@router.post("/summaries/batch")
+async def submit_bulk_summaries(
+    db: Session = Depends(get_db),
+    gpt_service: GPTService = Depends(get_gpt_service),
+    current_user: db_models.User = Depends(get_current_user)
+):
+    """Queue AI summaries for every patient on the OpenAI Batch API.
+    
+    For non-interactive runs such as nightly summaries: results arrive within
+    24 hours, are saved to each patient and broadcast as `patient_summaries`.
+    """
+    patients = db.query(db_models.Patient).all()
     
-    db.add(db_patient)
+    # Each patient's 20 latest events in one query
+    ranked = select(
+        db_models.PatientEvent,
+        func.row_number().over(
+            partition_by=db_models.PatientEvent.patient_id,
+            order_by=db_models.PatientEvent.timestamp.desc()
+        ).label("rank")
+    ).subquery()
+    recent = aliased(db_models.PatientEvent, ranked)
+    events_by_id = {}
+    for event in db.query(recent).filter(ranked.c.rank <= 20).order_by(recent.timestamp.desc()):
+        events_by_id.setdefault(event.patient_id, []).append(event)
+    
+    batch_id = await gpt_service.submit_bulk_patient_summaries(patients, events_by_id)
+    if batch_id is None:
+        raise HTTPException(status_code=503, detail="Batch summaries unavailable")
+    
+    db.add(db_models.SummaryBatch(id=batch_id, patient_ids=[patient.id for patient in patients]))
     db.commit()
-    db.refresh(db_patient)
     
-    return db_patient
+    return {"batch_id": batch_id, "patients": len(patients)}
 
 @router.get("/{patient_id}", response_model=Patient)
 async def get_patient(
@@ -51,7 +148,7 @@ async def get_patient(
     current_user: db_models.User = Depends(get_current_user)
 ):
     """Get a specific patient"""
-    patient = db.query(db_models.Patient).filter(db_models.Patient.id == patient_id).first()
+    patient = db.get(db_models.Patient, patient_id)
     if patient is None:
         raise HTTPException(status_code=404, detail="Patient not found")
     return patient
@@ -64,17 +161,14 @@ async def update_patient(
     current_user: db_models.User = Depends(get_current_user)
 ):
     """Update a patient"""
-    patient = db.query(db_models.Patient).filter(db_models.Patient.id == patient_id).first()
+    patient = db.get(db_models.Patient, patient_id)
     if patient is None:
         raise HTTPException(status_code=404, detail="Patient not found")
     
     # Update fields if provided
     update_data = patient_update.dict(exclude_unset=True)
     for field, value in update_data.items():
-        if field == "vitals" and value:
-            setattr(patient, field, value.dict())
-        else:
-            setattr(patient, field, value)
+        setattr(patient, field, value)
     
     db.commit()
     db.refresh(patient)
@@ -85,14 +179,10 @@ async def update_patient(
 async def delete_patient(
     patient_id: str, 
     db: Session = Depends(get_db),
-    current_user: db_models.User = Depends(get_current_user)
+    current_user: db_models.User = Depends(require_role("admin"))
 ):
     """Delete a patient"""
-    # Only admin can delete patients
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Only administrators can delete patients")
-    
-    patient = db.query(db_models.Patient).filter(db_models.Patient.id == patient_id).first()
+    patient = db.get(db_models.Patient, patient_id)
     if patient is None:
         raise HTTPException(status_code=404, detail="Patient not found")
     
@@ -104,17 +194,43 @@ async def delete_patient(
 @router.get("/{patient_id}/events", response_model=List[PatientEvent])
 async def get_patient_events(
     patient_id: str, 
-    skip: int = 0, 
+    before: Optional[datetime] = None,
+    before_id: Optional[str] = None,
     limit: int = 50,
     db: Session = Depends(get_db),
     current_user: db_models.User = Depends(get_current_user)
 ):
-    """Get events for a specific patient"""
-    events = db.query(db_models.PatientEvent).filter(
+    """Get events for a specific patient, newest first.
+    
+    Pages with a (timestamp, id) keyset cursor: pass the X-Next-Before and
+    X-Next-Before-Id headers of the previous page as before/before_id.
+    """
+    query = db.query(db_models.PatientEvent).filter(
         db_models.PatientEvent.patient_id == patient_id
-    ).order_by(db_models.PatientEvent.timestamp.desc()).offset(skip).limit(limit).all()
+    )
+    # Compared and ordered on the normalized timestamp (see sortable_timestamp)
+    if before is not None:
+        before_sort = db_models.sortable_timestamp(before)
+        if before_id is not None:
+            query = query.filter(or_(
+                db_models.PATIENT_EVENT_TIME_SORT < before_sort,
+                and_(db_models.PATIENT_EVENT_TIME_SORT == before_sort, db_models.PatientEvent.id < before_id)
+            ))
+        else:
+            query = query.filter(db_models.PATIENT_EVENT_TIME_SORT < before_sort)
+    
+    events = query.order_by(
+        db_models.PATIENT_EVENT_TIME_SORT.desc(), db_models.PatientEvent.id.desc()
+    ).limit(limit).all()
     
-    return events
+    body = _EVENT_LIST_ADAPTER.dump_json(
+        _EVENT_LIST_ADAPTER.validate_python(events, from_attributes=True)
+    )
+    response = Response(content=body, media_type="application/json")
+    if events and len(events) == limit:
+        response.headers["X-Next-Before"] = events[-1].timestamp.isoformat()
+        response.headers["X-Next-Before-Id"] = events[-1].id
+    return response
 
 @router.post("/{patient_id}/events", response_model=PatientEvent)
 async def create_patient_event(
@@ -125,47 +241,39 @@ async def create_patient_event(
 ):
     """Create a new event for a patient"""
     # Verify patient exists
-    patient = db.query(db_models.Patient).filter(db_models.Patient.id == patient_id).first()
+    patient = db.get(db_models.Patient, patient_id)
     if patient is None:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    db_event = db_models.PatientEvent(
-        patient_id=patient_id,
-        event_type=event.event_type,
-        description=event.description,
-        metadata=event.metadata,
-        source=event.source,
-        confidence=event.confidence
-    )
+    db_event = db.execute(
+        insert(db_models.PatientEvent).values(
+            patient_id=patient_id,
+            event_type=event.event_type,
+            description=event.description,
+            meta=event.metadata,
+            source=event.source,
+            confidence=event.confidence
+        ).returning(db_models.PatientEvent)
+    ).scalar_one()
     
-    db.add(db_event)
+    result = PatientEvent.model_validate(db_event)
     db.commit()
-    db.refresh(db_event)
     
-    return db_event
+    return result
 
 @router.post("/{patient_id}/summary")
 async def generate_patient_summary(
     patient_id: str,
     db: Session = Depends(get_db),
+    gpt_service: GPTService = Depends(get_gpt_service),
     current_user: db_models.User = Depends(get_current_user)
 ):
     """Generate AI summary for a patient"""
-    # Import here to avoid circular imports
-    from app.services.ai_monitor import AIMonitorService
-    from app.services.gpt_service import GPTService
-    
-    patient = db.query(db_models.Patient).filter(db_models.Patient.id == patient_id).first()
+    patient, events = _patient_with_recent_events(db, patient_id, limit=20)
     if patient is None:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    # Get recent events
-    events = db.query(db_models.PatientEvent).filter(
-        db_models.PatientEvent.patient_id == patient_id
-    ).order_by(db_models.PatientEvent.timestamp.desc()).limit(20).all()
-    
     # Generate summary
-    gpt_service = GPTService()
     summary = await gpt_service.analyze_patient_data(patient, events)
     
     # Update patient record
@@ -178,22 +286,15 @@ async def generate_patient_summary(
 async def get_patient_suggestions(
     patient_id: str,
     db: Session = Depends(get_db),
+    gpt_service: GPTService = Depends(get_gpt_service),
     current_user: db_models.User = Depends(get_current_user)
 ):
     """Get AI suggestions for patient care"""
-    from app.services.gpt_service import GPTService
-    
-    patient = db.query(db_models.Patient).filter(db_models.Patient.id == patient_id).first()
+    patient, events = _patient_with_recent_events(db, patient_id, limit=10)
     if patient is None:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    # Get recent events
-    events = db.query(db_models.PatientEvent).filter(
-        db_models.PatientEvent.patient_id == patient_id
-    ).order_by(db_models.PatientEvent.timestamp.desc()).limit(10).all()
-    
     # Generate suggestions
-    gpt_service = GPTService()
     suggestions = await gpt_service.suggest_patient_actions(patient, events)
     
     return {"suggestions": suggestions, "patient_id": patient_id}
\ No newline at end of file
@@ -2,51 +2,104 @@
 AI Monitor Service - Orchestrates all AI services and real-time monitoring
 """
 import asyncio
+import logging
+from collections import defaultdict
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import json
+import numpy as np
+import orjson
+from cachetools import TTLCache
 
 from app.config import get_settings
-from app.services.gpt_service import GPTService
+from app.database import SessionLocal
+from app.models import database_models as db_models
+from app.services.gpt_service import get_gpt_service
 from app.services.camera_service import CameraService
 from app.services.websocket_manager import WebSocketManager
-from app.models.schemas import Alert, Patient, Detection, AlertType
+from app.models.schemas.alert import Alert, AlertType
+from app.models.schemas.camera import Detection
+from app.models.schemas.patient import Patient
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Normal vital sign ranges; readings outside them raise a vitals alert
+HEART_RATE_RANGE = (50, 120)  # bpm
+TEMPERATURE_RANGE = (96.0, 102.0)  # °F
+MIN_OXYGEN_SATURATION = 90  # %
+
+# GPT alert_type -> (AlertType, priority); unknown types are treated as warnings
+_ALERT_TABLE = {
+    "critical": (AlertType.CRITICAL, 1),
+    "warning": (AlertType.WARNING, 2),
+    "info": (AlertType.INFO, 3),
+}
+
+def _vital_readings(vitals) -> tuple:
+    """(heart rate, temperature, SpO2) from JSON vitals or a VitalSigns model"""
+    if not vitals:
+        return (np.nan, np.nan, np.nan)
+    if isinstance(vitals, dict):
+        hr, temp, o2 = vitals.get("heart_rate"), vitals.get("temperature"), vitals.get("oxygen_saturation")
+    else:
+        hr, temp, o2 = vitals.heart_rate, vitals.temperature, vitals.oxygen_saturation
+    return (hr or np.nan, temp or np.nan, o2 or np.nan)
+
+def _vitals_dict(vitals):
+    """Vitals as a plain dict, whether stored as JSON or given as a VitalSigns model"""
+    return vitals.model_dump() if hasattr(vitals, "model_dump") else vitals
 
 class AIMonitorService:
     """Main AI monitoring service that coordinates all AI operations"""
     
     def __init__(self):
         self.is_running_flag = False
-        self.gpt_service = GPTService()
+        self.gpt_service = get_gpt_service()
         self.camera_service = None  # Will be injected
         self.websocket_manager = None  # Will be injected
         
         # Monitoring state
         self.detection_count = 0
         self.last_analysis_time = None
-        self.active_alerts: Dict[str, Alert] = {}
-        self.patient_summaries: Dict[str, str] = {}
+        # Bounded in size and age so a busy ward can't grow them without limit;
+        # alerts reach clients by broadcast when raised, these only back status
+        self.active_alerts: Dict[str, Alert] = TTLCache(maxsize=10_000, ttl=3600)
+        self.patient_summaries: Dict[str, str] = TTLCache(maxsize=10_000, ttl=24 * 3600)
         
         # Background tasks
         self.monitoring_task = None
         self.analysis_task = None
+        self.batch_poll_task = None
+        
+        # Detections waiting, per camera, for one grouped GPT analysis
+        self._pending_detections: Dict[str, List[Detection]] = {}
+        self._pending_results: Dict[str, asyncio.Future] = {}
+        self._detection_flushes: Dict[str, asyncio.Task] = {}
+        # At most this many GPT calls in flight; per-camera locks keep one
+        # camera's analyses (and so its alerts) in order while others proceed
+        self._gpt_sem = asyncio.Semaphore(8)
+        self._camera_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        
+        # Outbound WebSocket messages waiting for the next batched broadcast
+        self._out_queue: List[dict] = []
+        self._flush_task: Optional[asyncio.Task] = None
     
     async def start(self):
         """Start AI monitoring service"""
-        print("🧠 Starting AI Monitor Service...")
+        logger.info("🧠 Starting AI Monitor Service...")
         self.is_running_flag = True
         
         # Start background monitoring tasks
         self.monitoring_task = asyncio.create_task(self._monitoring_loop())
         self.analysis_task = asyncio.create_task(self._analysis_loop())
+        self.batch_poll_task = asyncio.create_task(self._summary_batch_loop())
         
-        print("✅ AI Monitor Service started")
+        logger.info("✅ AI Monitor Service started")
     
     async def stop(self):
         """Stop AI monitoring service"""
-        print("🔄 Stopping AI Monitor Service...")
+        logger.info("🔄 Stopping AI Monitor Service...")
         self.is_running_flag = False
         
         # Cancel background tasks
@@ -54,8 +107,14 @@ class AIMonitorService:
             self.monitoring_task.cancel()
         if self.analysis_task:
             self.analysis_task.cancel()
+        if self.batch_poll_task:
+            self.batch_poll_task.cancel()
+        if self._flush_task:
+            self._flush_task.cancel()
+        for task in self._detection_flushes.values():
+            task.cancel()
         
-        print("✅ AI Monitor Service stopped")
+        logger.info("✅ AI Monitor Service stopped")
     
     def is_running(self) -> bool:
         """Check if service is running"""
@@ -89,79 +148,127 @@ class AIMonitorService:
         }
     
     async def process_detection(self, detection: Detection, camera_id: str) -> Optional[Alert]:
-        """Process a new detection and potentially generate alerts"""
+        """Process a new detection and potentially generate alerts
+        
+        Detections from the same camera arriving within DETECTION_BATCH_MS are
+        analyzed together in one GPT call; every caller in that window gets
+        the same resulting alert (or None).
+        """
         self.detection_count += 1
         
+        self._pending_detections.setdefault(camera_id, []).append(detection)
+        result = self._pending_results.get(camera_id)
+        if result is None:
+            result = self._pending_results[camera_id] = asyncio.get_running_loop().create_future()
+            self._detection_flushes[camera_id] = asyncio.create_task(self._flush_detections(camera_id))
+        
+        # Shielded so one cancelled caller doesn't cancel the result for the others
+        return await asyncio.shield(result)
+    
+    async def _flush_detections(self, camera_id: str):
+        """Analyze a camera's detections gathered during the batching window"""
+        result = self._pending_results[camera_id]
+        alert = None
         try:
-            # Analyze detection with GPT
-            analysis = await self.gpt_service.analyze_detection_events([detection], detection.camera_id)
+            await asyncio.sleep(settings.DETECTION_BATCH_MS / 1000)
+            detections = self._close_detection_window(camera_id)
+            async with self._camera_locks[camera_id]:
+                alert = await self._analyze_detections(detections, camera_id)
+        finally:
+            # Cancelled (on stop) before the window closed
+            if self._pending_results.get(camera_id) is result:
+                self._close_detection_window(camera_id)
+            result.set_result(alert)
+    
+    def _close_detection_window(self, camera_id: str) -> List[Detection]:
+        """Take a camera's pending detections; later ones start a new window"""
+        self._pending_results.pop(camera_id, None)
+        self._detection_flushes.pop(camera_id, None)
+        return self._pending_detections.pop(camera_id, [])
+    
+    async def _analyze_detections(self, detections: List[Detection], camera_id: str) -> Optional[Alert]:
+        """Run one GPT analysis over a camera's detections and raise an alert if needed"""
+        try:
+            # Analyze detections with GPT
+            async with self._gpt_sem:
+                analysis = await self.gpt_service.analyze_detection_events(detections, camera_id)
             
             if analysis.get("alert_needed", False):
+                # The most confident detection stands for the group
+                detection = max(detections, key=lambda d: d.confidence)
+                # One clock read for the alert id, its creation time and the broadcast
+                now = datetime.utcnow()
+                alert_type, priority = _ALERT_TABLE.get(analysis.get("alert_type"), _ALERT_TABLE["warning"])
+                
                 # Create alert
                 alert = Alert(
-                    id=f"alert_{datetime.utcnow().timestamp()}",
-                    alert_type=AlertType(analysis.get("alert_type", "warning")),
+                    id=f"alert_{now.timestamp()}",
+                    alert_type=alert_type,
                     title=f"AI Detection Alert",
                     message=analysis.get("reason", "AI detected concerning activity"),
-                    room=detection.camera_id,
-                    priority=1 if analysis.get("alert_type") == "critical" else 2,
+                    room=camera_id,
+                    priority=priority,
                     acknowledged=False,
                     resolved=False,
                     metadata={
                         "detection_id": detection.id,
+                        "detection_ids": [d.id for d in detections],
                         "ai_analysis": analysis,
                         "detection_type": detection.detection_type,
                         "confidence": detection.confidence
                     },
-                    created_at=datetime.utcnow()
+                    created_at=now
                 )
                 
                 # Store alert
                 self.active_alerts[alert.id] = alert
                 
                 # Send real-time notification
-                if self.websocket_manager:
-                    await self.websocket_manager.broadcast({
-                        "type": "new_alert",
-                        "alert": alert.dict(),
-                        "timestamp": datetime.utcnow().isoformat()
-                    })
+                self._queue_broadcast({
+                    "type": "new_alert",
+                    "alert": alert.model_dump(),
+                    "timestamp": now.isoformat()
+                })
                 
-                print(f"🚨 Alert generated: {alert.title}")
+                logger.info(f"🚨 Alert generated: {alert.title}")
                 return alert
             
             return None
             
         except Exception as e:
-            print(f"Error processing detection: {e}")
+            logger.error(f"Error processing detection: {e}")
             return None
     
+    def resolve_alert(self, alert_id: str) -> Optional[Alert]:
+        """Drop a resolved alert from the active set"""
+        return self.active_alerts.pop(alert_id, None)
+    
     async def update_patient_summary(self, patient: Patient, events: List = None) -> str:
         """Update AI summary for a patient"""
         try:
             if events is None:
                 events = []  # In real implementation, fetch from database
             
-            summary = await self.gpt_service.analyze_patient_data(patient, events)
+            async with self._gpt_sem:
+                summary = await self.gpt_service.analyze_patient_data(patient, events)
             
             # Store summary
             self.patient_summaries[patient.id] = summary
-            self.last_analysis_time = datetime.utcnow()
+            now = self.last_analysis_time = datetime.utcnow()
             
             # Send real-time update
-            if self.websocket_manager:
-                await self.websocket_manager.broadcast({
-                    "type": "patient_summary_updated",
-                    "patient_id": patient.id,
-                    "summary": summary,
-                    "timestamp": datetime.utcnow().isoformat()
-                })
+            self._queue_broadcast({
+                "type": "patient_summary_updated",
+                "patient_id": patient.id,
+                "summary": summary,
+                "timestamp": now.isoformat()
+            })
             
-            print(f"📋 Updated summary for patient {patient.name}")
+            logger.info(f"📋 Updated summary for patient {patient.name}")
             return summary
             
         except Exception as e:
-            print(f"Error updating patient summary: {e}")
+            logger.error(f"Error updating patient summary: {e}")
             return "Summary update failed"
     
     async def check_patient_vitals(self, patient: Patient) -> Optional[Alert]:
@@ -170,30 +277,31 @@ class AIMonitorService:
             if not patient.vitals:
                 return None
             
-            vitals = patient.vitals
+            vitals = _vitals_dict(patient.vitals)
             alerts_needed = []
             
             # Check heart rate
             if isinstance(vitals, dict) and vitals.get("heart_rate"):
                 hr = vitals["heart_rate"]
-                if hr < 50 or hr > 120:
+                if hr < HEART_RATE_RANGE[0] or hr > HEART_RATE_RANGE[1]:
                     alerts_needed.append(f"Heart rate abnormal: {hr} bpm")
             
             # Check temperature
             if isinstance(vitals, dict) and vitals.get("temperature"):
                 temp = vitals["temperature"]
-                if temp < 96.0 or temp > 102.0:
+                if temp < TEMPERATURE_RANGE[0] or temp > TEMPERATURE_RANGE[1]:
                     alerts_needed.append(f"Temperature abnormal: {temp}°F")
             
             # Check oxygen saturation
             if isinstance(vitals, dict) and vitals.get("oxygen_saturation"):
                 o2 = vitals["oxygen_saturation"]
-                if o2 < 90:
+                if o2 < MIN_OXYGEN_SATURATION:
                     alerts_needed.append(f"Low oxygen saturation: {o2}%")
             
             if alerts_needed:
+                now = datetime.utcnow()
                 alert = Alert(
-                    id=f"vitals_alert_{datetime.utcnow().timestamp()}",
+                    id=f"vitals_alert_{now.timestamp()}",
                     alert_type=AlertType.CRITICAL if len(alerts_needed) > 1 else AlertType.WARNING,
                     title="Vital Signs Alert",
                     message="; ".join(alerts_needed),
@@ -206,30 +314,55 @@ class AIMonitorService:
                         "vitals": vitals,
                         "alert_triggers": alerts_needed
                     },
-                    created_at=datetime.utcnow()
+                    created_at=now
                 )
                 
                 self.active_alerts[alert.id] = alert
                 
                 # Send real-time notification
-                if self.websocket_manager:
-                    await self.websocket_manager.broadcast({
-                        "type": "vitals_alert",
-                        "alert": alert.dict(),
-                        "patient": patient.dict()
-                    })
+                self._queue_broadcast({
+                    "type": "vitals_alert",
+                    "alert": alert.model_dump(),
+                    "patient": patient.model_dump()
+                })
                 
                 return alert
             
             return None
             
         except Exception as e:
-            print(f"Error checking patient vitals: {e}")
+            logger.error(f"Error checking patient vitals: {e}")
             return None
     
+    async def check_ward_vitals(self, patients: List[Patient]) -> List[Alert]:
+        """Check vitals for many patients at once
+        
+        The range checks run as one vectorized pass over the whole ward; only
+        patients flagged there go through check_patient_vitals to build alerts.
+        """
+        if not patients:
+            return []
+        
+        # One (heart rate, temperature, SpO2) row per patient; missing (or zero)
+        # readings become NaN, which fails every comparison
+        readings = np.array([_vital_readings(p.vitals) for p in patients], dtype=np.float32)
+        hr, temp, o2 = readings.T
+        abnormal = (
+            (hr < HEART_RATE_RANGE[0]) | (hr > HEART_RATE_RANGE[1])
+            | (temp < TEMPERATURE_RANGE[0]) | (temp > TEMPERATURE_RANGE[1])
+            | (o2 < MIN_OXYGEN_SATURATION)
+        )
+        
+        alerts = []
+        for index in np.flatnonzero(abnormal):
+            alert = await self.check_patient_vitals(patients[index])
+            if alert:
+                alerts.append(alert)
+        return alerts
+    
     async def _monitoring_loop(self):
         """Background monitoring loop"""
-        print("🔄 Starting monitoring loop...")
+        logger.info("🔄 Starting monitoring loop...")
         
         while self.is_running_flag:
             try:
@@ -242,11 +375,10 @@ class AIMonitorService:
                 # For now, just maintain heartbeat
                 current_status = await self.get_current_status()
                 
-                if self.websocket_manager:
-                    await self.websocket_manager.broadcast({
-                        "type": "system_heartbeat",
-                        "status": current_status
-                    })
+                self._queue_broadcast({
+                    "type": "system_heartbeat",
+                    "status": current_status
+                })
                 
                 # Sleep for configured interval
                 await asyncio.sleep(settings.ALERT_CHECK_INTERVAL)
@@ -254,14 +386,14 @@ class AIMonitorService:
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                print(f"Error in monitoring loop: {e}")
+                logger.error(f"Error in monitoring loop: {e}")
                 await asyncio.sleep(5)
         
-        print("🔄 Monitoring loop stopped")
+        logger.info("🔄 Monitoring loop stopped")
     
     async def _analysis_loop(self):
         """Background analysis loop for patient summaries"""
-        print("🔄 Starting analysis loop...")
+        logger.info("🔄 Starting analysis loop...")
         
         while self.is_running_flag:
             try:
@@ -280,10 +412,78 @@ class AIMonitorService:
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                print(f"Error in analysis loop: {e}")
+                logger.error(f"Error in analysis loop: {e}")
                 await asyncio.sleep(30)
         
-        print("🔄 Analysis loop stopped")
+        logger.info("🔄 Analysis loop stopped")
+    
+    async def _summary_batch_loop(self):
+        """Collect bulk patient summaries from the OpenAI Batch API as batches finish"""
+        while self.is_running_flag:
+            try:
+                if self.gpt_service.is_available():
+                    await self._poll_summary_batches()
+                await asyncio.sleep(60)
+                
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in summary batch loop: {e}")
+                await asyncio.sleep(60)
+    
+    async def _poll_summary_batches(self):
+        """Store and broadcast the summaries of every batch that has finished"""
+        db = SessionLocal()
+        try:
+            batches = db.query(db_models.SummaryBatch).filter(
+                db_models.SummaryBatch.status == "in_progress"
+            ).all()
+            
+            for batch in batches:
+                status, summaries = await self.gpt_service.get_bulk_patient_summaries(batch.id)
+                if status in ("failed", "expired", "cancelled"):
+                    batch.status = "failed"
+                    batch.completed_at = datetime.utcnow()
+                    logger.warning(f"Summary batch {batch.id} ended as {status}")
+                elif status == "completed":
+                    for patient in db.query(db_models.Patient).filter(db_models.Patient.id.in_(list(summaries))):
+                        patient.ai_summary = summaries[patient.id]
+                    self.patient_summaries.update(summaries)
+                    batch.status = "completed"
+                    batch.completed_at = datetime.utcnow()
+                    
+                    self._queue_broadcast({
+                        "type": "patient_summaries",
+                        "batch_id": batch.id,
+                        "summaries": summaries,
+                        "timestamp": batch.completed_at.isoformat()
+                    })
+                    logger.info(f"📋 Summary batch {batch.id} completed: {len(summaries)} summaries")
+                db.commit()
+        finally:
+            db.close()
+    
+    def _queue_broadcast(self, message: dict):
+        """Queue a message for the next batched WebSocket broadcast"""
+        if not self.websocket_manager:
+            return
+        
+        self._out_queue.append(message)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_broadcasts())
+    
+    async def _flush_broadcasts(self):
+        """Broadcast everything queued during the batching window as one frame"""
+        await asyncio.sleep(settings.WS_BATCH_MS / 1000)
+        
+        # Everything runs on the event loop, so swapping the list needs no lock
+        batch, self._out_queue = self._out_queue, []
+        if not batch:
+            return
+        
+        # A lone message goes out as-is; several share one envelope
+        payload = batch[0] if len(batch) == 1 else {"type": "batch", "events": batch}
+        await self.websocket_manager.broadcast_text(orjson.dumps(payload).decode())
     
     def set_camera_service(self, camera_service):
         """Inject camera service dependency"""
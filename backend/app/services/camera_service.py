@@ -2,20 +2,43 @@
 Camera Service for video capture and real-time processing
 """
 import asyncio
+import logging
 import cv2
-import base64
 import io
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import numpy as np
 from PIL import Image
 
+try:
+    # SIMD base64, a drop-in for the stdlib functions used here
+    import pybase64 as base64
+except ImportError:
+    import base64
+
 from app.config import get_settings
-from app.models.schemas import Camera, Detection, BoundingBox
-from app.services.yolo_service import YOLOService
+from app.models.schemas.camera import Camera, Detection, BoundingBox
+from app.services.yolo_service import YOLOService, frame_thumbnail
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+def _detection_color(detection_type: str) -> Tuple[int, int, int]:
+    """BGR box color for a detection type"""
+    if detection_type == "person":
+        return (0, 255, 0)  # Green
+    if "fall" in detection_type.lower():
+        return (0, 0, 255)  # Red
+    return (255, 0, 0)  # Blue
+
+def _encode_jpeg(frame: np.ndarray, quality: int) -> bytes:
+    """Encode a frame as JPEG bytes"""
+    _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes()
 
 class CameraService:
     """Service for camera management and video processing"""
@@ -26,6 +49,28 @@ class CameraService:
         self.is_running_flag = False
         self.processing_tasks: Dict[str, asyncio.Task] = {}
         self.yolo_service = YOLOService()
+        
+        # One inference loop batches every camera's newest frame and hands each
+        # camera its (frame, detections) through a single-slot queue
+        self._detection_queues: Dict[str, asyncio.Queue] = {}
+        self._batch_task: Optional[asyncio.Task] = None
+        
+        # Each camera is drained by its own capture thread, which publishes only
+        # the newest decoded frame here; readers never touch the VideoCapture
+        self.latest_frames: Dict[str, np.ndarray] = {}
+        self._frame_lock = threading.Lock()
+        self._capture_threads: Dict[str, threading.Thread] = {}
+        self._capture_stops: Dict[str, threading.Event] = {}
+        
+        # JPEG encoding runs off the event loop; the last encode per camera (plain
+        # and annotated) is kept as a future next to the frame it came from, so
+        # viewers asking for the same frame, even concurrently, share one encode
+        self._enc_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="jpeg-encode")
+        self._enc_cache: Dict[str, Tuple[np.ndarray, asyncio.Future]] = {}
+        self._annotated_cache: Dict[str, Tuple[np.ndarray, asyncio.Future]] = {}
+        # Disk writes (detection snapshots) also stay off the event loop
+        self._io_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="camera-io")
+        
         self.frame_save_dir = "static/frames"
         
         # Create directories
@@ -34,34 +79,44 @@ class CameraService:
     
     async def start(self):
         """Start camera service"""
-        print("🎥 Starting Camera Service...")
+        logger.info("🎥 Starting Camera Service...")
         self.is_running_flag = True
         
         # Initialize YOLO
         await self.yolo_service.initialize()
+        self._batch_task = asyncio.create_task(self._batch_infer_loop())
         
         # Start with default camera if available
         await self.add_default_camera()
         
-        print("✅ Camera Service started")
+        logger.info("✅ Camera Service started")
     
     async def stop(self):
         """Stop camera service"""
-        print("🔄 Stopping Camera Service...")
+        logger.info("🔄 Stopping Camera Service...")
         self.is_running_flag = False
         
         # Stop all processing tasks
+        if self._batch_task is not None:
+            self._batch_task.cancel()
+            self._batch_task = None
         for task in self.processing_tasks.values():
             task.cancel()
         
+        # Stop capture threads before releasing the captures they read from
+        for camera_id in list(self._capture_threads):
+            await self._stop_capture(camera_id)
+        
         # Release all cameras
         for cap in self.active_cameras.values():
             cap.release()
         
         self.active_cameras.clear()
         self.processing_tasks.clear()
+        self._enc_pool.shutdown(wait=False)
+        self._io_pool.shutdown(wait=True)
         
-        print("✅ Camera Service stopped")
+        logger.info("✅ Camera Service stopped")
     
     def is_running(self) -> bool:
         """Check if service is running"""
@@ -85,13 +140,13 @@ class CameraService:
                 # IP camera
                 cap = cv2.VideoCapture(camera.rtsp_url)
             else:
-                print(f"❌ No camera source specified for {camera.name}")
+                logger.error(f"❌ No camera source specified for {camera.name}")
                 return False
             
             # Test camera connection
             ret, frame = cap.read()
             if not ret:
-                print(f"❌ Failed to connect to camera {camera.name}")
+                logger.error(f"❌ Failed to connect to camera {camera.name}")
                 cap.release()
                 return False
             
@@ -104,16 +159,31 @@ class CameraService:
             self.active_cameras[camera.id] = cap
             self.camera_configs[camera.id] = camera
             
+            # Start capture thread, seeded with the test frame
+            with self._frame_lock:
+                self.latest_frames[camera.id] = frame
+            stop_event = threading.Event()
+            thread = threading.Thread(
+                target=self._capture_loop,
+                args=(camera.id, cap, stop_event),
+                name=f"capture-{camera.id}",
+                daemon=True
+            )
+            self._capture_stops[camera.id] = stop_event
+            self._capture_threads[camera.id] = thread
+            thread.start()
+            
             # Start processing task
             if camera.detection_enabled:
+                self._detection_queues[camera.id] = asyncio.Queue(maxsize=1)
                 task = asyncio.create_task(self._process_camera_feed(camera.id))
                 self.processing_tasks[camera.id] = task
             
-            print(f"✅ Camera {camera.name} added successfully")
+            logger.info(f"✅ Camera {camera.name} added successfully")
             return True
             
         except Exception as e:
-            print(f"❌ Error adding camera {camera.name}: {e}")
+            logger.error(f"❌ Error adding camera {camera.name}: {e}")
             return False
     
     async def remove_camera(self, camera_id: str) -> bool:
@@ -123,6 +193,11 @@ class CameraService:
             if camera_id in self.processing_tasks:
                 self.processing_tasks[camera_id].cancel()
                 del self.processing_tasks[camera_id]
+            self._detection_queues.pop(camera_id, None)
+            self.yolo_service.forget_camera(camera_id)
+            
+            # Stop capture thread before releasing its capture
+            await self._stop_capture(camera_id)
             
             # Release camera
             if camera_id in self.active_cameras:
@@ -133,11 +208,11 @@ class CameraService:
             if camera_id in self.camera_configs:
                 del self.camera_configs[camera_id]
             
-            print(f"✅ Camera {camera_id} removed")
+            logger.info(f"✅ Camera {camera_id} removed")
             return True
             
         except Exception as e:
-            print(f"❌ Error removing camera {camera_id}: {e}")
+            logger.error(f"❌ Error removing camera {camera_id}: {e}")
             return False
     
     async def get_camera_frame(self, camera_id: str, encode_base64: bool = True) -> Optional[str]:
@@ -146,69 +221,102 @@ class CameraService:
             return None
         
         try:
-            cap = self.active_cameras[camera_id]
-            ret, frame = cap.read()
-            
-            if not ret:
+            frame = self._latest_frame(camera_id)
+            if frame is None:
                 return None
             
             if encode_base64:
                 # Encode frame as base64 JPEG
-                _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
-                frame_b64 = base64.b64encode(buffer).decode('utf-8')
+                jpeg = await self._shared(self._enc_cache, camera_id, frame, self._encode_plain)
+                frame_b64 = base64.b64encode(jpeg).decode('ascii')
                 return frame_b64
             else:
                 return frame
                 
         except Exception as e:
-            print(f"Error getting frame from camera {camera_id}: {e}")
+            logger.error(f"Error getting frame from camera {camera_id}: {e}")
             return None
     
-    async def get_camera_frame_with_detections(self, camera_id: str) -> Optional[Tuple[str, List[Detection]]]:
-        """Get frame with AI detections overlaid"""
+    async def get_camera_jpeg(self, camera_id: str, annotated: bool = False) -> Tuple[Optional[bytes], List[Detection]]:
+        """Get current frame as raw JPEG bytes, optionally with AI detections overlaid"""
         if camera_id not in self.active_cameras:
             return None, []
         
         try:
-            cap = self.active_cameras[camera_id]
-            ret, frame = cap.read()
-            
-            if not ret:
+            frame = self._latest_frame(camera_id)
+            if frame is None:
                 return None, []
             
-            # Run YOLO detection
-            detections = await self.yolo_service.detect_objects(frame)
-            
-            # Draw detections on frame
-            annotated_frame = self._draw_detections(frame, detections)
-            
-            # Encode as base64
-            _, buffer = cv2.imencode('.jpg', annotated_frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-            frame_b64 = base64.b64encode(buffer).decode('utf-8')
+            if not annotated:
+                return await self._shared(self._enc_cache, camera_id, frame, self._encode_plain), []
             
-            return frame_b64, detections
+            return await self._shared(
+                self._annotated_cache, camera_id, frame,
+                lambda frame: self._encode_annotated(frame, camera_id)
+            )
             
         except Exception as e:
-            print(f"Error getting annotated frame from camera {camera_id}: {e}")
+            logger.error(f"Error getting JPEG frame from camera {camera_id}: {e}")
             return None, []
     
+    async def stream_mjpeg(self, camera_id: str, annotated: bool = False) -> AsyncIterator[bytes]:
+        """Yield multipart/x-mixed-replace JPEG parts, one per new published frame
+        
+        Every viewer of a camera reads the same per-frame encode (and detection
+        pass, when annotated), so the cost of a stream does not grow with its audience.
+        """
+        last_frame = None
+        while self.is_running_flag and camera_id in self.active_cameras:
+            frame = self._latest_frame(camera_id)
+            if frame is not None and frame is not last_frame:
+                last_frame = frame
+                jpeg, _ = await self.get_camera_jpeg(camera_id, annotated=annotated)
+                if jpeg is not None:
+                    yield (
+                        b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: "
+                        + str(len(jpeg)).encode() + b"\r\n\r\n" + jpeg + b"\r\n"
+                    )
+            await asyncio.sleep(1.0 / settings.CAMERA_FRAME_RATE)
+    
+    async def _shared(self, cache: Dict[str, Tuple[np.ndarray, asyncio.Future]], camera_id: str, frame: np.ndarray, produce):
+        """Result of produce(frame), computed at most once per published frame"""
+        cached = cache.get(camera_id)
+        if cached is None or cached[0] is not frame:
+            cached = cache[camera_id] = (frame, asyncio.ensure_future(produce(frame)))
+        # Shielded so a viewer going away doesn't cancel the work the others wait on
+        return await asyncio.shield(cached[1])
+    
+    async def _encode_plain(self, frame: np.ndarray) -> bytes:
+        """Plain JPEG of a frame, encoded on the encode pool"""
+        return await asyncio.get_running_loop().run_in_executor(self._enc_pool, _encode_jpeg, frame, 80)
+    
+    async def _encode_annotated(self, frame: np.ndarray, camera_id: str) -> Tuple[bytes, List[Detection]]:
+        """Run YOLO detection, then draw it on the frame and encode on the encode pool"""
+        # Static scenes reuse the camera's last detections instead of re-running YOLO
+        detections = await self.yolo_service.detect_objects(frame, camera_id=camera_id)
+        jpeg = await asyncio.get_running_loop().run_in_executor(
+            self._enc_pool, lambda: _encode_jpeg(self._draw_detections(frame, detections), 85)
+        )
+        return jpeg, detections
+    
+    async def get_camera_frame_with_detections(self, camera_id: str) -> Optional[Tuple[str, List[Detection]]]:
+        """Get frame with AI detections overlaid"""
+        jpeg, detections = await self.get_camera_jpeg(camera_id, annotated=True)
+        if jpeg is None:
+            return None, []
+        
+        # Encode as base64
+        return base64.b64encode(jpeg).decode('ascii'), detections
+    
     async def _process_camera_feed(self, camera_id: str):
         """Background task to process camera feed"""
-        print(f"🎥 Starting processing for camera {camera_id}")
+        logger.info(f"🎥 Starting processing for camera {camera_id}")
+        queue = self._detection_queues[camera_id]
         
         while self.is_running_flag and camera_id in self.active_cameras:
             try:
-                # Get frame
-                cap = self.active_cameras[camera_id]
-                ret, frame = cap.read()
-                
-                if not ret:
-                    print(f"⚠️ No frame from camera {camera_id}")
-                    await asyncio.sleep(1)
-                    continue
-                
-                # Run object detection
-                detections = await self.yolo_service.detect_objects(frame)
+                # Wait for the batch loop to run detection on a new frame
+                frame, detections = await queue.get()
                 
                 # Process significant detections
                 significant_detections = [
@@ -225,69 +333,191 @@ class CameraService:
                     # 2. Trigger alerts if needed
                     # 3. Send real-time updates via WebSocket
                     
-                    print(f"🔍 {len(significant_detections)} detections in {camera_id}")
+                    logger.debug(f"🔍 {len(significant_detections)} detections in {camera_id}")
+                
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error processing camera {camera_id}: {e}")
+                await asyncio.sleep(1)
+        
+        logger.info(f"🔄 Stopped processing camera {camera_id}")
+    
+    async def _batch_infer_loop(self):
+        """Run detection for all cameras' newest frames in one batch per tick
+        
+        Frames that barely differ from the last one run through detection are
+        skipped, but a static scene is still re-checked about once a second.
+        """
+        last_frames: Dict[str, np.ndarray] = {}
+        last_thumbs: Dict[str, np.ndarray] = {}
+        skipped: Dict[str, int] = {}
+        
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / settings.CAMERA_FRAME_RATE
+        next_tick = loop.time()
+        
+        while self.is_running_flag:
+            try:
+                # Fixed-rate ticks: inference time is absorbed instead of added to
+                # the period; after a long stall, restart from now rather than burst
+                next_tick += interval
+                delay = next_tick - loop.time()
+                if delay < -interval:
+                    next_tick = loop.time()
+                    delay = 0
+                await asyncio.sleep(max(delay, 0))
+                
+                # Newest frame of every detecting camera that published since the last batch
+                batch: Dict[str, np.ndarray] = {}
+                for camera_id in self._detection_queues:
+                    frame = self._latest_frame(camera_id)
+                    if frame is None or frame is last_frames.get(camera_id):
+                        continue
+                    last_frames[camera_id] = frame
+                    
+                    # Mean absolute difference of 64x64 grey thumbnails
+                    thumb = frame_thumbnail(frame)
+                    previous = last_thumbs.get(camera_id)
+                    if (
+                        previous is not None
+                        and skipped[camera_id] < settings.CAMERA_FRAME_RATE
+                        and cv2.absdiff(thumb, previous).mean() < settings.FRAME_CHANGE_THRESHOLD
+                    ):
+                        skipped[camera_id] += 1
+                        continue
+                    last_thumbs[camera_id] = thumb
+                    skipped[camera_id] = 0
+                    batch[camera_id] = frame
+                if not batch:
+                    continue
+                
+                results = await self.yolo_service.detect_batch(list(batch.values()))
                 
-                # Control frame rate
-                await asyncio.sleep(1.0 / settings.CAMERA_FRAME_RATE)
+                for (camera_id, frame), detections in zip(batch.items(), results):
+                    queue = self._detection_queues.get(camera_id)
+                    if queue is None:
+                        continue
+                    # A camera still busy with its previous result gets the newer one instead
+                    if queue.full():
+                        queue.get_nowait()
+                    queue.put_nowait((frame, detections))
+                
+                # Forget cameras that were removed
+                for camera_id in set(last_frames) - set(self._detection_queues):
+                    del last_frames[camera_id]
+                    last_thumbs.pop(camera_id, None)
+                    skipped.pop(camera_id, None)
                 
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                print(f"Error processing camera {camera_id}: {e}")
+                logger.error(f"Error in batched detection: {e}")
                 await asyncio.sleep(1)
+    
+    def _capture_loop(self, camera_id: str, cap: cv2.VideoCapture, stop_event: threading.Event):
+        """Capture thread: drain the stream and publish the newest frame
         
-        print(f"🔄 Stopped processing camera {camera_id}")
+        grab() runs for every frame so the driver/RTSP buffer never backs up,
+        but frames are only decoded (retrieve) at the configured frame rate.
+        """
+        publish_interval = 1.0 / settings.CAMERA_FRAME_RATE
+        next_publish = 0.0
+        
+        while not stop_event.is_set():
+            if not cap.grab():
+                stop_event.wait(0.5)
+                continue
+            
+            now = time.monotonic()
+            if now < next_publish:
+                continue
+            
+            ret, frame = cap.retrieve()
+            if ret:
+                with self._frame_lock:
+                    self.latest_frames[camera_id] = frame
+                next_publish = now + publish_interval
+    
+    def _latest_frame(self, camera_id: str) -> Optional[np.ndarray]:
+        """Newest frame published by a camera's capture thread"""
+        with self._frame_lock:
+            return self.latest_frames.get(camera_id)
+    
+    async def _stop_capture(self, camera_id: str):
+        """Stop a camera's capture thread and drop its frame"""
+        stop_event = self._capture_stops.pop(camera_id, None)
+        thread = self._capture_threads.pop(camera_id, None)
+        if stop_event is not None:
+            stop_event.set()
+        if thread is not None:
+            # The thread may be blocked in grab() for up to a frame; wait off the loop
+            await asyncio.to_thread(thread.join, 2.0)
+        with self._frame_lock:
+            self.latest_frames.pop(camera_id, None)
+        self._enc_cache.pop(camera_id, None)
+        self._annotated_cache.pop(camera_id, None)
     
     async def _save_detection_frame(self, frame: np.ndarray, detections: List[Detection], camera_id: str) -> str:
         """Save frame with detections for later analysis"""
         try:
-            timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-            filename = f"{camera_id}_{timestamp}_detections.jpg"
-            filepath = os.path.join("static/detections", filename)
-            
-            # Draw detections
-            annotated_frame = self._draw_detections(frame, detections)
+            now = datetime.utcnow()
+            # One directory per day and hour keeps each listing small
+            directory = os.path.join("static/detections", now.strftime("%Y%m%d"), now.strftime("%H"))
+            filename = f"{camera_id}_{now.strftime('%Y%m%d_%H%M%S')}_detections.jpg"
+            filepath = os.path.join(directory, filename)
             
-            # Save frame
-            cv2.imwrite(filepath, annotated_frame)
+            await asyncio.get_running_loop().run_in_executor(
+                self._io_pool, self._write_detection_frame, directory, filepath, frame, detections
+            )
             
             return filepath
             
         except Exception as e:
-            print(f"Error saving detection frame: {e}")
+            logger.error(f"Error saving detection frame: {e}")
             return ""
     
+    def _write_detection_frame(self, directory: str, filepath: str, frame: np.ndarray, detections: List[Detection]):
+        """Draw detections and write the snapshot; runs on the IO pool"""
+        os.makedirs(directory, exist_ok=True)
+        
+        # Draw detections
+        annotated_frame = self._draw_detections(frame, detections)
+        
+        # Save frame
+        cv2.imwrite(filepath, annotated_frame)
+    
     def _draw_detections(self, frame: np.ndarray, detections: List[Detection]) -> np.ndarray:
-        """Draw detection bounding boxes and labels on frame"""
+        """Draw detection bounding boxes and labels on frame
+        
+        Returns the input frame itself when there is nothing to draw. Otherwise
+        draws on a copy: frames come from the shared latest-frame slot and
+        encode caches, so drawing in place would leak boxes to other readers.
+        """
+        if not detections:
+            return frame
         annotated_frame = frame.copy()
         
-        for detection in detections:
-            bbox = detection.bounding_box
-            
-            # Convert normalized coordinates to pixel coordinates
-            h, w = frame.shape[:2]
-            x1 = int(bbox.x * w)
-            y1 = int(bbox.y * h)
-            x2 = int((bbox.x + bbox.width) * w)
-            y2 = int((bbox.y + bbox.height) * h)
-            
-            # Choose color based on detection type
-            if detection.detection_type == "person":
-                color = (0, 255, 0)  # Green
-            elif "fall" in detection.detection_type.lower():
-                color = (0, 0, 255)  # Red
-            else:
-                color = (255, 0, 0)  # Blue
+        # Convert normalized coordinates to pixel coordinates for all boxes at once
+        h, w = frame.shape[:2]
+        boxes = np.array(
+            [(d.bounding_box.x, d.bounding_box.y, d.bounding_box.width, d.bounding_box.height) for d in detections],
+            dtype=np.float32
+        )
+        boxes *= np.array((w, h, w, h), dtype=np.float32)
+        boxes[:, 2:] += boxes[:, :2]
+        corners = boxes.astype(np.int32).tolist()
+        
+        rectangle, put_text, font = cv2.rectangle, cv2.putText, cv2.FONT_HERSHEY_SIMPLEX
+        for (x1, y1, x2, y2), detection in zip(corners, detections):
+            color = _detection_color(detection.detection_type)
             
             # Draw bounding box
-            cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
+            rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
             
             # Draw label
             label = f"{detection.detection_type}: {detection.confidence:.2f}"
-            cv2.putText(
-                annotated_frame, label, (x1, y1 - 10),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2
-            )
+            put_text(annotated_frame, label, (x1, y1 - 10), font, 0.5, color, 2)
         
         return annotated_frame
     
@@ -300,7 +530,7 @@ class CameraService:
             test_cap.release()
             
             if ret:
-                from app.models.schemas import Camera, CameraStatus
+                from app.models.schemas.camera import Camera, CameraStatus
                 default_camera = Camera(
                     id="default_camera",
                     name="Default Camera",
@@ -313,12 +543,12 @@ class CameraService:
                 )
                 
                 await self.add_camera(default_camera)
-                print("✅ Default camera added")
+                logger.info("✅ Default camera added")
             else:
-                print("ℹ️ No default camera available")
+                logger.info("ℹ️ No default camera available")
                 
         except Exception as e:
-            print(f"ℹ️ Could not add default camera: {e}")
+            logger.info(f"ℹ️ Could not add default camera: {e}")
     
     async def get_all_cameras(self) -> List[Camera]:
         """Get all registered cameras"""
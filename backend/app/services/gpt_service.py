@@ -2,16 +2,72 @@
 GPT Service for intelligent analysis and summarization
 """
 import asyncio
+import logging
+import hashlib
 import json
+from functools import lru_cache
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Any
+from typing import AsyncIterator, List, Dict, Optional, Any, Tuple
+import httpx
 import openai
+from cachetools import TTLCache
 from openai import AsyncOpenAI
+from pydantic import ValidationError
 
 from app.config import get_settings
-from app.models.schemas import Patient, PatientEvent, Alert, Detection
+from app.models.schemas.alert import Alert, DetectionAlert
+from app.models.schemas.camera import Detection
+from app.models.schemas.patient import Patient, PatientEvent
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# System prompts are constants so every request starts with byte-identical
+# text, which OpenAI's prompt caching can reuse; per-call data goes in the user turn
+SYSTEM_PATIENT = """You are an AI medical assistant analyzing patient data in a hospital monitoring system.
+Provide concise, professional medical summaries focused on:
+1. Current patient status and trends
+2. Notable events and patterns
+3. Potential concerns or recommendations
+4. Use medical terminology appropriately
+Respond in at most 3 short bullet points, no preamble."""
+
+SYSTEM_DETECTION = """You are an AI system analyzing hospital camera detections.
+Determine if any detections require immediate alerts based on:
+1. Patient falls or emergencies
+2. Unusual activity patterns
+3. Medical equipment issues
+4. Security concerns
+Keep the reason to one sentence and give at most 2 short recommendations."""
+
+SYSTEM_SHIFT = """You are creating a nursing shift handover summary. Focus on:
+1. Critical patients and their status changes
+2. Important alerts and incidents
+3. Medications and treatments
+4. Areas requiring attention
+Keep it professional, concise, and actionable.
+Respond in short bullet points, at most one per focus area, no preamble."""
+
+SYSTEM_ACTIONS = """You are an AI assistant suggesting patient care actions.
+Provide 2-3 specific, actionable recommendations based on patient data.
+Focus on monitoring, medication timing, mobility, and comfort measures.
+Keep suggestions brief and practical.
+Respond in at most 3 short bullet points, no preamble."""
+
+# Input tokens are billed and add latency, so per-request context is capped
+MAX_CONTEXT_CHARS = 2000
+# ...of which one patient event's description takes at most this much
+MAX_EVENT_CHARS = 300
+
+# Structured outputs: the reply is guaranteed to match DetectionAlert
+DETECTION_ALERT_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "detection_alert",
+        "schema": DetectionAlert.model_json_schema(),
+        "strict": True
+    }
+}
 
 class GPTService:
     """Service for GPT-powered analysis and summarization"""
@@ -21,8 +77,20 @@ class GPTService:
         self.is_initialized = False
         self.last_summary_time = None
         
+        # Replies to byte-identical requests, reused for a few minutes
+        self._chat_cache = TTLCache(maxsize=512, ttl=300)
+        # Detection verdicts, keyed on what the verdict depends on; entries expire
+        # so verdicts track the ward rather than living forever
+        self._analysis_cache = TTLCache(maxsize=4096, ttl=600)
+        
         if settings.OPENAI_API_KEY:
-            self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+            # Sized for bulk fan-outs: the default pool (100 connections, 20 kept
+            # alive) makes bursts queue for, and keep re-opening, TLS connections
+            http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                limits=httpx.Limits(max_connections=200, max_keepalive_connections=100)
+            )
+            self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, http_client=http_client)
             self.is_initialized = True
     
     def is_available(self) -> bool:
@@ -33,8 +101,11 @@ class GPTService:
         """Get timestamp of last summary generation"""
         return self.last_summary_time
     
-    async def analyze_patient_data(self, patient: Patient, events: List[PatientEvent]) -> str:
-        """Generate AI summary of patient status and recent events"""
+    async def analyze_patient_data(self, patient: Patient, events: List[PatientEvent], model: Optional[str] = None) -> str:
+        """Generate AI summary of patient status and recent events
+        
+        `model` overrides settings.GPT_SUMMARY_MODEL for callers that need a stronger model.
+        """
         if not self.is_available():
             return "AI analysis unavailable - OpenAI API key not configured"
         
@@ -42,82 +113,90 @@ class GPTService:
             # Prepare context for GPT
             patient_context = self._build_patient_context(patient, events)
             
-            response = await self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """You are an AI medical assistant analyzing patient data in a hospital monitoring system. 
-                        Provide concise, professional medical summaries focused on:
-                        1. Current patient status and trends
-                        2. Notable events and patterns
-                        3. Potential concerns or recommendations
-                        4. Keep it brief (3-4 bullet points max)
-                        5. Use medical terminology appropriately"""
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Analyze this patient data and provide a medical summary:\n\n{patient_context}"
-                    }
-                ],
-                max_tokens=200,
-                temperature=0.3
+            summary = await self._chat(
+                model or settings.GPT_SUMMARY_MODEL, SYSTEM_PATIENT,
+                f"Analyze this patient data and provide a medical summary:\n\n{patient_context}",
+                max_tokens=120, temperature=0.3
             )
-            
-            summary = response.choices[0].message.content.strip()
             self.last_summary_time = datetime.utcnow()
             
             return summary
             
         except Exception as e:
-            print(f"GPT analysis error: {e}")
+            logger.error(f"GPT analysis error: {e}")
             return f"AI analysis temporarily unavailable: {str(e)}"
     
+    async def analyze_many_patients(
+        self,
+        patients: List[Patient],
+        events_map: Dict[str, List[PatientEvent]],
+        concurrency: int = 20,
+        requests_per_minute: Optional[int] = None
+    ) -> List[str]:
+        """Summaries for several patients, in the order given
+        
+        Up to `concurrency` requests are in flight at once, and their starts are
+        spaced to stay under `requests_per_minute` (settings.OPENAI_RPM by default).
+        """
+        sem = asyncio.Semaphore(concurrency)
+        interval = 60 / (requests_per_minute or settings.OPENAI_RPM)
+        loop = asyncio.get_running_loop()
+        next_start = loop.time()
+        
+        async def one(patient: Patient) -> str:
+            nonlocal next_start
+            async with sem:
+                # Claim the next start slot; no await between the read and the
+                # write, so concurrent callers can't take the same one
+                start = max(loop.time(), next_start)
+                next_start = start + interval
+                await asyncio.sleep(start - loop.time())
+                return await self.analyze_patient_data(patient, events_map.get(patient.id, []))
+        
+        results = await asyncio.gather(*(one(patient) for patient in patients), return_exceptions=True)
+        return [
+            f"AI analysis temporarily unavailable: {result}" if isinstance(result, Exception) else result
+            for result in results
+        ]
+    
     async def analyze_detection_events(self, detections: List[Detection], room: str) -> Dict[str, Any]:
         """Analyze computer vision detections for potential alerts"""
         if not self.is_available():
             return {"alert_needed": False, "reason": "AI unavailable"}
         
+        # Timestamps and small confidence jitter don't change the verdict, so the
+        # key is the room plus the distinct (type, confidence to 0.1) pairs
+        cache_key = ("detections", room, frozenset(
+            (d.detection_type, round(d.confidence, 1)) for d in detections
+        ))
+        cached = self._analysis_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             # Build detection context
             detection_context = self._build_detection_context(detections, room)
             
-            response = await self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """You are an AI system analyzing hospital camera detections. 
-                        Determine if any detections require immediate alerts based on:
-                        1. Patient falls or emergencies
-                        2. Unusual activity patterns
-                        3. Medical equipment issues
-                        4. Security concerns
-                        
-                        Respond with JSON: {"alert_needed": boolean, "alert_type": "critical/warning/info", "reason": "explanation", "recommendations": ["action1", "action2"]}"""
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Analyze these camera detections:\n\n{detection_context}"
-                    }
-                ],
-                max_tokens=150,
-                temperature=0.2
+            result = await self._chat(
+                settings.GPT_ANALYSIS_MODEL, SYSTEM_DETECTION,
+                f"Analyze these camera detections:\n\n{detection_context}",
+                max_tokens=80, temperature=0.2,
+                response_format=DETECTION_ALERT_FORMAT
             )
             
-            result = response.choices[0].message.content.strip()
-            
             try:
-                analysis = json.loads(result)
+                analysis = DetectionAlert.model_validate_json(result).model_dump()
+                self._analysis_cache[cache_key] = analysis
                 return analysis
-            except json.JSONDecodeError:
+            except ValidationError:
+                # Only a reply cut off at max_tokens or a refusal gets here
                 return {"alert_needed": False, "reason": "Analysis parsing error"}
                 
         except Exception as e:
-            print(f"Detection analysis error: {e}")
+            logger.error(f"Detection analysis error: {e}")
             return {"alert_needed": False, "reason": f"Analysis error: {str(e)}"}
     
-    async def generate_shift_summary(self, patients: List[Patient], alerts: List[Alert], timeframe_hours: int = 8) -> str:
+    async def generate_shift_summary(self, patients: List[Patient], alerts: List[Alert], timeframe_hours: int = 8, model: Optional[str] = None) -> str:
         """Generate summary for nursing shift handover"""
         if not self.is_available():
             return "Shift summary unavailable - AI service not configured"
@@ -125,36 +204,59 @@ class GPTService:
         try:
             summary_context = self._build_shift_context(patients, alerts, timeframe_hours)
             
-            response = await self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """You are creating a nursing shift handover summary. Focus on:
-                        1. Critical patients and their status changes
-                        2. Important alerts and incidents
-                        3. Medications and treatments
-                        4. Areas requiring attention
-                        Keep it professional, concise, and actionable."""
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Generate a shift handover summary:\n\n{summary_context}"
-                    }
-                ],
-                max_tokens=400,
-                temperature=0.3
+            summary = await self._chat(
+                model or settings.GPT_SUMMARY_MODEL, SYSTEM_SHIFT,
+                f"Generate a shift handover summary:\n\n{summary_context}",
+                max_tokens=250, temperature=0.3
             )
-            
-            summary = response.choices[0].message.content.strip()
             self.last_summary_time = datetime.utcnow()
             
             return summary
             
         except Exception as e:
-            print(f"Shift summary error: {e}")
+            logger.error(f"Shift summary error: {e}")
             return f"Shift summary error: {str(e)}"
     
+    async def stream_shift_summary(
+        self, patients: List[Patient], alerts: List[Alert], timeframe_hours: int = 8, model: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Shift handover summary as text deltas, yielded as the model produces them
+        
+        Closing the generator early (the client went away) closes the upstream
+        stream too, so an abandoned summary stops generating tokens.
+        """
+        if not self.is_available():
+            yield "Shift summary unavailable - AI service not configured"
+            return
+        
+        try:
+            summary_context = self._build_shift_context(patients, alerts, timeframe_hours)
+            stream = await self.client.chat.completions.create(
+                model=model or settings.GPT_SUMMARY_MODEL,
+                messages=[
+                    {"role": "system", "content": SYSTEM_SHIFT},
+                    {"role": "user", "content": f"Generate a shift handover summary:\n\n{summary_context}"}
+                ],
+                max_tokens=250,
+                temperature=0.3,
+                stream=True
+            )
+        except Exception as e:
+            logger.error(f"Shift summary error: {e}")
+            yield f"Shift summary error: {str(e)}"
+            return
+        
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+            self.last_summary_time = datetime.utcnow()
+        except Exception as e:
+            logger.error(f"Shift summary stream error: {e}")
+            yield f"\n[Shift summary interrupted: {str(e)}]"
+        finally:
+            await stream.close()
+    
     async def suggest_patient_actions(self, patient: Patient, recent_events: List[PatientEvent]) -> List[str]:
         """Generate AI suggestions for patient care"""
         if not self.is_available():
@@ -163,69 +265,156 @@ class GPTService:
         try:
             context = self._build_patient_context(patient, recent_events)
             
-            response = await self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """You are an AI assistant suggesting patient care actions. 
-                        Provide 2-3 specific, actionable recommendations based on patient data.
-                        Focus on monitoring, medication timing, mobility, and comfort measures.
-                        Keep suggestions brief and practical."""
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Suggest care actions for this patient:\n\n{context}"
-                    }
-                ],
-                max_tokens=100,
-                temperature=0.4
+            suggestions_text = await self._chat(
+                settings.GPT_ANALYSIS_MODEL, SYSTEM_ACTIONS,
+                f"Suggest care actions for this patient:\n\n{context}",
+                max_tokens=80, temperature=0.4
             )
             
-            suggestions_text = response.choices[0].message.content.strip()
-            
             # Parse suggestions into list
             suggestions = [s.strip() for s in suggestions_text.split('\n') if s.strip()]
             return suggestions[:3]  # Limit to 3 suggestions
             
         except Exception as e:
-            print(f"Suggestions error: {e}")
+            logger.error(f"Suggestions error: {e}")
             return [f"Suggestion generation error: {str(e)}"]
     
-    def _build_patient_context(self, patient: Patient, events: List[PatientEvent]) -> str:
-        """Build context string for patient analysis"""
-        context = f"""
-Patient: {patient.name}, Age: {patient.age}, Room: {patient.room}
-Status: {patient.status}
-Admission Date: {patient.admission_date}
-Conditions: {', '.join(patient.conditions) if patient.conditions else 'None listed'}
-
-Current Vitals:
-"""
+    async def submit_bulk_patient_summaries(self, patients: List[Patient], events_by_id: Dict[str, List[PatientEvent]]) -> Optional[str]:
+        """Queue patient summaries on the OpenAI Batch API; returns the batch id
         
-        if patient.vitals:
-            vitals = patient.vitals
-            if isinstance(vitals, dict):
-                context += f"- Heart Rate: {vitals.get('heart_rate', 'N/A')} bpm\n"
-                context += f"- Blood Pressure: {vitals.get('blood_pressure', 'N/A')}\n"
-                context += f"- Temperature: {vitals.get('temperature', 'N/A')}°F\n"
-                context += f"- Oxygen Saturation: {vitals.get('oxygen_saturation', 'N/A')}%\n"
+        Batched requests cost half as much and don't count against the interactive
+        rate limit, at the price of completing some time within 24 hours.
+        """
+        if not self.is_available() or not patients:
+            return None
         
-        context += f"\nRecent Events ({len(events)} total):\n"
-        for event in events[-10:]:  # Last 10 events
-            context += f"- {event.timestamp.strftime('%H:%M')}: {event.description} ({event.event_type})\n"
+        lines = []
+        for patient in patients:
+            patient_context = self._build_patient_context(patient, events_by_id.get(patient.id, []))
+            lines.append(json.dumps({
+                "custom_id": patient.id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": settings.GPT_SUMMARY_MODEL,
+                    "messages": [
+                        {"role": "system", "content": SYSTEM_PATIENT},
+                        {"role": "user", "content": f"Analyze this patient data and provide a medical summary:\n\n{patient_context}"}
+                    ],
+                    "max_tokens": 120,
+                    "temperature": 0.3
+                }
+            }))
         
-        return context
+        try:
+            batch_file = await self.client.files.create(
+                file=("patient_summaries.jsonl", "\n".join(lines).encode()),
+                purpose="batch"
+            )
+            batch = await self.client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            return batch.id
+            
+        except Exception as e:
+            logger.error(f"Batch submission error: {e}")
+            return None
     
-    def _build_detection_context(self, detections: List[Detection], room: str) -> str:
-        """Build context for detection analysis"""
-        context = f"Room: {room}\nDetections in last few minutes:\n"
+    async def get_bulk_patient_summaries(self, batch_id: str) -> Tuple[str, Dict[str, str]]:
+        """Status of a summary batch and, once completed, its summaries by patient id"""
+        if not self.is_available():
+            # Left in progress, to be polled again once the client is configured
+            return "in_progress", {}
         
-        for detection in detections[-20:]:  # Last 20 detections
-            context += f"- {detection.timestamp.strftime('%H:%M:%S')}: {detection.detection_type} "
-            context += f"(confidence: {detection.confidence:.2f})\n"
+        batch = await self.client.batches.retrieve(batch_id)
+        if batch.status != "completed":
+            return batch.status, {}
         
-        return context
+        summaries = {}
+        if batch.output_file_id:
+            output = await self.client.files.content(batch.output_file_id)
+            for line in output.text.splitlines():
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                response = result.get("response") or {}
+                if response.get("status_code") == 200:
+                    summaries[result["custom_id"]] = response["body"]["choices"][0]["message"]["content"].strip()
+        
+        self.last_summary_time = datetime.utcnow()
+        return batch.status, summaries
+    
+    async def _chat(
+        self, model: str, system: str, user: str, max_tokens: int, temperature: float,
+        response_format: Optional[dict] = None
+    ) -> str:
+        """Text of one chat completion; identical requests are answered from memory for a few minutes
+        
+        A response_format is fixed per system prompt, so the system text already keys it.
+        """
+        cache_key = hashlib.blake2b(
+            f"{model}\0{max_tokens}\0{temperature}\0{system}\0{user}".encode(), digest_size=16
+        ).digest()
+        cached = self._chat_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user}
+            ],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **({"response_format": response_format} if response_format else {})
+        )
+        
+        text = (response.choices[0].message.content or "").strip()
+        self._chat_cache[cache_key] = text
+        return text
+    
+    def _build_patient_context(self, patient: Patient, events: List[PatientEvent]) -> str:
+        """Build context string for patient analysis, at most MAX_CONTEXT_CHARS long"""
+        lines = [
+            f"Patient: {patient.name}, Age: {patient.age}, Room: {patient.room}, Status: {patient.status}",
+            f"Admitted: {patient.admission_date}",
+            f"Conditions: {', '.join(patient.conditions) if patient.conditions else 'None listed'}",
+        ]
+        
+        vitals = patient.vitals
+        if isinstance(vitals, dict) and vitals:
+            lines.append(
+                f"Vitals: HR {vitals.get('heart_rate', 'N/A')} bpm, BP {vitals.get('blood_pressure', 'N/A')}, "
+                f"Temp {vitals.get('temperature', 'N/A')}°F, SpO2 {vitals.get('oxygen_saturation', 'N/A')}%"
+            )
+        
+        # Callers pass events newest-first or oldest-first; the prompt wants the latest 10, oldest first
+        recent = sorted(events, key=lambda event: event.timestamp)[-10:]
+        lines.append(f"Recent Events ({len(events)} total):")
+        header = "\n".join(lines)
+        
+        # Over the cap, the oldest events go first: whole lines are taken newest
+        # backwards while they fit, and each description is trimmed so one long
+        # note can't crowd out the rest
+        budget = MAX_CONTEXT_CHARS - len(header)
+        kept = []
+        for event in reversed(recent):
+            line = f"\n{event.timestamp:%H:%M} {event.event_type}: {event.description[:MAX_EVENT_CHARS]}"
+            if len(line) > budget:
+                break
+            budget -= len(line)
+            kept.append(line)
+        
+        return (header + "".join(reversed(kept)))[:MAX_CONTEXT_CHARS]
+    
+    def _build_detection_context(self, detections: List[Detection], room: str) -> str:
+        """Build context for detection analysis, at most MAX_CONTEXT_CHARS long"""
+        lines = [f"Room: {room}", "Detections (time type confidence):"]
+        lines.extend(detection.short for detection in detections[-20:])
+        return "\n".join(lines)[:MAX_CONTEXT_CHARS]
     
     def _build_shift_context(self, patients: List[Patient], alerts: List[Alert], timeframe_hours: int) -> str:
         """Build context for shift summary"""
@@ -235,11 +424,16 @@ Current Vitals:
         critical_patients = [p for p in patients if p.status == "critical"]
         context += f"Critical Patients ({len(critical_patients)}):\n"
         for patient in critical_patients:
-            context += f"- {patient.name} in {patient.room}: {patient.ai_summary or 'No recent summary'}\n"
+            context += f"- {patient.name} in {patient.room}: {(patient.ai_summary or 'No recent summary')[:300]}\n"
         
         # Recent alerts
         context += f"\nAlerts ({len(alerts)} total):\n"
         for alert in alerts[-10:]:
             context += f"- {alert.created_at.strftime('%H:%M')}: {alert.title} ({alert.alert_type})\n"
         
-        return context
\ No newline at end of file
+        return context
+
+@lru_cache(maxsize=1)
+def get_gpt_service() -> GPTService:
+    """Shared GPTService, so every caller reuses one OpenAI client and its connection pool"""
+    return GPTService()
\ No newline at end of file
@@ -5,10 +5,11 @@ Handles IP camera discovery, connection, and streaming
 import asyncio
 import ipaddress
 import socket
+from concurrent.futures import ThreadPoolExecutor
 import cv2
-import requests
-from typing import List, Dict, Optional, Tuple
-import subprocess
+import httpx
+from typing import Iterator, List, Dict, Optional, Tuple
+from cachetools import TTLCache
 import re
 from dataclasses import dataclass
 import logging
@@ -26,6 +27,60 @@ class IPCamera:
     status: str = "detected"
     auth_required: bool = False
 
+def _host_addresses(network: ipaddress.IPv4Network, limit: int) -> Iterator[str]:
+    """Usable host addresses of a network as dotted quads, up to limit.
+    
+    Same addresses as network.hosts(), but walks plain integers instead of
+    building an IPv4Address object per host.
+    """
+    first = int(network.network_address)
+    last = int(network.broadcast_address)
+    if network.prefixlen < 31:
+        # Skip the network and broadcast addresses
+        first += 1
+        last -= 1
+    for address in range(first, min(last, first + limit - 1) + 1):
+        yield socket.inet_ntoa(address.to_bytes(4, "big"))
+
+# Brand markers in the Server header and in page content. Each text is scanned
+# once; when several markers appear, the one listed first wins
+_SERVER_BRANDS = {"hikvision": "Hikvision", "dahua": "Dahua", "axis": "Axis", "foscam": "Foscam"}
+_CONTENT_BRANDS = {"hikvision": "Hikvision", "dahua": "Dahua", "raspberry": "Raspberry Pi", "pi": "Raspberry Pi"}
+_SERVER_BRAND_RE = re.compile("hikvision|dahua|axis|foscam", re.IGNORECASE)
+# "pi" only as a word, not inside "api" or "spinner"
+_CONTENT_BRAND_RE = re.compile(r"hikvision|dahua|raspberry|\bpi\b", re.IGNORECASE)
+
+def _match_brand(pattern: re.Pattern, brands: Dict[str, str], text: str) -> Optional[str]:
+    """Brand of the highest-priority marker found in text, if any"""
+    found = {marker.lower() for marker in pattern.findall(text)}
+    return next((brand for marker, brand in brands.items() if marker in found), None)
+
+# Stream URL per lowercased brand; anything else gets the most common path
+_RTSP_TEMPLATES = {
+    "hikvision": "{base}/Streaming/Channels/101/",
+    "dahua": "{base}/cam/realmonitor?channel=1&subtype=0",
+    "axis": "{base}/axis-media/media.amp",
+    "foscam": "{base}/videoMain",
+    # Common for Raspberry Pi with motion or similar
+    "raspberry pi": "http://{ip}:8081/",
+}
+
+# Give up on unresponsive streams instead of FFmpeg's ~30s defaults
+_PROBE_PARAMS = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, 2000, cv2.CAP_PROP_READ_TIMEOUT_MSEC, 2000]
+
+def _probe_stream(url: str) -> Tuple[bool, str]:
+    """Open a stream and read one frame; blocks, so run it in a worker thread"""
+    cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG, _PROBE_PARAMS)
+    try:
+        if not cap.isOpened():
+            return False, "Failed to open stream"
+        ret, frame = cap.read()
+        if ret and frame is not None:
+            return True, "Connection successful"
+        return False, "Failed to read frame"
+    finally:
+        cap.release()
+
 class IPCameraDetector:
     """Service for detecting and managing IP cameras"""
     
@@ -44,22 +99,51 @@ class IPCameraDetector:
             "/h264/ch1/main/av_stream",
         ]
         self.detected_cameras: Dict[str, IPCamera] = {}
+        # Hosts probed at once; each probe is mostly waiting on timeouts
+        self.scan_concurrency = 64
+        # Upper bound on hosts per scan (a full /24)
+        self.max_scan_hosts = 254
+        # TCP connect timeout per port; on a LAN a closed port answers with
+        # a reset within one round trip, so only silent hosts wait this long
+        self.port_timeout = 0.3
+        # Successful stream probes keyed by (rtsp_url, username, password), so
+        # adding a camera right after a scan or test skips the RTSP handshake
+        self.probe_cache = TTLCache(maxsize=256, ttl=120)
+        # Recent per-host scan results (an IPCamera, or None for no camera),
+        # so repeating a scan within a few minutes doesn't re-probe every host
+        self._scan_cache = TTLCache(maxsize=4096, ttl=300)
+        # Stream probes block in OpenCV for up to a few seconds each, so they
+        # run here rather than on the event loop
+        self._probe_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rtsp-probe")
+        # Shared HTTP client for identifying cameras, created on first use
+        self._http: Optional[httpx.AsyncClient] = None
 
-    async def scan_network_for_cameras(self, network: str = "192.168.1.0/24") -> List[IPCamera]:
-        """Scan network for IP cameras"""
+    async def scan_network_for_cameras(self, network: str = "192.168.1.0/24", refresh: bool = False) -> List[IPCamera]:
+        """Scan network for IP cameras
+        
+        Hosts probed in the last few minutes reuse their result unless refresh is set.
+        """
         logger.info(f"Scanning network {network} for cameras...")
         cameras = []
         
         try:
             network_obj = ipaddress.IPv4Network(network, strict=False)
+            hosts = _host_addresses(network_obj, self.max_scan_hosts)
+            if refresh:
+                self._scan_cache.clear()
             
-            # Scan first 50 IPs to avoid long delays
-            tasks = []
-            for ip in list(network_obj.hosts())[:50]:
-                task = asyncio.create_task(self._check_ip_for_camera(str(ip)))
-                tasks.append(task)
+            # Fan out over the whole range, but keep at most scan_concurrency
+            # hosts' probes in flight
+            semaphore = asyncio.Semaphore(self.scan_concurrency)
             
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            async def bounded_check(ip: str) -> Optional[IPCamera]:
+                async with semaphore:
+                    return await self._check_ip_for_camera(ip)
+            
+            results = await asyncio.gather(
+                *(bounded_check(ip) for ip in hosts),
+                return_exceptions=True
+            )
             
             for result in results:
                 if isinstance(result, IPCamera):
@@ -73,133 +157,120 @@ class IPCameraDetector:
         return cameras
 
     async def _check_ip_for_camera(self, ip: str) -> Optional[IPCamera]:
-        """Check if an IP address hosts a camera"""
+        """Check if an IP address hosts a camera, reusing a recent result"""
+        key = ("cam", ip)
+        if key in self._scan_cache:
+            return self._scan_cache[key]
+        
+        camera = await self._probe_ip_for_camera(ip)
+        self._scan_cache[key] = camera
+        return camera
+
+    async def _probe_ip_for_camera(self, ip: str) -> Optional[IPCamera]:
+        """Probe an IP address for a camera"""
         try:
-            # Quick ping check first
-            if not await self._ping_host(ip):
-                return None
+            # Probe all common camera ports at once, so a host costs one
+            # connect timeout rather than one per closed port. An open port is
+            # also what shows the host is up, so there's no separate ping
+            port_open = await asyncio.gather(*(self._check_port(ip, port) for port in self.common_ports))
+            open_ports = [port for port, is_open in zip(self.common_ports, port_open) if is_open]
+            
+            # Try open ports in order of preference
+            for port in open_ports:
+                camera = IPCamera(ip=ip, port=port)
                 
-            # Check common camera ports
-            for port in self.common_ports:
-                if await self._check_port(ip, port):
-                    camera = IPCamera(ip=ip, port=port)
-                    
-                    # Try to identify camera brand/model
-                    await self._identify_camera(camera)
-                    
-                    # Generate RTSP URL
-                    camera.rtsp_url = self._generate_rtsp_url(camera)
-                    
-                    # Test RTSP connection
-                    if await self._test_rtsp_connection(camera.rtsp_url):
-                        camera.status = "active"
-                        return camera
+                # Try to identify camera brand/model
+                await self._identify_camera(camera)
+                
+                # Generate RTSP URL
+                camera.rtsp_url = self._generate_rtsp_url(camera)
+                
+                # Test RTSP connection
+                if await self._test_rtsp_connection(camera.rtsp_url):
+                    camera.status = "active"
+                    self.probe_cache[(camera.rtsp_url, "", "")] = (True, "Connection successful")
+                    return camera
                     
         except Exception as e:
             logger.debug(f"Error checking IP {ip}: {e}")
             
         return None
 
-    async def _ping_host(self, ip: str) -> bool:
-        """Quick ping check"""
-        try:
-            proc = await asyncio.create_subprocess_exec(
-                'ping', '-c', '1', '-W', '1000', ip,
-                stdout=asyncio.subprocess.DEVNULL,
-                stderr=asyncio.subprocess.DEVNULL
-            )
-            await proc.wait()
-            return proc.returncode == 0
-        except:
-            return False
-
     async def _check_port(self, ip: str, port: int) -> bool:
         """Check if port is open"""
         try:
             future = asyncio.open_connection(ip, port)
-            reader, writer = await asyncio.wait_for(future, timeout=2.0)
+            reader, writer = await asyncio.wait_for(future, timeout=self.port_timeout)
             writer.close()
             await writer.wait_closed()
             return True
         except:
             return False
 
+    async def _fetch_page_head(self, url: str) -> Tuple[str, str]:
+        """Server header and the first 4 KB of a page"""
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                timeout=3.0,
+                limits=httpx.Limits(max_connections=100)
+            )
+        
+        async with self._http.stream("GET", url) as response:
+            body = b""
+            # Brand markers sit in the page head; don't download the rest
+            async for chunk in response.aiter_bytes():
+                body += chunk
+                if len(body) >= 4096:
+                    break
+            content = body[:4096].decode(response.encoding or "utf-8", errors="ignore")
+            return response.headers.get('Server', ''), content
+
     async def _identify_camera(self, camera: IPCamera):
         """Try to identify camera brand and model"""
         try:
-            # Try HTTP requests to common camera endpoints
-            http_urls = [
+            # Try HTTP requests to common camera endpoints, all at once; the
+            # first that answers, in this order, is used
+            http_urls = list(dict.fromkeys([
                 f"http://{camera.ip}:{camera.port}/",
                 f"http://{camera.ip}/",
                 f"http://{camera.ip}:80/",
-            ]
+            ]))
+            pages = await asyncio.gather(
+                *(self._fetch_page_head(url) for url in http_urls),
+                return_exceptions=True
+            )
             
-            for url in http_urls:
-                try:
-                    response = requests.get(url, timeout=3)
-                    server_header = response.headers.get('Server', '').lower()
-                    
-                    # Identify by server header
-                    if 'hikvision' in server_header:
-                        camera.brand = "Hikvision"
-                    elif 'dahua' in server_header:
-                        camera.brand = "Dahua"
-                    elif 'axis' in server_header:
-                        camera.brand = "Axis"
-                    elif 'foscam' in server_header:
-                        camera.brand = "Foscam"
-                    
-                    # Check HTML content for brand indicators
-                    content = response.text.lower()
-                    if 'hikvision' in content:
-                        camera.brand = "Hikvision"
-                    elif 'dahua' in content:
-                        camera.brand = "Dahua"
-                    elif 'raspberry' in content or 'pi' in content:
-                        camera.brand = "Raspberry Pi"
-                        camera.model = "Camera Module"
-                    
-                    camera.http_url = url
-                    break
-                    
-                except:
+            for url, page in zip(http_urls, pages):
+                if isinstance(page, BaseException):
                     continue
+                server_header, content = page
+                
+                # Identify by server header, then let HTML content override it
+                camera.brand = _match_brand(_SERVER_BRAND_RE, _SERVER_BRANDS, server_header) or camera.brand
+                content_brand = _match_brand(_CONTENT_BRAND_RE, _CONTENT_BRANDS, content)
+                if content_brand:
+                    camera.brand = content_brand
+                    if content_brand == "Raspberry Pi":
+                        camera.model = "Camera Module"
+                
+                camera.http_url = url
+                break
                     
         except Exception as e:
             logger.debug(f"Error identifying camera {camera.ip}: {e}")
 
     def _generate_rtsp_url(self, camera: IPCamera) -> str:
         """Generate RTSP URL based on camera brand"""
-        base_url = f"rtsp://{camera.ip}:{camera.port}"
-        
-        # Brand-specific RTSP paths
-        if camera.brand.lower() == "hikvision":
-            return f"{base_url}/Streaming/Channels/101/"
-        elif camera.brand.lower() == "dahua":
-            return f"{base_url}/cam/realmonitor?channel=1&subtype=0"
-        elif camera.brand.lower() == "axis":
-            return f"{base_url}/axis-media/media.amp"
-        elif camera.brand.lower() == "foscam":
-            return f"{base_url}/videoMain"
-        elif camera.brand.lower() == "raspberry pi":
-            # Common for Raspberry Pi with motion or similar
-            return f"http://{camera.ip}:8081/"
-        else:
-            # Try most common path
-            return f"{base_url}/live/ch0"
+        template = _RTSP_TEMPLATES.get(camera.brand.lower(), "{base}/live/ch0")
+        return template.format(base=f"rtsp://{camera.ip}:{camera.port}", ip=camera.ip)
 
     async def _test_rtsp_connection(self, rtsp_url: str) -> bool:
         """Test RTSP connection"""
         try:
-            # Use OpenCV to test RTSP stream
-            cap = cv2.VideoCapture(rtsp_url)
-            if cap.isOpened():
-                ret, frame = cap.read()
-                cap.release()
-                return ret and frame is not None
+            ok, _ = await asyncio.get_running_loop().run_in_executor(self._probe_pool, _probe_stream, rtsp_url)
+            return ok
         except:
-            pass
-        return False
+            return False
 
     async def get_camera_info(self, ip: str) -> Optional[Dict]:
         """Get detailed camera information"""
@@ -221,6 +292,7 @@ class IPCameraDetector:
 
     async def test_camera_stream(self, rtsp_url: str, username: str = "", password: str = "") -> Tuple[bool, str]:
         """Test camera stream with credentials"""
+        cache_key = (rtsp_url, username or "", password or "")
         try:
             # Add credentials to URL if provided
             if username and password:
@@ -229,16 +301,10 @@ class IPCameraDetector:
                     protocol, rest = rtsp_url.split("://", 1)
                     rtsp_url = f"{protocol}://{username}:{password}@{rest}"
             
-            cap = cv2.VideoCapture(rtsp_url)
-            if cap.isOpened():
-                ret, frame = cap.read()
-                cap.release()
-                if ret and frame is not None:
-                    return True, "Connection successful"
-                else:
-                    return False, "Failed to read frame"
-            else:
-                return False, "Failed to open stream"
+            ok, message = await asyncio.get_running_loop().run_in_executor(self._probe_pool, _probe_stream, rtsp_url)
+            if ok:
+                self.probe_cache[cache_key] = (ok, message)
+            return ok, message
                 
         except Exception as e:
             return False, f"Error: {str(e)}"
@@ -1,22 +1,53 @@
 """
 WebSocket Manager for real-time communication
 """
-import json
-from typing import Dict, List
+import logging
+import struct
+import time
+from typing import Dict, List, Optional, Set, Union
 from fastapi import WebSocket
 import asyncio
+import orjson
+
+logger = logging.getLogger(__name__)
+
+class _DisposableText(str):
+    """A text message the next one of its kind supersedes (live feed detections,
+    status snapshots), so a lagging client can skip it like a binary frame"""
+
+def _disposable(message: Union[str, bytes]) -> bool:
+    """Whether a queued message may be dropped for a client that fell behind"""
+    return isinstance(message, (bytes, _DisposableText))
 
 class WebSocketManager:
-    """Manages WebSocket connections for real-time updates"""
+    """Manages WebSocket connections for real-time updates
+    
+    Each client gets a bounded send queue drained by its own writer task, so a
+    slow client only delays itself and can't hold unsent messages without limit.
+    """
     
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
+        self._send_queues: Dict[str, asyncio.Queue] = {}
+        self._writers: Dict[str, asyncio.Task] = {}
+        # Messages waiting per client before it counts as falling behind
+        self._queue_size = 8
+        # Clients that asked for live status, and the last status published to
+        # them (serialized once for all of them)
+        self._status_subscribers: Set[str] = set()
+        self.latest_status: Optional[str] = None
     
     async def connect(self, websocket: WebSocket, client_id: str):
         """Accept a new WebSocket connection"""
         await websocket.accept()
+        # A reconnect under the same id replaces the old connection
+        self.disconnect(client_id)
+        
+        queue = asyncio.Queue(maxsize=self._queue_size)
         self.active_connections[client_id] = websocket
-        print(f"🔌 WebSocket client {client_id} connected")
+        self._send_queues[client_id] = queue
+        self._writers[client_id] = asyncio.create_task(self._writer(client_id, websocket, queue))
+        logger.info(f"🔌 WebSocket client {client_id} connected")
         
         # Send welcome message
         await self.send_personal_message({
@@ -29,55 +60,152 @@ class WebSocketManager:
         """Remove a WebSocket connection"""
         if client_id in self.active_connections:
             del self.active_connections[client_id]
-            print(f"🔌 WebSocket client {client_id} disconnected")
+            self._send_queues.pop(client_id, None)
+            self._status_subscribers.discard(client_id)
+            writer = self._writers.pop(client_id, None)
+            if writer is not None and writer is not asyncio.current_task():
+                writer.cancel()
+            logger.info(f"🔌 WebSocket client {client_id} disconnected")
     
     async def send_personal_message(self, data: dict, client_id: str):
         """Send message to specific client"""
         if client_id in self.active_connections:
-            try:
-                websocket = self.active_connections[client_id]
-                message = json.dumps(data) if isinstance(data, dict) else str(data)
-                await websocket.send_text(message)
-            except Exception as e:
-                print(f"Error sending message to {client_id}: {e}")
-                self.disconnect(client_id)
+            message = orjson.dumps(data).decode() if isinstance(data, dict) else str(data)
+            self._enqueue(client_id, message)
     
     async def broadcast(self, data: dict):
         """Broadcast message to all connected clients"""
         if not self.active_connections:
             return
         
-        message = json.dumps(data) if isinstance(data, dict) else str(data)
-        disconnected_clients = []
-        
-        for client_id, websocket in self.active_connections.items():
-            try:
-                await websocket.send_text(message)
-            except Exception as e:
-                print(f"Error broadcasting to {client_id}: {e}")
-                disconnected_clients.append(client_id)
+        # Serialized once for every client; orjson also handles datetimes in model dumps.
+        # Sent as text because clients JSON.parse the frame data
+        message = orjson.dumps(data).decode() if isinstance(data, dict) else str(data)
+        await self.broadcast_text(message)
+    
+    async def subscribe_status(self, client_id: str):
+        """Add a client to the live status feed, sending it the latest status now"""
+        if client_id not in self.active_connections:
+            return
+        self._status_subscribers.add(client_id)
+        if self.latest_status is not None:
+            self._enqueue(client_id, self.latest_status)
+    
+    def has_status_subscribers(self) -> bool:
+        """Whether any client is subscribed to live status"""
+        return bool(self._status_subscribers)
+    
+    async def publish_status(self, data: dict):
+        """Send a status snapshot to every live status subscriber"""
+        self.latest_status = _DisposableText(orjson.dumps(data).decode())
+        for client_id in list(self._status_subscribers):
+            self._enqueue(client_id, self.latest_status)
+        await asyncio.sleep(0)
+    
+    async def broadcast_text(self, message: str):
+        """Queue a pre-serialized message for every client, sent as a text frame"""
+        for client_id in list(self._send_queues):
+            self._enqueue(client_id, message)
+        # Let the writers pick it up before the caller queues more
+        await asyncio.sleep(0)
+    
+    async def broadcast_bytes(self, message: bytes):
+        """Queue a binary message for every client"""
+        for client_id in list(self._send_queues):
+            self._enqueue(client_id, message)
+        # Let the writers pick it up before the caller queues more
+        await asyncio.sleep(0)
+    
+    def _enqueue(self, client_id: str, message: Union[str, bytes]):
+        """Add a message to a client's send queue, making room if it is full
         
-        # Clean up disconnected clients
-        for client_id in disconnected_clients:
-            self.disconnect(client_id)
+        Live frames, their detections and status snapshots are disposable, so
+        the oldest queued one is dropped for the new message (or a new
+        disposable message is skipped if nothing queued is). Only when an
+        event such as an alert would be lost is the client disconnected
+        instead; it can reconnect and resync.
+        """
+        queue = self._send_queues.get(client_id)
+        if queue is None:
+            return
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # At most _queue_size messages, so rebuilding the queue is cheap
+            pending = [queue.get_nowait() for _ in range(queue.qsize())]
+            oldest = next((i for i, queued in enumerate(pending) if _disposable(queued)), None)
+            if oldest is not None:
+                del pending[oldest]
+                pending.append(message)
+            elif not _disposable(message):
+                logger.warning(f"WebSocket client {client_id} fell behind; disconnecting")
+                websocket = self.active_connections.get(client_id)
+                self.disconnect(client_id)
+                if websocket is not None:
+                    asyncio.create_task(self._close(websocket))
+                return
+            for queued in pending:
+                queue.put_nowait(queued)
     
-    async def send_live_feed(self, camera_id: str, frame_data: str, detections: List = None):
-        """Send live camera feed to connected clients"""
-        data = {
-            "type": "live_feed",
-            "camera_id": camera_id,
-            "frame_data": frame_data,
-            "detections": [d.dict() if hasattr(d, 'dict') else d for d in (detections or [])],
-            "timestamp": asyncio.get_event_loop().time()
-        }
-        await self.broadcast(data)
+    async def _writer(self, client_id: str, websocket: WebSocket, queue: asyncio.Queue):
+        """Send a client's queued messages in order until it fails or disconnects"""
+        try:
+            while True:
+                message = await queue.get()
+                if isinstance(message, bytes):
+                    await websocket.send_bytes(message)
+                else:
+                    await websocket.send_text(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending to {client_id}: {e}")
+            if self.active_connections.get(client_id) is websocket:
+                self.disconnect(client_id)
+    
+    @staticmethod
+    async def _close(websocket: WebSocket):
+        """Close a connection dropped for falling behind (1013: try again later)"""
+        try:
+            await websocket.close(code=1013)
+        except Exception:
+            pass
+    
+    async def send_live_feed(self, camera_id: str, jpeg: bytes, detections: List = None, timestamp: Optional[float] = None):
+        """Send a live camera frame to connected clients
+        
+        `timestamp` (monotonic seconds) lets a caller sending several frames in
+        one tick stamp them all with one clock read.
+        
+        The frame goes out as one binary message: a little-endian uint16 byte
+        length, the UTF-8 camera id, then the raw JPEG, so it isn't inflated by
+        base64 or copied by JSON escaping. Its detections follow as a JSON
+        `live_feed` message which, like the frame, a lagging client may miss.
+        """
+        if not self.active_connections:
+            return
+        
+        camera = camera_id.encode()
+        await self.broadcast_bytes(struct.pack("<H", len(camera)) + camera + jpeg)
+        
+        # Detections carry their own cached JSON, so the payload is spliced
+        # together rather than re-serializing every detection on every frame
+        detections_json = ",".join(
+            d.serialized if hasattr(d, 'serialized') else orjson.dumps(d).decode()
+            for d in (detections or [])
+        )
+        message = (
+            f'{{"type":"live_feed","camera_id":{orjson.dumps(camera_id).decode()},'
+            f'"detections":[{detections_json}],"timestamp":{timestamp or time.monotonic()}}}'
+        )
+        await self.broadcast_text(_DisposableText(message))
     
-    async def send_alert(self, alert: dict):
+    async def send_alert(self, alert: dict, timestamp: Optional[float] = None):
         """Send alert to all connected clients"""
         data = {
             "type": "alert",
             "alert": alert,
-            "timestamp": asyncio.get_event_loop().time()
+            "timestamp": timestamp or time.monotonic()
         }
         await self.broadcast(data)
     
@@ -3,25 +3,36 @@ HexWard Backend - AI Hospital Monitoring System
 FastAPI server with real-time AI processing, computer vision, and GPT integration
 """
 import asyncio
+import atexit
+import logging
 import os
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 
 from app.config import get_settings
+from app.logging_config import setup_logging
 from app.database import engine, Base, get_db
 from app.routers import patients, alerts, cameras, auth, analytics, ip_cameras
 from app.services.ai_monitor import AIMonitorService
 from app.services.websocket_manager import WebSocketManager
 from app.services.camera_service import CameraService
-from app.services.gpt_service import GPTService
-from app.models.schemas import Token
+from app.services.gpt_service import get_gpt_service
+from app.models.schemas.auth import Token
+from app.cache import ttl_cached
 
 settings = get_settings()
 
+# Before anything logs; the listener thread drains the queue until exit
+log_listener = setup_logging(settings.LOG_LEVEL)
+atexit.register(log_listener.stop)
+logger = logging.getLogger(__name__)
+
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
@@ -29,32 +40,50 @@ Base.metadata.create_all(bind=engine)
 websocket_manager = WebSocketManager()
 ai_monitor = AIMonitorService()
 camera_service = CameraService()
-gpt_service = GPTService()
+gpt_service = get_gpt_service()
+
+async def publish_live_status():
+    """Compute live status once a second for every subscribed dashboard"""
+    while True:
+        try:
+            if websocket_manager.has_status_subscribers():
+                await websocket_manager.publish_status(await ai_monitor.get_current_status())
+        except Exception as e:
+            logger.error(f"Error publishing live status: {e}")
+        await asyncio.sleep(1.0)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan management"""
-    print("🏥 Starting HexWard AI Hospital Monitoring System...")
+    logger.info("🏥 Starting HexWard AI Hospital Monitoring System...")
+    
+    # Python 3.12+: tasks that finish without suspending complete inline
+    # instead of a trip through the loop
+    if hasattr(asyncio, "eager_task_factory"):
+        asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
     
     # Start background services
     await ai_monitor.start()
     await camera_service.start()
+    status_task = asyncio.create_task(publish_live_status())
     
-    print("✅ All services started successfully!")
+    logger.info("✅ All services started successfully!")
     yield
     
     # Cleanup
-    print("🔄 Shutting down services...")
+    logger.info("🔄 Shutting down services...")
+    status_task.cancel()
     await ai_monitor.stop()
     await camera_service.stop()
-    print("✅ Shutdown complete!")
+    logger.info("✅ Shutdown complete!")
 
 # Create FastAPI app
 app = FastAPI(
     title="HexWard API",
     description="AI-Powered Hospital Monitoring System",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -64,8 +93,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination cursors and frame metadata travel in headers the browser
+    # hides from scripts unless they are exposed
+    expose_headers=["X-Next-After", "X-Next-Before", "X-Next-Before-Id", "X-Timestamp", "X-Detections"],
+    max_age=86400,  # Let browsers cache preflights for a day
 )
 
+# JSON bodies compress several times over; streams and JPEGs opt out with
+# Content-Encoding: identity
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
@@ -109,32 +146,42 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
             if data == "ping":
                 await websocket_manager.send_personal_message("pong", client_id)
             elif data == "get_live_data":
-                # Send current live data
-                live_data = await ai_monitor.get_current_status()
-                await websocket_manager.send_personal_message(live_data, client_id)
+                # Subscribes to the once-a-second status feed; the reply is the
+                # latest snapshot rather than a fresh computation per request
+                if websocket_manager.latest_status is None:
+                    await websocket_manager.publish_status(await ai_monitor.get_current_status())
+                await websocket_manager.subscribe_status(client_id)
                 
     except WebSocketDisconnect:
         websocket_manager.disconnect(client_id)
 
 @app.get("/api/status")
+@ttl_cached(ttl=1)  # Dashboards poll this several times a second
 async def get_system_status():
     """Get comprehensive system status"""
+    detections_count, last_analysis, active_cameras, total_cameras, last_summary = await asyncio.gather(
+        ai_monitor.get_detection_count(),
+        ai_monitor.get_last_analysis_time(),
+        camera_service.get_active_camera_count(),
+        camera_service.get_total_camera_count(),
+        gpt_service.get_last_summary_time()
+    )
     return {
         "timestamp": ai_monitor.get_current_time(),
         "services": {
             "ai_monitor": {
                 "running": ai_monitor.is_running(),
-                "detections_count": await ai_monitor.get_detection_count(),
-                "last_analysis": await ai_monitor.get_last_analysis_time()
+                "detections_count": detections_count,
+                "last_analysis": last_analysis
             },
             "camera_service": {
                 "running": camera_service.is_running(),
-                "active_cameras": await camera_service.get_active_camera_count(),
-                "total_cameras": await camera_service.get_total_camera_count()
+                "active_cameras": active_cameras,
+                "total_cameras": total_cameras
             },
             "gpt_service": {
                 "available": gpt_service.is_available(),
-                "last_summary": await gpt_service.get_last_summary_time()
+                "last_summary": last_summary
             }
         },
         "hospital": {
@@ -144,10 +191,21 @@ async def get_system_status():
     }
 
 if __name__ == "__main__":
+    # HEXWARD_DEV=1 restarts on code changes; otherwise serve directly on
+    # uvloop with the httptools parser (both come with uvicorn[standard]).
+    # One worker only: the monitor, camera and WebSocket services are
+    # in-process singletons that extra workers would duplicate
+    dev = bool(os.getenv("HEXWARD_DEV"))
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
-        log_level="info"
+        reload=dev,
+        loop="auto" if dev else "uvloop",
+        http="auto" if dev else "httptools",
+        log_level="info",
+        # Broadcast JSON (alerts, detection lists) is repetitive and deflates
+        # well; clients only send short commands, so cap inbound messages
+        ws_per_message_deflate=True,
+        ws_max_size=1024 * 1024
     )
\ No newline at end of file
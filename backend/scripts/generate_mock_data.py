@@ -4,19 +4,29 @@ Generate mock data for HexWard testing and demonstration
 """
 import asyncio
 import random
-import json
+import bcrypt
 from datetime import datetime, timedelta
 from pathlib import Path
 import sys
 import os
+import uuid
+import numpy as np
+import orjson
 
 # Add parent directory to path to import app modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from app.config import get_settings
 from app.database import get_db, engine
-from app.models.database_models import Patient, Alert, Camera, Detection, PatientEvent, User
+from app.models.database_models import Patient, Alert, Camera, Detection, PatientEvent, User, vitals_columns
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
+settings = get_settings()
+
+# Login password of every generated user
+MOCK_PASSWORD = "demo123"
+
 class MockDataGenerator:
     """Generate realistic mock data for HexWard system"""
     
@@ -42,94 +52,128 @@ class MockDataGenerator:
             "WARD-101", "WARD-102", "WARD-103", "WARD-201", "WARD-202",
             "SURGERY-A", "SURGERY-B", "RECOVERY-1", "RECOVERY-2"
         ]
+        
+        self.ai_summaries = [
+            "Patient showing stable vital signs with good response to treatment.",
+            "Monitoring required due to elevated blood pressure readings.",
+            "Recovery progressing well, patient is alert and responsive.",
+            "Critical condition stabilizing, continue current treatment protocol.",
+            "Patient experiencing mild discomfort, pain management adjusted.",
+            "Excellent progress in rehabilitation, mobility improving.",
+            "Vital signs within normal range, discharge planning initiated."
+        ]
+        
+        # Random fields are drawn for a whole batch of records at once, then
+        # zipped into dicts; .tolist() turns them back into plain Python values
+        self._rng = np.random.default_rng()
+        # Lookup arrays for fancy-indexing whole rows of draws
+        self._conditions = np.array(self.medical_conditions, dtype=object)
+        self._condition_ids = np.arange(len(self.medical_conditions))
 
     def generate_user_data(self, count: int = 10) -> list:
         """Generate mock user accounts"""
-        users = []
-        roles = ["doctor", "nurse", "admin"]
+        first_names = self._rng.choice(self.first_names, count).tolist()
+        last_names = self._rng.choice(self.last_names, count).tolist()
+        roles = self._rng.choice(["doctor", "nurse", "admin"], count).tolist()
         
-        for i in range(count):
-            first_name = random.choice(self.first_names)
-            last_name = random.choice(self.last_names)
-            role = random.choice(roles)
-            
-            user = {
-                "username": f"{first_name.lower()}.{last_name.lower()}",
-                "email": f"{first_name.lower()}.{last_name.lower()}@hexward.hospital",
-                "hashed_password": "hashed_password_123",  # In real app, would be properly hashed
+        # A real bcrypt hash of MOCK_PASSWORD, so the seeded accounts can log in
+        # and no placeholder string ever sits in the password column. Every user
+        # shares the password, so one (deliberately slow) hash serves them all
+        hashed_password = bcrypt.hashpw(
+            MOCK_PASSWORD.encode(), bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
+        ).decode()
+        
+        users = []
+        for first_name, last_name, role in zip(first_names, last_names, roles):
+            username = f"{first_name}.{last_name}".lower()
+            users.append({
+                "username": username,
+                "email": f"{username}@hexward.hospital",
+                "hashed_password": hashed_password,
                 "role": role,
                 "is_active": True
-            }
-            users.append(user)
+            })
         
         return users
 
     def generate_patient_data(self, count: int = 25) -> list:
         """Generate mock patient data"""
-        patients = []
+        rng = self._rng
+        first_names = rng.choice(self.first_names, count).tolist()
+        last_names = rng.choice(self.last_names, count).tolist()
+        ages = rng.integers(18, 86, count).tolist()
+        rooms = rng.choice(self.rooms, count).tolist()
+        statuses = rng.choice(["stable", "critical", "monitoring"], count).tolist()
+        now = datetime.now()
+        admission_dates = [now - timedelta(days=days) for days in rng.integers(1, 31, count).tolist()]
+        summaries = rng.choice(self.ai_summaries, count).tolist()
         
-        for i in range(count):
-            first_name = random.choice(self.first_names)
-            last_name = random.choice(self.last_names)
-            
-            # Generate realistic vitals
-            vitals = {
-                "heartRate": random.randint(60, 120),
-                "bloodPressure": f"{random.randint(110, 160)}/{random.randint(70, 100)}",
-                "temperature": round(random.uniform(97.0, 102.0), 1),
-                "oxygenSat": random.randint(90, 100)
-            }
-            
-            patient = {
-                "name": f"{first_name} {last_name}",
-                "age": random.randint(18, 85),
-                "room": random.choice(self.rooms),
-                "status": random.choice(["stable", "critical", "monitoring"]),
-                "admission_date": datetime.now() - timedelta(days=random.randint(1, 30)),
-                "conditions": random.sample(self.medical_conditions, random.randint(1, 3)),
-                "vitals": vitals,
-                "ai_summary": self.generate_ai_summary()
-            }
-            patients.append(patient)
+        # 1-3 distinct conditions each: the first k of an independent shuffle
+        # per row, all rows shuffled in one call
+        condition_order = rng.permuted(
+            np.broadcast_to(self._condition_ids, (count, len(self._condition_ids))), axis=1
+        )[:, :3]
+        condition_counts = rng.integers(1, 4, count).tolist()
+        conditions = [
+            self._conditions[order[:k]].tolist()
+            for order, k in zip(condition_order, condition_counts)
+        ]
+        
+        # Generate realistic vitals
+        heart_rates = rng.integers(60, 121, count).tolist()
+        systolic = rng.integers(110, 161, count).tolist()
+        diastolic = rng.integers(70, 101, count).tolist()
+        temperatures = np.round(rng.uniform(97.0, 102.0, count), 1).tolist()
+        oxygen = rng.integers(90, 101, count).tolist()
         
-        return patients
+        return [
+            {
+                "name": f"{first_names[i]} {last_names[i]}",
+                "age": ages[i],
+                "room": rooms[i],
+                "status": statuses[i],
+                "admission_date": admission_dates[i],
+                "conditions": conditions[i],
+                "vitals": {
+                    "heart_rate": heart_rates[i],
+                    "blood_pressure": f"{systolic[i]}/{diastolic[i]}",
+                    "temperature": temperatures[i],
+                    "oxygen_saturation": oxygen[i]
+                },
+                "ai_summary": summaries[i]
+            }
+            for i in range(count)
+        ]
 
     def generate_ai_summary(self) -> str:
         """Generate AI-like patient summary"""
-        summaries = [
-            "Patient showing stable vital signs with good response to treatment.",
-            "Monitoring required due to elevated blood pressure readings.",
-            "Recovery progressing well, patient is alert and responsive.",
-            "Critical condition stabilizing, continue current treatment protocol.",
-            "Patient experiencing mild discomfort, pain management adjusted.",
-            "Excellent progress in rehabilitation, mobility improving.",
-            "Vital signs within normal range, discharge planning initiated."
-        ]
-        return random.choice(summaries)
+        return random.choice(self.ai_summaries)
 
     def generate_camera_data(self) -> list:
         """Generate mock camera data"""
-        cameras = []
+        count = len(self.rooms)
+        camera_indexes = self._rng.integers(0, 11, count).tolist()
+        statuses = self._rng.choice(["active", "offline", "maintenance"], count).tolist()
+        minutes_since_frame = self._rng.integers(0, 31, count).tolist()
+        recording = self._rng.random(count) < 0.5
         
-        for room in self.rooms:
-            camera = {
+        now = datetime.now()
+        return [
+            {
                 "name": f"Camera {room}",
                 "room": room,
-                "camera_index": random.randint(0, 10),
+                "camera_index": camera_indexes[i],
                 "rtsp_url": f"rtsp://camera-{room.lower()}.local:554/stream",
-                "status": random.choice(["active", "offline", "maintenance"]),
-                "last_frame_time": datetime.now() - timedelta(minutes=random.randint(0, 30)),
+                "status": statuses[i],
+                "last_frame_time": now - timedelta(minutes=minutes_since_frame[i]),
                 "detection_enabled": True,
-                "recording_enabled": random.choice([True, False])
+                "recording_enabled": bool(recording[i])
             }
-            cameras.append(camera)
-        
-        return cameras
+            for i, room in enumerate(self.rooms)
+        ]
 
     def generate_alert_data(self, patient_ids: list, count: int = 15) -> list:
         """Generate mock alert data"""
-        alerts = []
-        
         alert_types = [
             ("critical", "Patient Fall Detected", "Motion sensors detected sudden fall"),
             ("critical", "Vital Signs Critical", "Heart rate below safe threshold"),
@@ -142,23 +186,28 @@ class MockDataGenerator:
             ("info", "Medication Administered", "Medication given as scheduled")
         ]
         
+        rng = self._rng
+        types = rng.integers(0, len(alert_types), count).tolist()
+        patients = rng.choice(patient_ids, count).tolist() if patient_ids else [None] * count
+        rooms = rng.choice(self.rooms, count).tolist()
+        acknowledged, resolved = (rng.random((2, count)) < 0.5).tolist()
+        hours_ago = rng.integers(0, 49, count).tolist()
+        
+        alerts = []
+        now = datetime.now()
         for i in range(count):
-            alert_type, title, base_message = random.choice(alert_types)
-            patient_id = random.choice(patient_ids) if patient_ids else None
-            room = random.choice(self.rooms)
-            
-            alert = {
+            alert_type, title, base_message = alert_types[types[i]]
+            alerts.append({
                 "alert_type": alert_type,
                 "title": title,
-                "message": f"{base_message} in {room}",
-                "patient_id": patient_id,
-                "room": room,
+                "message": f"{base_message} in {rooms[i]}",
+                "patient_id": patients[i],
+                "room": rooms[i],
                 "priority": 1 if alert_type == "critical" else 2 if alert_type == "warning" else 3,
-                "acknowledged": random.choice([True, False]),
-                "resolved": random.choice([True, False]),
-                "created_at": datetime.now() - timedelta(hours=random.randint(0, 48))
-            }
-            alerts.append(alert)
+                "acknowledged": acknowledged[i],
+                "resolved": resolved[i],
+                "created_at": now - timedelta(hours=hours_ago[i])
+            })
         
         return alerts
 
@@ -177,18 +226,26 @@ class MockDataGenerator:
             ("consultation", "Doctor consultation")
         ]
         
+        rng = self._rng
+        types = rng.integers(0, len(event_types), count).tolist()
+        patients = rng.choice(patient_ids, count).tolist() if patient_ids else [None] * count
+        sources = rng.choice(["camera", "manual", "sensor", "ai"], count).tolist()
+        # Roughly half the events carry a confidence
+        confidences = np.where(rng.random(count) < 0.5, rng.uniform(0.7, 1.0, count), np.nan).tolist()
+        hours_ago = rng.integers(0, 73, count).tolist()
+        
+        now = datetime.now()
         for i in range(count):
-            event_type, description = random.choice(event_types)
-            patient_id = random.choice(patient_ids) if patient_ids else None
+            event_type, description = event_types[types[i]]
             
             event = {
-                "patient_id": patient_id,
+                "patient_id": patients[i],
                 "event_type": event_type,
                 "description": description,
-                "metadata": self.generate_event_metadata(event_type),
-                "source": random.choice(["camera", "manual", "sensor", "ai"]),
-                "confidence": random.uniform(0.7, 1.0) if random.choice([True, False]) else None,
-                "timestamp": datetime.now() - timedelta(hours=random.randint(0, 72))
+                "meta": self.generate_event_metadata(event_type),
+                "source": sources[i],
+                "confidence": None if np.isnan(confidences[i]) else confidences[i],
+                "timestamp": now - timedelta(hours=hours_ago[i])
             }
             events.append(event)
         
@@ -227,27 +284,44 @@ class MockDataGenerator:
             "staff_member", "wheelchair", "bed_movement", "emergency_gesture"
         ]
         
+        rng = self._rng
+        cameras = rng.choice(camera_ids, count).tolist() if camera_ids else [None] * count
+        types = rng.choice(detection_types, count).tolist()
+        confidences = np.round(rng.uniform(0.6, 0.99, count), 2).tolist()
+        xs = rng.integers(0, 641, count).tolist()
+        ys = rng.integers(0, 481, count).tolist()
+        widths = rng.integers(50, 201, count).tolist()
+        heights = rng.integers(80, 301, count).tolist()
+        minutes_ago = rng.integers(0, 1441, count).tolist()
+        
+        now = datetime.now()
+        day = now.strftime('%Y%m%d')
         for i in range(count):
-            camera_id = random.choice(camera_ids) if camera_ids else None
-            
             detection = {
-                "camera_id": camera_id,
-                "detection_type": random.choice(detection_types),
-                "confidence": round(random.uniform(0.6, 0.99), 2),
+                "camera_id": cameras[i],
+                "detection_type": types[i],
+                "confidence": confidences[i],
                 "bounding_box": {
-                    "x": random.randint(0, 640),
-                    "y": random.randint(0, 480),
-                    "width": random.randint(50, 200),
-                    "height": random.randint(80, 300)
+                    "x": xs[i],
+                    "y": ys[i],
+                    "width": widths[i],
+                    "height": heights[i]
                 },
-                "frame_path": f"/frames/{datetime.now().strftime('%Y%m%d')}/frame_{i:06d}.jpg",
-                "metadata": {"frame_quality": "high", "lighting": "normal"},
-                "timestamp": datetime.now() - timedelta(minutes=random.randint(0, 1440))
+                "frame_path": f"/frames/{day}/frame_{i:06d}.jpg",
+                "meta": {"frame_quality": "high", "lighting": "normal"},
+                "timestamp": now - timedelta(minutes=minutes_ago[i])
             }
             detections.append(detection)
         
         return detections
 
+    def _bulk_insert(self, db: Session, model, rows: list) -> list:
+        """Insert rows with a single executemany INSERT; returns their ids"""
+        ids = [str(uuid.uuid4()) for _ in rows]
+        if rows:
+            db.execute(insert(model), [{**row, "id": row_id} for row, row_id in zip(rows, ids)])
+        return ids
+
     async def populate_database(self):
         """Populate database with mock data"""
         print("🔄 Generating mock data for HexWard...")
@@ -256,56 +330,36 @@ class MockDataGenerator:
         db = next(get_db())
         
         try:
-            # Generate and insert users
+            # Each table goes in as one bulk INSERT. Ids are UUIDs made here, so
+            # there is no need to flush row by row to learn them
             print("👥 Creating users...")
             users_data = self.generate_user_data(10)
-            user_ids = []
-            for user_data in users_data:
-                user = User(**user_data)
-                db.add(user)
-                db.flush()  # Get the ID
-                user_ids.append(user.id)
+            self._bulk_insert(db, User, users_data)
             
-            # Generate and insert patients
             print("🏥 Creating patients...")
-            patients_data = self.generate_patient_data(25)
-            patient_ids = []
-            for patient_data in patients_data:
-                patient = Patient(**patient_data)
-                db.add(patient)
-                db.flush()  # Get the ID
-                patient_ids.append(patient.id)
+            # A bulk INSERT skips Patient's @validates("vitals"), so fill the
+            # vitals copy columns here as create_patient does
+            patients_data = [
+                {**row, **vitals_columns(row["vitals"])}
+                for row in self.generate_patient_data(25)
+            ]
+            patient_ids = self._bulk_insert(db, Patient, patients_data)
             
-            # Generate and insert cameras
             print("📹 Creating cameras...")
             cameras_data = self.generate_camera_data()
-            camera_ids = []
-            for camera_data in cameras_data:
-                camera = Camera(**camera_data)
-                db.add(camera)
-                db.flush()  # Get the ID
-                camera_ids.append(camera.id)
+            camera_ids = self._bulk_insert(db, Camera, cameras_data)
             
-            # Generate and insert alerts
             print("🚨 Creating alerts...")
             alerts_data = self.generate_alert_data(patient_ids, 20)
-            for alert_data in alerts_data:
-                alert = Alert(**alert_data)
-                db.add(alert)
+            self._bulk_insert(db, Alert, alerts_data)
             
-            # Generate and insert patient events
             print("📝 Creating patient events...")
             events_data = self.generate_patient_events(patient_ids, 75)
-            for event_data in events_data:
-                event = PatientEvent(**event_data)
-                db.add(event)
+            self._bulk_insert(db, PatientEvent, events_data)
             
-            # Generate and insert detections
             print("🔍 Creating detections...")
             detections_data = self.generate_detection_data(camera_ids, 50)
-            for detection_data in detections_data:
-                detection = Detection(**detection_data)
-                db.add(detection)
+            self._bulk_insert(db, Detection, detections_data)
             
             # Commit all changes
             db.commit()
@@ -339,20 +393,8 @@ class MockDataGenerator:
             "detections": self.generate_detection_data(["1", "2", "3"], 15)
         }
         
-        # Convert datetime objects to strings for JSON serialization
-        def convert_datetime(obj):
-            if isinstance(obj, datetime):
-                return obj.isoformat()
-            elif isinstance(obj, dict):
-                return {k: convert_datetime(v) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [convert_datetime(item) for item in obj]
-            return obj
-        
-        sample_data = convert_datetime(sample_data)
-        
-        with open(filename, 'w') as f:
-            json.dump(sample_data, f, indent=2)
+        # orjson writes datetimes as ISO 8601 itself, in the same pass
+        Path(filename).write_bytes(orjson.dumps(sample_data, option=orjson.OPT_INDENT_2))
         
         print(f"✅ Sample data exported to {filename}")
 
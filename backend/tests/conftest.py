@@ -0,0 +1,168 @@
+"""
+Shared fixtures for HexWard backend tests
+"""
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from pytest_asyncio import is_async_test
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.database import Base, get_db
+from app.models.database_models import Alert, Camera, Patient, User
+from app.routers.auth import get_current_user, require_role
+from main import app
+
+# Test database setup: in memory, with StaticPool handing every session (and
+# the TestClient's thread) the same connection, so they all see one database.
+# Each xdist worker is its own process and so gets its own database
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+
+# Test data is thrown away, so skip durability entirely: no syncs, journal
+# and temp tables in memory, and no locking handshake on the one connection.
+# page_size has to come before the schema exists; the 256 MB cache_size keeps
+# the whole test run from ever evicting a page.
+# (mmap_size is left out; it has no effect on an in-memory database)
+TEST_SQLITE_PRAGMAS = (
+    "PRAGMA page_size=4096",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA journal_mode=MEMORY",
+    "PRAGMA locking_mode=EXCLUSIVE",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-262144",
+)
+
+@event.listens_for(engine, "connect")
+def _set_test_pragmas(dbapi_connection, connection_record):
+    """Apply TEST_SQLITE_PRAGMAS to the test connection"""
+    cursor = dbapi_connection.cursor()
+    for pragma in TEST_SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+    # pysqlite's own transaction handling breaks SAVEPOINT; leave it to SQLAlchemy
+    dbapi_connection.isolation_level = None
+
+@event.listens_for(engine, "begin")
+def _begin_transaction(connection):
+    """Emit the BEGIN pysqlite no longer issues itself"""
+    connection.exec_driver_sql("BEGIN")
+
+def pytest_collection_modifyitems(items):
+    """Run every async test on one session-wide event loop
+    
+    Session fixtures that start services leave tasks on the loop they were
+    created in, so the tests using them must run on that same loop.
+    """
+    session_loop = pytest.mark.asyncio(scope="session")
+    for item in items:
+        if is_async_test(item):
+            item.add_marker(session_loop, append=False)
+
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture(scope="session")
+def _schema():
+    """Create the schema once, the first time a test needs the database
+    
+    Only database fixtures depend on this, so a run selecting tests that
+    never touch the database (pytest -k test_health_check) skips it.
+    """
+    Base.metadata.create_all(bind=engine)
+    yield engine
+
+@pytest.fixture(scope="session")
+def seed_data(_schema):
+    """Reference rows every test can read, inserted once with one INSERT per table
+    
+    They are committed outside the per-test transactions, so no test rolls
+    them back; tests should only add to them, not change or delete them.
+    """
+    seeded = {
+        Patient: [
+            {"id": "seed-patient-1", "name": "Seed Patient 1", "age": 62, "room": "SEED-101", "conditions": ["Hypertension"], "vitals": {}},
+            {"id": "seed-patient-2", "name": "Seed Patient 2", "age": 48, "room": "SEED-102", "conditions": [], "vitals": {}}
+        ],
+        Alert: [
+            {"id": "seed-alert-1", "alert_type": "warning", "title": "Seed Alert", "message": "Seeded for the tests", "room": "SEED-101", "priority": 2}
+        ],
+        Camera: [
+            {"id": "seed-camera-1", "name": "Seed Camera", "room": "SEED-101", "camera_index": 0}
+        ]
+    }
+    with _schema.begin() as connection:
+        for model, rows in seeded.items():
+            connection.execute(insert(model), rows)
+    return {model.__tablename__: rows for model, rows in seeded.items()}
+
+@pytest.fixture
+def db_session(_schema):
+    """Session for one test, inside a transaction rolled back afterwards
+    
+    The API uses this session too (through get_db), and commits made by
+    either only release a SAVEPOINT, so nothing outlives the test.
+    """
+    connection = _schema.connect()
+    transaction = connection.begin()
+    session = TestingSessionLocal(bind=connection, join_transaction_mode="create_savepoint")
+    
+    def override_get_db():
+        yield session
+    app.dependency_overrides[get_db] = override_get_db
+    
+    yield session
+    
+    app.dependency_overrides.pop(get_db, None)
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+@pytest.fixture(autouse=True)
+def current_user():
+    """Admin user every request is authenticated as, without a token
+    
+    Overrides get_current_user and require_role("admin") (cached, so the
+    routers' dependency is this same callable); auth itself is TestAuth's job.
+    """
+    user = User(id="test-admin", username="test-admin", email="admin@hexward.test", hashed_password="", role="admin", is_active=True)
+    overrides = {get_current_user: lambda: user, require_role("admin"): lambda: user}
+    app.dependency_overrides.update(overrides)
+    yield user
+    for dependency in overrides:
+        app.dependency_overrides.pop(dependency, None)
+
+@pytest.fixture(scope="session")
+def client():
+    """One TestClient shared by the whole session; db_session points it at the test database
+    
+    Entered as a context manager so the app's lifespan (the AI monitor,
+    camera service and status ticker) starts once and stays up throughout.
+    """
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture(scope="session")
+async def aclient(client):
+    """Async client calling the app directly on the test's event loop
+    
+    Unlike TestClient, requests don't hop to a portal thread and back. The
+    lifespan isn't run by ASGITransport, so this depends on client for it.
+    """
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as aclient:
+        yield aclient
+
+@pytest.fixture
+def patient_factory(db_session):
+    """Insert a patient straight through the ORM; keyword arguments override the defaults"""
+    defaults = {"name": "Test Patient", "age": 30, "room": "TEST-002", "conditions": [], "vitals": {}}
+    
+    def _make(**overrides):
+        patient = Patient(**{**defaults, **overrides})
+        db_session.add(patient)
+        db_session.commit()
+        return patient
+    return _make
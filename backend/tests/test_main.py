@@ -3,35 +3,48 @@ Unit tests for HexWard backend
 """
 import pytest
 import asyncio
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.database import Base, get_db
-from app.main import app
+import orjson
 
-# Test database setup
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test_hexward.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Request bodies, encoded once rather than on every post
+PATIENT_DATA = {
+    "name": "Test Patient",
+    "age": 45,
+    "room": "TEST-001",
+    "conditions": ["Test Condition"],
+    "vitals": {
+        "heartRate": 80,
+        "bloodPressure": "120/80",
+        "temperature": 98.6,
+        "oxygenSat": 98
+    }
+}
 
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
+ALERT_DATA = {
+    "alert_type": "critical",
+    "title": "Test Alert",
+    "message": "This is a test alert",
+    "room": "TEST-001",
+    "priority": 1
+}
 
-app.dependency_overrides[get_db] = override_get_db
-Base.metadata.create_all(bind=engine)
+CAMERA_DATA = {
+    "name": "Test Camera",
+    "room": "TEST-001",
+    "camera_index": 0,
+    "detection_enabled": True
+}
 
-client = TestClient(app)
+PATIENT_PAYLOAD = orjson.dumps(PATIENT_DATA)
+ALERT_PAYLOAD = orjson.dumps(ALERT_DATA)
+CAMERA_PAYLOAD = orjson.dumps(CAMERA_DATA)
+JSON_HEADERS = {"content-type": "application/json"}
 
 class TestMain:
     """Test main application endpoints"""
     
-    def test_health_check(self):
+    async def test_health_check(self, aclient):
         """Test root endpoint health check"""
-        response = client.get("/")
+        response = await aclient.get("/")
         assert response.status_code == 200
         data = response.json()
         assert data["message"] == "HexWard AI Hospital Monitoring System"
@@ -39,121 +52,181 @@ class TestMain:
         assert data["status"] == "operational"
         assert "services" in data
 
-    def test_system_status(self):
+    async def test_system_status(self, aclient):
         """Test system status endpoint"""
-        response = client.get("/api/status")
+        response = await aclient.get("/api/status")
         assert response.status_code == 200
         data = response.json()
         assert "timestamp" in data
         assert "services" in data
         assert "hospital" in data
 
-class TestPatients:
-    """Test patient management endpoints"""
+@pytest.mark.usefixtures("db_session")
+class TestResources:
+    """Test the list and create endpoints shared by patients, alerts and cameras"""
     
-    def test_get_patients_empty(self):
-        """Test getting patients when none exist"""
-        response = client.get("/api/patients")
+    @pytest.mark.parametrize("endpoint, table", [
+        ("/api/patients", "patients"),
+        ("/api/alerts", "alerts"),
+        ("/api/cameras", "cameras")
+    ], ids=["patients", "alerts", "cameras"])
+    def test_list_endpoint(self, client, seed_data, endpoint, table):
+        """Test listing returns the seeded rows"""
+        response = client.get(endpoint)
         assert response.status_code == 200
         data = response.json()
         assert isinstance(data, list)
+        assert {row["id"] for row in seed_data[table]} <= {row["id"] for row in data}
 
-    def test_create_patient(self):
-        """Test creating a new patient"""
-        patient_data = {
-            "name": "Test Patient",
-            "age": 45,
-            "room": "TEST-001",
-            "conditions": ["Test Condition"],
-            "vitals": {
-                "heartRate": 80,
-                "bloodPressure": "120/80",
-                "temperature": 98.6,
-                "oxygenSat": 98
-            }
-        }
-        response = client.post("/api/patients", json=patient_data)
+    @pytest.mark.parametrize("endpoint, payload, expected", [
+        ("/api/patients", PATIENT_PAYLOAD, {key: PATIENT_DATA[key] for key in ("name", "room")}),
+        ("/api/alerts", ALERT_PAYLOAD, {key: ALERT_DATA[key] for key in ("title", "alert_type")}),
+        ("/api/cameras", CAMERA_PAYLOAD, {key: CAMERA_DATA[key] for key in ("name", "room")})
+    ], ids=["patient", "alert", "camera"])
+    def test_create_endpoint(self, client, endpoint, payload, expected):
+        """Test creating a resource echoes it back with an id"""
+        response = client.post(endpoint, content=payload, headers=JSON_HEADERS)
         assert response.status_code == 200
         data = response.json()
-        assert data["name"] == patient_data["name"]
-        assert data["room"] == patient_data["room"]
+        for key, value in expected.items():
+            assert data[key] == value
         assert "id" in data
 
-    def test_get_patient_by_id(self):
+@pytest.mark.usefixtures("db_session")
+class TestPatients:
+    """Test patient management endpoints"""
+    
+    def test_get_patient_by_id(self, client, patient_factory):
         """Test getting a specific patient"""
-        # First create a patient
-        patient_data = {
-            "name": "Test Patient 2",
-            "age": 30,
-            "room": "TEST-002",
-            "conditions": [],
-            "vitals": {}
-        }
-        create_response = client.post("/api/patients", json=patient_data)
-        patient_id = create_response.json()["id"]
+        # First seed a patient (creation over the API is test_create_endpoint's job)
+        patient = patient_factory(name="Test Patient 2")
+        patient_id = patient.id
         
         # Then get the patient
         response = client.get(f"/api/patients/{patient_id}")
         assert response.status_code == 200
         data = response.json()
         assert data["id"] == patient_id
-        assert data["name"] == patient_data["name"]
-
-class TestAlerts:
-    """Test alert management endpoints"""
-    
-    def test_get_alerts_empty(self):
-        """Test getting alerts when none exist"""
-        response = client.get("/api/alerts")
-        assert response.status_code == 200
-        data = response.json()
-        assert isinstance(data, list)
+        assert data["name"] == patient.name
 
-    def test_create_alert(self):
-        """Test creating a new alert"""
-        alert_data = {
-            "alert_type": "critical",
-            "title": "Test Alert",
-            "message": "This is a test alert",
-            "room": "TEST-001",
-            "priority": 1
-        }
-        response = client.post("/api/alerts", json=alert_data)
+    def test_filter_by_vitals(self, client, patient_factory):
+        """Test the vitals filters select on the promoted vitals columns"""
+        low_o2 = patient_factory(name="Low SpO2", vitals={"heart_rate": 88, "oxygen_saturation": 86})
+        fast_hr = patient_factory(name="Fast HR", vitals={"heart_rate": 131, "oxygen_saturation": 97})
+        patient_factory(name="Normal", vitals={"heart_rate": 72, "oxygen_saturation": 98})
+        
+        response = client.get("/api/patients", params={"max_oxygen_saturation": 88})
         assert response.status_code == 200
-        data = response.json()
-        assert data["title"] == alert_data["title"]
-        assert data["alert_type"] == alert_data["alert_type"]
-        assert "id" in data
+        assert [row["id"] for row in response.json()] == [low_o2.id]
+        
+        response = client.get("/api/patients", params={"min_heart_rate": 125})
+        assert [row["id"] for row in response.json()] == [fast_hr.id]
 
-class TestCameras:
-    """Test camera management endpoints"""
+@pytest.mark.usefixtures("db_session")
+class TestPagination:
+    """Test keyset cursors page through rows with server-default timestamps"""
     
-    def test_get_cameras_empty(self):
-        """Test getting cameras when none exist"""
-        response = client.get("/api/cameras")
-        assert response.status_code == 200
-        data = response.json()
-        assert isinstance(data, list)
+    @staticmethod
+    def _follow_cursor(client, endpoint, params):
+        """ids of every page, fetched by following X-Next-Before/-Id until it stops"""
+        pages = []
+        while True:
+            response = client.get(endpoint, params=params)
+            assert response.status_code == 200
+            pages.append([row["id"] for row in response.json()])
+            if "X-Next-Before" not in response.headers:
+                return pages
+            assert len(pages) < 10, "cursor did not advance"
+            params = {
+                **params,
+                "before": response.headers["X-Next-Before"],
+                "before_id": response.headers["X-Next-Before-Id"]
+            }
 
-    def test_create_camera(self):
-        """Test creating a new camera"""
-        camera_data = {
-            "name": "Test Camera",
-            "room": "TEST-001",
-            "camera_index": 0,
-            "detection_enabled": True
-        }
-        response = client.post("/api/cameras", json=camera_data)
-        assert response.status_code == 200
-        data = response.json()
-        assert data["name"] == camera_data["name"]
-        assert data["room"] == camera_data["room"]
-        assert "id" in data
+    @staticmethod
+    def _postgresql_sql(client, db_session, endpoint, params):
+        """The endpoint's last query, compiled for PostgreSQL instead of run on SQLite"""
+        from sqlalchemy import event
+        from sqlalchemy.dialects import postgresql
+        
+        statements = []
+        listener = lambda state: statements.append(state.statement)
+        event.listen(db_session, "do_orm_execute", listener)
+        try:
+            assert client.get(endpoint, params=params).status_code == 200
+        finally:
+            event.remove(db_session, "do_orm_execute", listener)
+        return str(statements[-1].compile(dialect=postgresql.dialect()))
+
+    @pytest.mark.parametrize("endpoint, sort_column", [
+        ("/api/alerts", "alerts.created_at"),
+        ("/api/patients/seed-patient-1/events", "patient_events.timestamp"),
+        ("/api/cameras/seed-camera-1/detections", "detections.timestamp"),
+    ], ids=["alerts", "patient_events", "detections"])
+    def test_cursor_on_postgresql(self, client, db_session, seed_data, endpoint, sort_column):
+        """Test the cursor compares and orders on the plain column outside SQLite"""
+        sql = self._postgresql_sql(client, db_session, endpoint, {"before": "2024-01-22T10:00:00", "before_id": "page-id"})
+        assert "strftime" not in sql
+        assert f"ORDER BY {sort_column} DESC" in sql
+
+    def test_alert_pages(self, client, db_session):
+        """Test the alert cursor reaches every alert exactly once"""
+        from app.models.database_models import Alert
+        
+        # Inserted together, so all share one server-default second
+        alerts = [
+            Alert(alert_type="info", title=f"Page Alert {i}", message="Paging", room="PAGE-001")
+            for i in range(5)
+        ]
+        db_session.add_all(alerts)
+        db_session.commit()
+        
+        pages = self._follow_cursor(client, "/api/alerts", {"room": "PAGE-001", "limit": 3})
+        assert [len(page) for page in pages] == [3, 2]
+        assert sorted(sum(pages, [])) == sorted(alert.id for alert in alerts)
+
+    def test_patient_event_pages(self, client, db_session, patient_factory):
+        """Test the patient event cursor reaches every event exactly once"""
+        from app.models.database_models import PatientEvent
+        
+        patient = patient_factory(name="Paging Patient")
+        events = [
+            PatientEvent(patient_id=patient.id, event_type="vitals", description=f"Reading {i}", source="manual")
+            for i in range(5)
+        ]
+        db_session.add_all(events)
+        db_session.commit()
+        
+        pages = self._follow_cursor(client, f"/api/patients/{patient.id}/events", {"limit": 3})
+        assert [len(page) for page in pages] == [3, 2]
+        assert sorted(sum(pages, [])) == sorted(event.id for event in events)
 
+    def test_camera_detection_pages(self, client, db_session):
+        """Test the camera detection cursor reaches every detection exactly once"""
+        from app.models.database_models import Camera, Detection
+        
+        camera = Camera(name="Paging Camera", room="PAGE-001", camera_index=0)
+        db_session.add(camera)
+        db_session.commit()
+        detections = [
+            Detection(
+                camera_id=camera.id, detection_type="person", confidence=0.9,
+                bounding_box={"x": 0, "y": 0, "width": 10, "height": 10}
+            )
+            for _ in range(5)
+        ]
+        db_session.add_all(detections)
+        db_session.commit()
+        
+        pages = self._follow_cursor(client, f"/api/cameras/{camera.id}/detections", {"limit": 3})
+        assert [len(page) for page in pages] == [3, 2]
+        assert sorted(sum(pages, [])) == sorted(detection.id for detection in detections)
+
+@pytest.mark.usefixtures("db_session")
 class TestAnalytics:
     """Test analytics endpoints"""
     
-    def test_get_analytics(self):
+    def test_get_analytics(self, client):
         """Test getting analytics data"""
         response = client.get("/api/analytics")
         assert response.status_code == 200
@@ -162,10 +235,11 @@ class TestAnalytics:
         assert "alert_count" in data
         assert "camera_count" in data
 
+@pytest.mark.usefixtures("db_session")
 class TestAuth:
     """Test authentication endpoints"""
     
-    def test_login_invalid_credentials(self):
+    def test_login_invalid_credentials(self, client):
         """Test login with invalid credentials"""
         login_data = {
             "username": "invalid_user",
@@ -174,37 +248,40 @@ class TestAuth:
         response = client.post("/api/auth/token", data=login_data)
         assert response.status_code == 401
 
-@pytest.mark.asyncio
+@pytest.fixture(scope="session")
+async def ai_monitor():
+    """One AI monitor, started once for the tests using it and stopped at the end"""
+    from app.services.ai_monitor import AIMonitorService
+    
+    monitor = AIMonitorService()
+    assert not monitor.is_running()
+    await monitor.start()
+    yield monitor
+    await monitor.stop()
+    assert not monitor.is_running()
+
+@pytest.fixture(scope="session")
+async def camera_service():
+    """One camera service, started once for the tests using it and stopped at the end"""
+    from app.services.camera_service import CameraService
+    
+    service = CameraService()
+    assert not service.is_running()
+    await service.start()
+    yield service
+    await service.stop()
+    assert not service.is_running()
+
 class TestServices:
     """Test background services"""
     
-    async def test_ai_monitor_service(self):
-        """Test AI monitor service initialization"""
-        from app.services.ai_monitor import AIMonitorService
-        
-        monitor = AIMonitorService()
-        assert not monitor.is_running()
-        
-        # Test starting and stopping
-        await monitor.start()
-        assert monitor.is_running()
-        
-        await monitor.stop()
-        assert not monitor.is_running()
+    async def test_ai_monitor_service(self, ai_monitor):
+        """Test AI monitor service is running once started"""
+        assert ai_monitor.is_running()
 
-    async def test_camera_service(self):
-        """Test camera service initialization"""
-        from app.services.camera_service import CameraService
-        
-        service = CameraService()
-        assert not service.is_running()
-        
-        # Test starting and stopping
-        await service.start()
-        assert service.is_running()
-        
-        await service.stop()
-        assert not service.is_running()
+    async def test_camera_service(self, camera_service):
+        """Test camera service is running once started"""
+        assert camera_service.is_running()
 
     async def test_gpt_service(self):
         """Test GPT service functionality"""
@@ -224,6 +301,8 @@ class TestUtilities:
         settings = get_settings()
         assert settings.HOSPITAL_NAME
         assert settings.HOSPITAL_TIMEZONE
+        # Settings are read from the environment once; every call shares them
+        assert get_settings() is settings
 
     def test_database_connection(self):
         """Test database connection"""
@@ -9,15 +9,30 @@ interface WebSocketMessage {
   timestamp: string;
 }
 
+// Live camera frames arrive as binary messages:
+// uint16 (little-endian) camera id length, UTF-8 camera id, raw JPEG
+interface LiveFrame {
+  cameraId: string;
+  jpeg: Blob;
+}
+
+const decodeLiveFrame = (buffer: ArrayBuffer): LiveFrame => {
+  const idLength = new DataView(buffer).getUint16(0, true);
+  const cameraId = new TextDecoder().decode(new Uint8Array(buffer, 2, idLength));
+  return { cameraId, jpeg: new Blob([buffer.slice(2 + idLength)], { type: 'image/jpeg' }) };
+};
+
 export const useWebSocket = (url: string) => {
   const ws = useRef<WebSocket | null>(null);
   const [isConnected, setIsConnected] = useState(false);
   const [lastMessage, setLastMessage] = useState<WebSocketMessage | null>(null);
+  const [lastFrame, setLastFrame] = useState<LiveFrame | null>(null);
   const [error, setError] = useState<string | null>(null);
 
   useEffect(() => {
     try {
       ws.current = new WebSocket(url);
+      ws.current.binaryType = 'arraybuffer';
       
       ws.current.onopen = () => {
         setIsConnected(true);
@@ -26,6 +41,10 @@ export const useWebSocket = (url: string) => {
       };
 
       ws.current.onmessage = (event) => {
+        if (event.data instanceof ArrayBuffer) {
+          setLastFrame(decodeLiveFrame(event.data));
+          return;
+        }
         try {
           const message: WebSocketMessage = JSON.parse(event.data);
           setLastMessage(message);
@@ -67,6 +86,7 @@ export const useWebSocket = (url: string) => {
   return {
     isConnected,
     lastMessage,
+    lastFrame,
     error,
     sendMessage
   };